@@ -19,7 +19,7 @@ import {
   DialogTitle
 } from '@mui/material';
 import { useAuth } from '../../context/AuthContext';
-import api from '../../services/api';
+import api, { getAll } from '../../services/api';
 import { useNavigate } from 'react-router-dom';
 import { AiOutlineUser } from 'react-icons/ai';
 
@@ -43,7 +43,7 @@ const CustomerHome = () => {
   useEffect(() => {
     const fetchRestaurants = async () => {
       try {
-        const response = await api.get('/api/restaurants/');
+        const response = await getAll('/api/restaurants/');
         setRestaurants(response.data);
       } catch (err) {
         setError(err.message);
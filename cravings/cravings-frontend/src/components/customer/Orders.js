@@ -18,7 +18,7 @@ import {
   TextField
 } from '@mui/material';
 import { useAuth } from '../../context/AuthContext';
-import api from '../../services/api';
+import api, { getAll } from '../../services/api';
 import { useNavigate } from 'react-router-dom';
 import { AiOutlineUser } from 'react-icons/ai';
 
@@ -40,7 +40,7 @@ const Orders = () => {
   useEffect(() => {
     const fetchOrders = async () => {
       try {
-        const response = await api.get('/api/orders/');
+        const response = await getAll('/api/orders/');
         setOrders(response.data);
       } catch (error) {
         console.error('Error fetching orders:', error);
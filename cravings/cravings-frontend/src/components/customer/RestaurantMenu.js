@@ -22,7 +22,7 @@ import {
   DialogTitle
 } from '@mui/material';
 import { useAuth } from '../../context/AuthContext';
-import api from '../../services/api';
+import api, { getAll } from '../../services/api';
 import ShoppingCartIcon from '@mui/icons-material/ShoppingCart';
 import AddShoppingCartIcon from '@mui/icons-material/AddShoppingCart';
 import RemoveIcon from '@mui/icons-material/Remove';
@@ -63,7 +63,7 @@ const RestaurantMenu = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const menuResponse = await api.get(`/api/restaurants/${id}/menu-items/`);
+        const menuResponse = await getAll(`/api/restaurants/${id}/menu-items/`);
         setMenuItems(menuResponse.data);
 
         if (menuResponse.data.length > 0) {
@@ -21,7 +21,7 @@ import {
 import { useAuth } from '../../context/AuthContext';
 import { useNavigate } from 'react-router-dom';
 import { AiOutlineUser } from 'react-icons/ai';
-import api from '../../services/api';
+import api, { getAll } from '../../services/api';
 
 const DeliveryCrewHome = () => {
   const { user, logout } = useAuth();
@@ -41,7 +41,7 @@ const DeliveryCrewHome = () => {
   // Fetch orders assigned to the delivery crew
   const fetchOrders = useCallback(async () => {
     try {
-      const response = await api.get('/api/orders/');
+      const response = await getAll('/api/orders/');
 
       // Filter orders assigned to the current delivery crew member and with status 'out_for_delivery'
       const filteredOrders = response.data.filter(order => 
@@ -22,7 +22,7 @@ import {
   DialogTitle
 } from '@mui/material';
 import { useAuth } from '../../context/AuthContext';
-import api from '../../services/api';
+import api, { getAll } from '../../services/api';
 import { useNavigate } from 'react-router-dom';
 import { AiOutlineUser } from 'react-icons/ai';
 import EditIcon from '@mui/icons-material/Edit';
@@ -87,7 +87,7 @@ const RestaurantManagerHome = () => {
     const fetchRestaurant = async () => {
       try {
         // Fetch the restaurant owned by the current user
-        const response = await api.get('/api/restaurants/');
+        const response = await getAll('/api/restaurants/');
         const userRestaurant = response.data.find(r => r.owner === user.id);
         
         if (userRestaurant) {
@@ -96,7 +96,7 @@ const RestaurantManagerHome = () => {
           setRestaurant(detailedResponse.data);
 
           // Fetch menu items for the restaurant
-          const menuResponse = await api.get(`/api/restaurants/${userRestaurant.id}/menu-items/`);
+          const menuResponse = await getAll(`/api/restaurants/${userRestaurant.id}/menu-items/`);
           setMenuItems(menuResponse.data);
         } else {
           setError('No restaurant found for this user');
@@ -20,7 +20,7 @@ import {
   ListItemText
 } from '@mui/material';
 import { useAuth } from '../../context/AuthContext';
-import api from '../../services/api';
+import api, { getAll } from '../../services/api';
 import { useNavigate } from 'react-router-dom';
 import { AiOutlineUser } from 'react-icons/ai';
 
@@ -39,7 +39,7 @@ const RestaurantOrders = () => {
   useEffect(() => {
     const fetchOrders = async () => {
       try {
-        const response = await api.get('/api/orders/');
+        const response = await getAll('/api/orders/');
         setOrders(response.data);
       } catch (err) {
         setError(err.message);
@@ -97,7 +97,7 @@ const RestaurantOrders = () => {
       await api.patch(`/api/orders/${selectedOrder.id}/assign-delivery/`, {
         delivery_crew: crewMember.id
       });
-      const response = await api.get('/api/orders/');
+      const response = await getAll('/api/orders/');
       setOrders(response.data);
       handleAssignClose();
     } catch (err) {
@@ -15,4 +15,23 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+// List endpoints return one page per response and link to the next page in
+// the Link header; fetch every page and return them as a single list
+const nextPage = (link) => {
+  const match = /<([^>]+)>;\s*rel="next"/.exec(link || '');
+  return match ? match[1] : null;
+};
+
+export const getAll = async (url, config) => {
+  let response = await api.get(url, config);
+  const data = [...response.data];
+  let next = nextPage(response.headers.link);
+  while (next) {
+    response = await api.get(next);
+    data.push(...response.data);
+    next = nextPage(response.headers.link);
+  }
+  return { ...response, data };
+};
+
 export default api;
\ No newline at end of file
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cravings.settings')
+# Serve the hot reads with orders.async_views, see ASYNC_READ_VIEWS
+os.environ.setdefault('CRAVINGS_ASYNC_READ_VIEWS', '1')
 
 application = get_asgi_application()
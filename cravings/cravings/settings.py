@@ -50,6 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    'orders.instrumentation.RequestMetricsMiddleware',
+    'orders.routers.ReadScopeMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -88,9 +91,53 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts so concurrent
+            # checkouts queue instead of failing with "database is locked".
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    },
+    # Read-only copy for ReplicaRouter. Locally a second connection to the
+    # same file; in production point it at a replica of the primary.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['orders.routers.ReplicaRouter']
+
+# Aliases read-only requests read from; empty to read everything from the primary
+DATABASE_REPLICAS = ['replica']
+
+# Seconds a user's reads stay on the primary after a request of theirs wrote
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# Menu versions and role lookups live here. Use a shared backend (Redis or
+# Memcached) when running several workers so invalidations reach all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cravings',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
 
+# How long a rendered menu page stays cached (orders.menu_cache)
+MENU_CACHE_TIMEOUT = 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -135,12 +182,18 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework settings
 REST_FRAMEWORK = {
+    # JWTAuthentication that reads the token's user from the cache
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'orders.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Encodes with orjson when it is installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'orders.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 # JWT settings
@@ -167,6 +220,52 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
 
+# How long CachedJWTAuthentication keeps a resolved user (orders.authentication).
+# Saving or deleting a user or changing their groups drops the entry sooner.
+JWT_USER_CACHE_TIMEOUT = 60 * 5
+
+# Pagination cursors are sent in the Link header
+CORS_EXPOSE_HEADERS = ['Link']
+
+# How long a user's group names stay cached between requests (orders.roles)
+ROLE_CACHE_TIMEOUT = 60 * 15
+
+# Serve DeliveryCrewList from the maintained per-crew load counters
+# instead of counting active orders on each request (orders.workload)
+USE_DELIVERY_LOAD_COUNTERS = False
+
+# Pub/sub backend for the order status stream (orders.events). The in-process
+# broker only reaches streams served by the same process.
+ORDER_EVENTS_BACKEND = 'orders.events.InProcessBroker'
+
+# Seconds between keep-alive comments on idle order streams
+ORDER_STREAM_HEARTBEAT = 15
+
+# Seconds a ticket from orders/stream/ticket/ may wait before opening the
+# order stream. Tickets are marked used in the default cache, which must be
+# shared by all workers for them to stay single-use.
+ORDER_STREAM_TICKET_TTL = 30
+
+# Worker threads that render menu image variants off the request path (orders.images)
+MENU_IMAGE_WORKERS = 2
+
+# Requests slower than this many milliseconds are logged with their slowest
+# queries (orders.instrumentation)
+REQUEST_METRICS_SLOW_MS = 500
+REQUEST_METRICS_WORST_QUERIES = 3
+# Send SQL, serializer and render timings in a Server-Timing header
+REQUEST_METRICS_SERVER_TIMING = True
+
+# Delivered and cancelled orders older than this many days are moved to the
+# archive tables by the archive_orders command (orders.archive)
+ORDER_ARCHIVE_AFTER_DAYS = 180
+
+# Serve GETs of the menu list, order detail, cart, user role and profile with
+# the async views of orders.async_views. Only worth it under ASGI: under WSGI
+# each of those requests starts an event loop. cravings.asgi turns it on
+# through CRAVINGS_ASYNC_READ_VIEWS; WSGI and manage.py keep the DRF views.
+ASYNC_READ_VIEWS = os.environ.get('CRAVINGS_ASYNC_READ_VIEWS') == '1'
+
 # Djoser settings
 DJOSER = {
     'LOGIN_FIELD': 'username',
@@ -174,3 +273,9 @@ DJOSER = {
     'SERIALIZERS': {},
     'TOKEN_MODEL': None,  # We're using JWT tokens
 }
+
+# Automatic dispatch for restaurants that opt in (orders.dispatch): orders a
+# driver takes from one restaurant per run, and active orders above which a
+# driver gets no more
+DISPATCH_BATCH_SIZE = 3
+DISPATCH_MAX_LOAD = 5
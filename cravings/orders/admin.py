@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import Restaurant, MenuItem, Cart, CartItem, Order, OrderItem
+from .models import (
+    Restaurant, MenuItem, Cart, CartItem, Order, OrderItem, DeliveryLoad, ArchivedOrder, ArchivedOrderItem
+)
 
 class RestaurantAdmin(admin.ModelAdmin):
     list_display = ('name', 'owner', 'opening_time', 'closing_time')
@@ -22,6 +24,21 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ('customer__username', 'restaurant__name', 'delivery_crew__username')
     inlines = [OrderItemInline]
 
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'customer', 'restaurant', 'delivery_crew', 'status', 'total', 'order_date', 'archived_at')
+    list_filter = ('status', 'order_date')
+    search_fields = ('customer__username', 'restaurant__name', 'delivery_crew__username')
+    raw_id_fields = ('customer', 'restaurant', 'delivery_crew')
+    inlines = [ArchivedOrderItemInline]
+
+class DeliveryLoadAdmin(admin.ModelAdmin):
+    list_display = ('crew', 'active_orders')
+    search_fields = ('crew__username',)
+
 # Register models
 admin.site.register(Restaurant, RestaurantAdmin)
 admin.site.register(MenuItem, MenuItemAdmin)
@@ -29,3 +46,5 @@ admin.site.register(Cart)
 admin.site.register(CartItem)
 admin.site.register(Order, OrderAdmin)
 admin.site.register(OrderItem)
+admin.site.register(ArchivedOrder, ArchivedOrderAdmin)
+admin.site.register(DeliveryLoad, DeliveryLoadAdmin)
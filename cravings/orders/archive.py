@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+
+# Orders in these states are finished and can leave the live tables
+ARCHIVED_STATUSES = ('delivered', 'cancelled')
+# Age, in days, after which a finished order is archived
+ORDER_ARCHIVE_AFTER_DAYS = getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 180)
+
+ORDER_FIELDS = (
+    'id', 'customer_id', 'restaurant_id', 'delivery_crew_id', 'status', 'total',
+    'delivery_address', 'order_date',
+)
+ITEM_FIELDS = ('id', 'order_id', 'menu_item_id', 'quantity', 'unit_price')
+
+
+def archive_cutoff(days=None):
+    return timezone.now() - timedelta(days=ORDER_ARCHIVE_AFTER_DAYS if days is None else days)
+
+
+def archivable_orders(before):
+    """
+    Finished orders placed before ``before``.
+    """
+    return Order.objects.filter(status__in=ARCHIVED_STATUSES, order_date__lt=before)
+
+
+def archive_batch(orders, batch_size):
+    """
+    Move up to ``batch_size`` orders of ``orders``, lowest ids first, and their
+    items into the archive tables in one transaction. Returns the number of
+    orders moved; 0 once there is nothing left.
+
+    Each batch is committed on its own, so an interrupted run loses at most
+    the batch in flight and the next run carries on where it stopped.
+    """
+    with transaction.atomic():
+        ids = list(
+            orders.select_for_update().order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(**row) for row in Order.objects.filter(pk__in=ids).values(*ORDER_FIELDS)
+        ])
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(**row)
+            for row in OrderItem.objects.filter(order_id__in=ids).values(*ITEM_FIELDS)
+        ])
+        # Archived orders stay in the sales rollups; nothing else to adjust
+        OrderItem.objects.filter(order_id__in=ids).delete()
+        Order.objects.filter(pk__in=ids).delete()
+    return len(ids)
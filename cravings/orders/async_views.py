@@ -0,0 +1,228 @@
+"""
+Async views for the hottest read endpoints.
+
+Under ASGI a DRF view holds a worker thread for the whole request. These
+views answer GET and HEAD on the event loop instead: authentication,
+permissions, cache lookups and queries use the async APIs, and the response
+is rendered here. Every other method, and GETs asking for the browsable API,
+go to the DRF view of the same resource, whose querysets, serializers,
+paginator and permissions the async handlers borrow.
+
+The views are only routed when ``ASYNC_READ_VIEWS`` is on, which
+cravings.asgi does. Otherwise, as under WSGI where every async view would
+run in an event loop of its own, the endpoints go to the DRF views alone.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from . import views
+from .authentication import CachedJWTAuthentication
+from .instrumentation import measure_rendering, measure_serialization
+from .menu_cache import amenu_etag, aget_cached_menu, aset_cached_menu
+from .models import Cart
+from .routers import primary_reads
+from .roles import aget_roles, RESTAURANT_OWNER, DELIVERY_CREW, CUSTOMER
+
+
+class JSONResponse(HttpResponse):
+    """
+    Response already rendered by the view. It keeps ``data`` like DRF's
+    Response but has no ``render()``, which the async handler would run in
+    a thread.
+    """
+
+    def __init__(self, data, content, **kwargs):
+        super().__init__(content, **kwargs)
+        self.data = data
+
+
+class AsyncAPIView(View):
+    """
+    Serves GET and HEAD with the async ``get`` of a subclass and hands other
+    requests to ``sync_view_class``.
+
+    Only JSON is rendered here, and ``has_permission`` of permissions
+    without an ``ahas_permission`` must not do I/O. Handlers get the DRF
+    request; ``drf_view`` is the sync view set up for it.
+    """
+    sync_view_class = None
+    authentication_class = CachedJWTAuthentication
+    sync_view = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(sync_view=cls.sync_view_class.as_view(), **initkwargs)
+        # Like DRF's views; authentication is by token only
+        return csrf_exempt(view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+        drf_class = self.sync_view.cls
+        self.request = request = Request(request, authenticators=())
+        try:
+            renderer, media_type = drf_class.content_negotiation_class().select_renderer(
+                request, [renderer() for renderer in drf_class.renderer_classes]
+            )
+        except exceptions.NotAcceptable:
+            renderer = None
+        if not isinstance(renderer, JSONRenderer):
+            return await sync_to_async(self.sync_view)(request._request, *args, **kwargs)
+        request.accepted_renderer, request.accepted_media_type = renderer, media_type
+
+        self.drf_view = self.get_drf_view()
+        try:
+            await self.initial(request)
+            response = await self.get(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.finalize_response(request, response)
+
+    def get_drf_view(self):
+        view = self.sync_view.cls(**self.sync_view.initkwargs)
+        view.setup(self.request, *self.args, **self.kwargs)
+        view.format_kwarg = None
+        return view
+
+    async def initial(self, request):
+        # Only a test client's force_authenticate() sets authenticators
+        if not request.authenticators:
+            result = await self.authentication_class().aauthenticate(request)
+            if result is None:
+                result = api_settings.UNAUTHENTICATED_USER(), None
+            request.user, request.auth = result
+        for permission in self.drf_view.get_permissions():
+            check = getattr(permission, 'ahas_permission', None)
+            allowed = await check(request, self) if check else permission.has_permission(request, self)
+            if not allowed:
+                if not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(
+                    detail=getattr(permission, 'message', None), code=getattr(permission, 'code', None)
+                )
+
+    def check_object_permissions(self, request, obj):
+        for permission in self.drf_view.get_permissions():
+            if not permission.has_object_permission(request, self, obj):
+                raise exceptions.PermissionDenied(
+                    detail=getattr(permission, 'message', None), code=getattr(permission, 'code', None)
+                )
+
+    def handle_exception(self, exc):
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            exc.auth_header = self.authentication_class().authenticate_header(self.request)
+        context = {'view': self, 'args': self.args, 'kwargs': self.kwargs, 'request': self.request}
+        response = api_settings.EXCEPTION_HANDLER(exc, context)
+        if response is None:
+            raise exc
+        return response
+
+    def finalize_response(self, request, response):
+        with measure_rendering():
+            content = request.accepted_renderer.render(
+                response.data, request.accepted_media_type,
+                {'view': self, 'request': request, 'response': response},
+            )
+        rendered = JSONResponse(
+            response.data, content, status=response.status_code, content_type=request.accepted_media_type
+        )
+        for name, value in response.items():
+            if name != 'Content-Type':
+                rendered[name] = value
+        if not content:
+            del rendered['Content-Type']
+        # What DRF's finalize_response adds
+        rendered['Allow'] = ', '.join(self.drf_view.allowed_methods)
+        patch_vary_headers(rendered, ['Accept'])
+        return rendered
+
+
+class MenuItemList(AsyncAPIView):
+    sync_view_class = views.MenuItemList
+
+    async def get(self, request, restaurant_id):
+        # Loads the roles that menu_variant() and visible_to() read
+        await aget_roles(request.user)
+        etag = await amenu_etag(request, restaurant_id)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        cached = await aget_cached_menu(etag)
+        if cached is not None:
+            data, cached_headers = cached
+            return Response(data, headers={**cached_headers, **headers})
+
+        view = self.drf_view
+        projection = view.projection_class(request)
+        queryset = projection.project(view.filter_queryset(view.get_queryset()))
+        # Cached under the current version, see views.MenuItemList
+        with primary_reads():
+            page = await view.paginator.apaginate_queryset(queryset, request, view)
+        with measure_serialization():
+            data = projection.represent(page)
+        response = view.paginator.get_paginated_response(data)
+        link = {'Link': response['Link']} if response.has_header('Link') else {}
+        await aset_cached_menu(etag, [dict(row) for row in data], link)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+
+class CartView(AsyncAPIView):
+    sync_view_class = views.CartView
+
+    async def get(self, request):
+        carts = Cart.objects.with_related().with_total()
+        cart, created = await carts.aget_or_create(customer=request.user)
+        if created:
+            # Read back with its (empty) items and total
+            cart = await carts.aget(pk=cart.pk)
+        with measure_serialization():
+            data = self.drf_view.get_serializer(cart).data
+        return Response(data)
+
+
+class OrderDetail(AsyncAPIView):
+    sync_view_class = views.OrderDetail
+
+    async def get(self, request, pk):
+        await aget_roles(request.user)
+        order = await aget_object_or_404(self.drf_view.get_queryset(), pk=pk)
+        self.check_object_permissions(request, order)
+        with measure_serialization():
+            data = self.drf_view.get_serializer(order).data
+        return Response(data)
+
+
+class UserRoleView(AsyncAPIView):
+    sync_view_class = views.UserRoleView
+
+    async def get(self, request):
+        roles = await aget_roles(request.user)
+        if RESTAURANT_OWNER in roles:
+            return Response({'role': RESTAURANT_OWNER})
+        elif DELIVERY_CREW in roles:
+            return Response({'role': DELIVERY_CREW})
+        return Response({'role': CUSTOMER})
+
+
+class UserProfileView(AsyncAPIView):
+    sync_view_class = views.UserProfileView
+
+    async def get(self, request):
+        user = request.user
+        if user.get_deferred_fields():
+            user = await self.drf_view.get_queryset().aget(pk=user.pk)
+        with measure_serialization():
+            data = self.drf_view.get_serializer(user).data
+        return Response(data)
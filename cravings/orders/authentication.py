@@ -0,0 +1,128 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .routers import aread_own_writes, primary_reads, read_own_writes
+
+# Cache alias holding resolved users; bound its size with the backend's
+# MAX_ENTRIES (LocMemCache evicts least recently used) or maxmemory policy
+JWT_USER_CACHE = getattr(settings, 'JWT_USER_CACHE', 'default')
+JWT_USER_CACHE_TIMEOUT = getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 60 * 5)
+
+
+# The user fields kept in the cache: what the authentication checks need and
+# what djoser's current-user serializer reads, so /auth/users/me/ is served
+# without touching the user table. The password hash is not one of them.
+CACHED_USER_FIELDS = ('id', 'is_active', 'is_staff', 'username', 'email')
+
+
+def user_cache_key(user_id):
+    return f'orders:jwt-user-entry:{user_id}'
+
+
+def cache_entry(user):
+    """
+    What the cache keeps of ``user``: CACHED_USER_FIELDS and the digest of
+    the password hash that simplejwt puts in tokens to revoke them.
+    """
+    entry = {field: getattr(user, field) for field in CACHED_USER_FIELDS}
+    entry['password_digest'] = get_md5_hash_password(user.password)
+    return entry
+
+
+def user_from_entry(entry):
+    """
+    User built from a cache entry without a query. Only CACHED_USER_FIELDS
+    are loaded; the other fields are deferred and read from the database
+    when accessed.
+    """
+    User = get_user_model()
+    field_names = [field.attname for field in User._meta.concrete_fields if field.attname in CACHED_USER_FIELDS]
+    return User.from_db(None, field_names, [entry[field] for field in field_names])
+
+
+def invalidate_users(*users):
+    """
+    Drop the cached copies of ``users``; called when a user or their group
+    membership changes.
+    """
+    keys = [user_cache_key(getattr(user, api_settings.USER_ID_FIELD)) for user in users]
+    caches[JWT_USER_CACHE].delete_many(keys)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user from a cache instead of
+    the database on every request.
+
+    A user is only cached after passing JWTAuthentication's own checks, and
+    the inactive and changed-password checks run again on every cached copy.
+    The cache holds a few fields and a digest of the password hash rather
+    than the user, so cached requests get a user with the other fields
+    deferred. Users are loaded from the primary database, never a replica.
+    orders.signals drops the copy whenever the user is saved or deleted or
+    their groups change; changes made with ``QuerySet.update()`` send no
+    signals and are picked up when the entry expires.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        read_own_writes(user_id)
+        cache = caches[JWT_USER_CACHE]
+        key = user_cache_key(user_id)
+        entry = cache.get(key)
+        if entry is None:
+            with primary_reads():
+                user = super().get_user(validated_token)
+            cache.set(key, cache_entry(user), JWT_USER_CACHE_TIMEOUT)
+            return user
+        self.check_entry(entry, validated_token)
+        return user_from_entry(entry)
+
+    async def aauthenticate(self, request):
+        """
+        ``authenticate`` for async views: only a cache miss loads the user,
+        through JWTAuthentication in a thread.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return await sync_to_async(super().get_user)(validated_token)
+        await aread_own_writes(user_id)
+        cache = caches[JWT_USER_CACHE]
+        key = user_cache_key(user_id)
+        entry = await cache.aget(key)
+        if entry is None:
+            with primary_reads():
+                user = await sync_to_async(super().get_user)(validated_token)
+            await cache.aset(key, cache_entry(user), JWT_USER_CACHE_TIMEOUT)
+            return user
+        self.check_entry(entry, validated_token)
+        return user_from_entry(entry)
+
+    def check_entry(self, entry, validated_token):
+        # The checks JWTAuthentication.get_user makes after loading the user
+        if api_settings.CHECK_USER_IS_ACTIVE and not entry['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != entry['password_digest']:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code='password_changed'
+                )
@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
+
+from .models import Cart, CartItem, MenuItem
+
+ONE_RESTAURANT_MESSAGE = (
+    "You can only add items from one restaurant at a time. "
+    "Please empty your cart first to order from a different restaurant."
+)
+
+
+def lock_cart(customer):
+    """
+    Fetch (or create) ``customer``'s cart and lock its row until the end of the
+    current transaction, serializing every change to the cart.
+    """
+    cart, created = Cart.objects.select_for_update().get_or_create(customer=customer)
+    return cart
+
+
+def add_to_cart(customer, menu_item, quantity=1):
+    """
+    Add ``quantity`` of ``menu_item`` to the cart.
+
+    An existing line is incremented in place with a single UPDATE; a line
+    for that item can only exist if the cart already holds this restaurant's
+    food, so the one-restaurant rule is only checked when a new line is added.
+    """
+    lines = CartItem.objects.filter(cart__customer=customer, menu_item=menu_item)
+    if not lines.update(quantity=F('quantity') + quantity):
+        with transaction.atomic():
+            cart = lock_cart(customer)
+            other_restaurant = CartItem.objects.filter(cart=cart).exclude(
+                menu_item__restaurant_id=menu_item.restaurant_id
+            )
+            if other_restaurant.exists():
+                raise ValidationError(ONE_RESTAURANT_MESSAGE)
+            # Another request may have added the line while we waited for the lock
+            if not lines.update(quantity=F('quantity') + quantity):
+                CartItem.objects.create(cart=cart, menu_item=menu_item, quantity=quantity)
+    return lines.with_related().get()
+
+
+@transaction.atomic
+def apply_cart_operations(customer, operations):
+    """
+    Apply a list of ``add``, ``set`` and ``remove`` operations to the cart in
+    one transaction and return the updated cart.
+
+    The operations are folded into the final quantity of each line in memory,
+    the one-restaurant rule is checked against that final state, and the
+    result is written with at most one DELETE, one bulk UPDATE and one bulk
+    INSERT.
+    """
+    cart = lock_cart(customer)
+    lines = {
+        item.menu_item_id: item
+        for item in CartItem.objects.filter(cart=cart).select_related('menu_item')
+    }
+    quantities = {menu_item_id: item.quantity for menu_item_id, item in lines.items()}
+    for operation in operations:
+        menu_item_id = operation['menu_item']
+        if operation['op'] == 'add':
+            quantities[menu_item_id] = quantities.get(menu_item_id, 0) + operation['quantity']
+        elif operation['op'] == 'set':
+            quantities[menu_item_id] = operation['quantity']
+        else:
+            quantities.pop(menu_item_id, None)
+
+    menu_items = {menu_item_id: item.menu_item for menu_item_id, item in lines.items()}
+    menu_items.update(MenuItem.objects.in_bulk(set(quantities) - set(menu_items)))
+    missing = sorted(set(quantities) - set(menu_items))
+    if missing:
+        raise ValidationError({'menu_item': f'Invalid menu items: {missing}'})
+    if len({menu_items[menu_item_id].restaurant_id for menu_item_id in quantities}) > 1:
+        raise ValidationError(ONE_RESTAURANT_MESSAGE)
+
+    removed = [item.pk for menu_item_id, item in lines.items() if menu_item_id not in quantities]
+    changed = []
+    for menu_item_id, item in lines.items():
+        if menu_item_id in quantities and quantities[menu_item_id] != item.quantity:
+            item.quantity = quantities[menu_item_id]
+            changed.append(item)
+    added = [
+        CartItem(cart=cart, menu_item_id=menu_item_id, quantity=quantity)
+        for menu_item_id, quantity in quantities.items() if menu_item_id not in lines
+    ]
+
+    if removed:
+        CartItem.objects.filter(pk__in=removed).delete()
+    if changed:
+        CartItem.objects.bulk_update(changed, ['quantity'])
+    if added:
+        CartItem.objects.bulk_create(added)
+    return Cart.objects.with_related().with_total().get(pk=cart.pk)
@@ -0,0 +1,58 @@
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from . import rollups
+from .models import Cart, CartItem, Order, OrderItem
+from .transitions import PREPARING
+
+
+@transaction.atomic
+def place_order(customer, **order_fields):
+    """
+    Turn ``customer``'s cart into an order in a single transaction.
+
+    The cart row is locked first so concurrent checkouts and cart edits that
+    take the cart lock queue behind each other; the second of two racing
+    checkouts sees an empty cart instead of creating a duplicate order. The
+    lines are locked too, because quantity changes update them without the
+    cart lock. Only lines still holding the quantity that was priced are
+    removed, so a change that got in anyway stays in the cart rather than
+    being lost.
+    """
+    cart = Cart.objects.select_for_update().filter(customer=customer).first()
+    if cart is None:
+        raise ValidationError("Your cart is empty. Add items before placing an order.")
+
+    # Price and lock every line with one query
+    lines = list(
+        CartItem.objects.select_for_update(of=('self',)).filter(cart=cart).order_by('id').values_list(
+            'id', 'menu_item_id', 'quantity', 'menu_item__price', 'menu_item__restaurant_id'
+        )
+    )
+    if not lines:
+        raise ValidationError("Your cart is empty. Add items before placing an order.")
+
+    order = Order.objects.create(
+        customer=customer,
+        restaurant_id=lines[0][4],
+        total=sum(quantity * price for _, _, quantity, price, _ in lines),
+        status=PREPARING,
+        **order_fields
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, menu_item_id=menu_item_id, quantity=quantity, unit_price=price)
+        for _, menu_item_id, quantity, price, _ in lines
+    ])
+    rollups.apply_order(order, [
+        (menu_item_id, quantity, price) for _, menu_item_id, quantity, price, _ in lines
+    ])
+
+    # Only remove the lines as they were priced into this order
+    CartItem.objects.filter(
+        reduce(or_, (Q(pk=line_id, quantity=quantity) for line_id, _, quantity, _, _ in lines))
+    ).delete()
+    return order
@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Order
+from .transitions import OUT_FOR_DELIVERY, READY, TransitionConflict, transition
+from .workload import adjust_load, crew_with_load, reserve_load
+
+# Orders a driver takes from one restaurant in one dispatch run
+DISPATCH_BATCH_SIZE = getattr(settings, 'DISPATCH_BATCH_SIZE', 3)
+# Active orders above which a driver gets no more
+DISPATCH_MAX_LOAD = getattr(settings, 'DISPATCH_MAX_LOAD', 5)
+# Orders in these states that have no driver yet are waiting for one; the
+# restaurant marks an order ready once the food can be picked up
+AWAITING_DISPATCH = (READY,)
+
+
+def waiting_orders():
+    """
+    Orders of auto-dispatch restaurants that still need a driver.
+    """
+    return Order.objects.filter(
+        restaurant__auto_dispatch=True, status__in=AWAITING_DISPATCH, delivery_crew__isnull=True
+    )
+
+
+def dispatch_restaurant(restaurant_id, crew_ids=None, batch_size=None, max_load=None):
+    """
+    Hand a restaurant's waiting orders, oldest first, to the least loaded
+    delivery crew members (of ``crew_ids``, when given), up to ``batch_size``
+    orders per driver. Returns ``{crew_id: [order_id, ...]}``.
+
+    Drivers are reserved with ``reserve_load``, so runs for different
+    restaurants can go on concurrently without taking anyone past
+    ``max_load``. Where the database supports it the waiting orders are
+    locked with SKIP LOCKED, so concurrent runs for the same restaurant take
+    different orders. The orders go out for delivery through
+    ``orders.transitions.transition``; one taken by another run (or assigned
+    by hand meanwhile) is left alone and its reservation given back.
+    Orders no driver has room for wait for the next run.
+    """
+    batch_size = batch_size or DISPATCH_BATCH_SIZE
+    max_load = max_load or DISPATCH_MAX_LOAD
+    assignments = {}
+    with transaction.atomic():
+        pending = list(
+            waiting_orders().filter(restaurant_id=restaurant_id).select_for_update(skip_locked=True, of=('self',))
+            .order_by('order_date', 'id').values_list('id', flat=True)
+        )
+        if not pending:
+            return assignments
+        crew = crew_with_load(use_counters=True).filter(assigned_orders__lt=max_load)
+        if crew_ids is not None:
+            crew = crew.filter(pk__in=crew_ids)
+        for member in crew.order_by('assigned_orders', 'id')[:len(pending)]:
+            count = min(batch_size, max_load - member.assigned_orders, len(pending))
+            if not reserve_load(member.pk, count, max_load):
+                # Filled up by a concurrent run since it was read
+                continue
+            batch, pending = pending[:count], pending[count:]
+            try:
+                # Only the orders still waiting; they count towards the
+                # driver's load once moved, so the reservation is given back
+                assigned = transition(
+                    waiting_orders().filter(pk__in=batch).select_related('restaurant'), OUT_FOR_DELIVERY, member
+                )
+            except TransitionConflict:
+                assigned = []
+            adjust_load(member.pk, -count)
+            if assigned:
+                moved = {order.pk for order in assigned}
+                assignments[member.pk] = [order_id for order_id in batch if order_id in moved]
+            if not pending:
+                break
+    return assignments
+
+
+def dispatch_waiting(restaurant_ids=None, workers=1, **options):
+    """
+    Run ``dispatch_restaurant`` for every auto-dispatch restaurant with
+    waiting orders (of ``restaurant_ids``, when given), ``workers``
+    restaurants at a time, and return all the assignments.
+    """
+    waiting = waiting_orders()
+    if restaurant_ids is not None:
+        waiting = waiting.filter(restaurant_id__in=restaurant_ids)
+    restaurant_ids = list(waiting.order_by('restaurant_id').values_list('restaurant_id', flat=True).distinct())
+
+    def run(share):
+        assignments = {}
+        try:
+            for restaurant_id in share:
+                for crew_id, order_ids in dispatch_restaurant(restaurant_id, **options).items():
+                    assignments.setdefault(crew_id, []).extend(order_ids)
+        finally:
+            if workers > 1:
+                connection.close()
+        return assignments
+
+    if workers <= 1:
+        return run(restaurant_ids)
+    assignments = {}
+    with ThreadPoolExecutor(workers) as pool:
+        for result in pool.map(run, [restaurant_ids[i::workers] for i in range(workers)]):
+            for crew_id, order_ids in result.items():
+                assignments.setdefault(crew_id, []).extend(order_ids)
+    return assignments
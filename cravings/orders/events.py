@@ -0,0 +1,133 @@
+import asyncio
+import itertools
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+class BaseBroker:
+    """
+    Pub/sub backend for order events. Events are addressed to user ids; every
+    open stream of a user receives the events published to them.
+    """
+
+    def publish(self, user_ids, event):
+        raise NotImplementedError
+
+    def subscribe(self, user_id):
+        """
+        Return a ``Subscription`` bound to the running event loop.
+        """
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class Subscription:
+    def __init__(self, broker, user_id, max_pending):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_pending)
+
+    def deliver(self, event):
+        # A subscriber that stopped reading loses its oldest events rather
+        # than growing without bound; clients refetch the order on reconnect.
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """
+        Wait for the next event; returns ``None`` on timeout.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker(BaseBroker):
+    """
+    Broker for a single process: events published from any thread are handed
+    to the subscribers' event loops. Streams served by other worker processes
+    do not see them, so multi-worker deployments need a shared backend.
+    """
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id, self.max_pending)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_ids, event):
+        with self._lock:
+            subscriptions = [
+                subscription
+                for user_id in set(user_ids)
+                for subscription in self._subscribers.get(user_id, ())
+            ]
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    backend = getattr(settings, 'ORDER_EVENTS_BACKEND', 'orders.events.InProcessBroker')
+    return import_string(backend)()
+
+
+_event_ids = itertools.count(1)
+
+
+def order_event(order):
+    return {
+        'id': next(_event_ids),
+        'type': 'order_status',
+        'order': order.pk,
+        'status': order.status,
+        'restaurant': order.restaurant_id,
+        'delivery_crew': order.delivery_crew_id,
+        'timestamp': timezone.now().isoformat(),
+    }
+
+
+def publish_order_event(order, also_notify=()):
+    """
+    Push ``order``'s current status to its customer, the restaurant owner and
+    the assigned delivery crew member once the surrounding transaction commits.
+    """
+    recipients = {order.customer_id, order.restaurant.owner_id, order.delivery_crew_id, *also_notify}
+    recipients.discard(None)
+    event = order_event(order)
+    transaction.on_commit(lambda: get_broker().publish(recipients, event))
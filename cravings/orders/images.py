@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from .menu_cache import bump_menu_version
+from .models import MenuItem
+
+logger = logging.getLogger(__name__)
+
+MENU_IMAGE_WORKERS = getattr(settings, 'MENU_IMAGE_WORKERS', 2)
+MENU_IMAGE_FORMAT = getattr(settings, 'MENU_IMAGE_FORMAT', 'WEBP')
+MENU_IMAGE_QUALITY = getattr(settings, 'MENU_IMAGE_QUALITY', 80)
+
+# name -> (width, height, crop). Cropped variants fill the box exactly,
+# the others fit inside it and keep the aspect ratio.
+VARIANTS = {
+    'thumbnail': (160, 160, True),
+    'card': (480, 360, True),
+    'full': (1280, 1280, False),
+}
+LARGEST_VARIANT = (
+    max(width for width, height, crop in VARIANTS.values()),
+    max(height for width, height, crop in VARIANTS.values()),
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MENU_IMAGE_WORKERS, thread_name_prefix='menu-images'
+            )
+        return _executor
+
+
+def variant_path(source_name, variant):
+    return f"menu_items/variants/{os.path.basename(source_name)}.{variant}.{MENU_IMAGE_FORMAT.lower()}"
+
+
+def current_variants(image_name, image_variants):
+    """
+    The entries of ``image_variants`` rendered from the image ``image_name``.
+    """
+    if not image_name:
+        return {}
+    return {
+        name: entry for name, entry in (image_variants or {}).items()
+        if entry['source'] == image_name
+    }
+
+
+def is_current(menu_item, variant):
+    return variant in current_variants(menu_item.image.name, menu_item.image_variants)
+
+
+def needs_variants(menu_item):
+    if not menu_item.image:
+        return bool(menu_item.image_variants)
+    return not all(is_current(menu_item, variant) for variant in VARIANTS)
+
+
+def render(original, width, height, crop):
+    if crop:
+        image = ImageOps.fit(original, (width, height), Image.Resampling.LANCZOS)
+    else:
+        image = original.copy()
+        image.thumbnail((width, height), Image.Resampling.LANCZOS)
+    output = BytesIO()
+    image.save(output, MENU_IMAGE_FORMAT, quality=MENU_IMAGE_QUALITY, optimize=True)
+    return image.size, output.getvalue()
+
+
+def generate_variants(menu_item_id, force=False):
+    """
+    Render the missing or outdated variants of a menu item's image and record
+    them on the item. Returns the number of variants rendered.
+    """
+    menu_item = MenuItem.objects.filter(pk=menu_item_id).first()
+    if menu_item is None:
+        return 0
+    storage = MenuItem._meta.get_field('image').storage
+    previous = dict(menu_item.image_variants or {})
+    source = menu_item.image.name if menu_item.image else ''
+
+    variants = {}
+    rendered = 0
+    if source:
+        todo = {
+            name: spec for name, spec in VARIANTS.items()
+            if force or not is_current(menu_item, name) or not storage.exists(previous[name]['path'])
+        }
+        if todo:
+            with menu_item.image.open('rb') as image_file, Image.open(image_file) as original:
+                # Let JPEG decode at a reduced scale that still covers the
+                # largest variant instead of at full camera resolution
+                original.draft('RGB', LARGEST_VARIANT)
+                original = ImageOps.exif_transpose(original)
+                if original.mode not in ('RGB', 'RGBA'):
+                    original = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+                for name, (width, height, crop) in todo.items():
+                    size, content = render(original, width, height, crop)
+                    path = storage.save(variant_path(source, name), ContentFile(content))
+                    variants[name] = {
+                        'source': source, 'path': path,
+                        'width': size[0], 'height': size[1], 'bytes': len(content),
+                    }
+                    rendered += 1
+        variants = {name: variants.get(name, previous.get(name)) for name in VARIANTS}
+
+    if variants == previous:
+        return rendered
+    # Only record the variants if the image has not been replaced meanwhile
+    unchanged = Q(image=source) if source else Q(image='') | Q(image__isnull=True)
+    updated = MenuItem.objects.filter(unchanged, pk=menu_item_id).update(image_variants=variants)
+    if not updated:
+        return rendered
+    current_paths = {entry['path'] for entry in variants.values()}
+    for entry in previous.values():
+        if entry['path'] not in current_paths and storage.exists(entry['path']):
+            storage.delete(entry['path'])
+    transaction.on_commit(lambda: bump_menu_version(menu_item.restaurant_id))
+    return rendered
+
+
+def _run(menu_item_id):
+    try:
+        generate_variants(menu_item_id)
+    except Exception:
+        logger.exception("Could not generate image variants for menu item %s", menu_item_id)
+    finally:
+        # Pool threads outlive the task; don't leave their connections open
+        connections.close_all()
+
+
+def schedule_variants(menu_item_id):
+    """
+    Queue variant generation on the worker pool once the surrounding
+    transaction commits, so the worker sees the saved image.
+    """
+    transaction.on_commit(lambda: get_executor().submit(_run, menu_item_id))
@@ -0,0 +1,346 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in milliseconds, of the latency histogram buckets; slower
+# requests land in a final overflow bucket
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Slow request logs cut the text of each query to this length
+MAX_LOGGED_SQL = 1000
+
+_current = ContextVar('orders_request_timer', default=None)
+
+
+class RequestTimer:
+    """
+    SQL, serializer and render timings of one request. ``time_query`` hands
+    it every statement run while the request is handled, and it keeps the
+    ``keep_queries`` slowest.
+    """
+
+    def __init__(self, keep_queries):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.render_time = 0.0
+        self.serializing = False
+        self.keep_queries = keep_queries
+        # Min-heap of (duration, sequence, sql)
+        self.worst = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.sql_time += duration
+            if self.keep_queries:
+                entry = (duration, self.queries, sql)
+                if len(self.worst) < self.keep_queries:
+                    heapq.heappush(self.worst, entry)
+                elif duration > self.worst[0][0]:
+                    heapq.heapreplace(self.worst, entry)
+
+    def worst_queries(self):
+        return [(duration, sql) for duration, sequence, sql in sorted(self.worst, reverse=True)]
+
+    def server_timing(self, total):
+        return (
+            f'db;dur={self.sql_time * 1000:.2f};desc="{self.queries} queries", '
+            f'serialize;dur={self.serializer_time * 1000:.2f}, '
+            f'render;dur={self.render_time * 1000:.2f}, '
+            f'total;dur={total * 1000:.2f}'
+        )
+
+
+def time_query(execute, sql, params, many, context):
+    timer = _current.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install_query_timing(connection, **kwargs):
+    """
+    ``connection_created`` receiver adding ``time_query`` to the execute
+    wrappers of every connection. It finds the request's timer through the
+    context variable, which sync_to_async carries into the threads async
+    views run their queries in; those connections belong to threads the
+    middleware never sees.
+    """
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+@contextmanager
+def measure_serialization():
+    """
+    Count the enclosed block as serializer time of the current request.
+    Nested blocks are only counted once.
+    """
+    timer = _current.get()
+    if timer is None or timer.serializing:
+        yield
+        return
+    timer.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.serializer_time += time.perf_counter() - started
+        timer.serializing = False
+
+
+@contextmanager
+def measure_rendering():
+    """
+    Count the enclosed block as render time of the current request, for
+    responses rendered by the view itself.
+    """
+    timer = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timer is not None:
+            timer.render_time += time.perf_counter() - started
+
+
+class MeasuredSerializerMixin:
+    """
+    The actions of DRF's generic view mixins, with building the serializer's
+    output in ``.data`` counted as serializer time of the request.
+    """
+
+    def serialized(self, serializer):
+        with measure_serialization():
+            return serializer.data
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialized(self.get_serializer(page, many=True)))
+        return Response(self.serialized(self.get_serializer(queryset, many=True)))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.serialized(self.get_serializer(self.get_object())))
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        data = self.serialized(serializer)
+        return Response(data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(data))
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        if getattr(instance, '_prefetched_objects_cache', None):
+            # Prefetched relations are stale after the update
+            instance._prefetched_objects_cache = {}
+        return Response(self.serialized(serializer))
+
+
+class RouteStats:
+    __slots__ = ('count', 'errors', 'buckets', 'total', 'longest', 'queries', 'sql', 'serializer', 'render')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.longest = 0.0
+        self.queries = 0
+        self.sql = 0.0
+        self.serializer = 0.0
+        self.render = 0.0
+
+    def percentile(self, percent):
+        # Upper bound of the bucket holding the percentile, capped at the
+        # slowest request seen
+        rank = self.count * percent / 100
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.longest)
+        return self.longest
+
+    def per_request_ms(self, seconds):
+        return round(seconds * 1000 / self.count, 3)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'latency_ms': {
+                'mean': self.per_request_ms(self.total),
+                'p50': round(self.percentile(50), 3),
+                'p95': round(self.percentile(95), 3),
+                'p99': round(self.percentile(99), 3),
+                'max': round(self.longest, 3),
+            },
+            'queries_per_request': round(self.queries / self.count, 2),
+            'sql_ms_per_request': self.per_request_ms(self.sql),
+            'serializer_ms_per_request': self.per_request_ms(self.serializer),
+            'render_ms_per_request': self.per_request_ms(self.render),
+            'histogram': list(self.buckets),
+        }
+
+
+class MetricsRegistry:
+    """
+    Per-route latency histograms and totals of this process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.routes = {}
+            self.since = timezone.now()
+
+    def record(self, route, method, status, duration, timer):
+        latency = duration * 1000
+        with self.lock:
+            stats = self.routes.get((route, method))
+            if stats is None:
+                stats = self.routes[(route, method)] = RouteStats()
+            stats.count += 1
+            if status >= 500:
+                stats.errors += 1
+            stats.buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+            stats.total += duration
+            stats.longest = max(stats.longest, latency)
+            stats.queries += timer.queries
+            stats.sql += timer.sql_time
+            stats.serializer += timer.serializer_time
+            stats.render += timer.render_time
+
+    def snapshot(self):
+        with self.lock:
+            routes = [
+                {'route': route, 'method': method, **stats.as_dict()}
+                for (route, method), stats in self.routes.items()
+            ]
+            since = self.since
+        # Where the time goes first
+        routes.sort(key=lambda row: row['latency_ms']['mean'] * row['count'], reverse=True)
+        return {
+            'pid': os.getpid(),
+            'since': since,
+            'buckets_ms': list(LATENCY_BUCKETS),
+            'routes': routes,
+        }
+
+
+registry = MetricsRegistry()
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unmatched>'
+    return match.view_name or match.route
+
+
+class RequestMetricsMiddleware:
+    """
+    Record latency, SQL query count and time, and serializer and render time
+    of every request. Adds a ``Server-Timing`` header, logs requests slower
+    than ``REQUEST_METRICS_SLOW_MS`` with their slowest queries, and feeds the
+    per-route histograms served by ``RequestMetricsView``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'REQUEST_METRICS_SLOW_MS', 500)
+        self.worst_queries = getattr(settings, 'REQUEST_METRICS_WORST_QUERIES', 3)
+        self.server_timing = getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', True)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Django runs a sync hook of an async middleware in a thread
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timer = RequestTimer(self.worst_queries)
+        token = _current.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, timer)
+
+    async def __acall__(self, request):
+        timer = RequestTimer(self.worst_queries)
+        token = _current.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, timer)
+
+    def record(self, request, response, timer):
+        duration = time.perf_counter() - timer.started
+        route = route_name(request)
+        registry.record(route, request.method, response.status_code, duration, timer)
+        if self.server_timing:
+            response['Server-Timing'] = timer.server_timing(duration)
+        if duration * 1000 >= self.slow_ms:
+            self.log_slow_request(request, route, response, duration, timer)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns
+        timer = _current.get()
+        if timer is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                timer.render_time += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    async def aprocess_template_response(self, request, response):
+        return RequestMetricsMiddleware.process_template_response(self, request, response)
+
+    def log_slow_request(self, request, route, response, duration, timer):
+        worst = ''.join(
+            f'\n  {query_time * 1000:.1f}ms {sql[:MAX_LOGGED_SQL]}'
+            for query_time, sql in timer.worst_queries()
+        )
+        logger.warning(
+            'Slow request %s %s (%s) -> %s in %.1fms: %d queries in %.1fms, '
+            'serializers %.1fms, render %.1fms%s',
+            request.method, request.get_full_path(), route, response.status_code,
+            duration * 1000, timer.queries, timer.sql_time * 1000,
+            timer.serializer_time * 1000, timer.render_time * 1000, worst,
+        )
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.archive import ORDER_ARCHIVE_AFTER_DAYS, archive_batch, archive_cutoff, archivable_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Move delivered and cancelled orders older than --days, with their items, "
+        "into the archive tables in batches. Every batch commits on its own, so "
+        "the command can be stopped and rerun at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=ORDER_ARCHIVE_AFTER_DAYS,
+            help=f'Archive orders older than this (default: {ORDER_ARCHIVE_AFTER_DAYS})',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+        parser.add_argument(
+            '--pause', type=float, default=0, help='Seconds to sleep between batches'
+        )
+
+    def handle(self, *args, **options):
+        # Fixed for the whole run, so it ends even while new orders age past the cutoff
+        before = archive_cutoff(options['days'])
+        orders = archivable_orders(before)
+        moved = batches = 0
+        started = time.perf_counter()
+        while options['max_batches'] is None or batches < options['max_batches']:
+            count = archive_batch(orders, options['batch_size'])
+            if not count:
+                break
+            moved += count
+            batches += 1
+            self.stdout.write(f"Batch {batches}: archived {count} orders ({moved} so far)")
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(
+            f"Archived {moved} orders placed before {before:%Y-%m-%d %H:%M} "
+            f"in {batches} batches, {time.perf_counter() - started:.1f}s"
+        )
@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from orders.images import generate_variants
+from orders.models import MenuItem
+
+
+def backfill(menu_item_id, force):
+    try:
+        return generate_variants(menu_item_id, force=force)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the image variants of every menu item that has an image, "
+        "skipping variants that are already up to date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--force', action='store_true', help="Re-render up-to-date variants too.")
+
+    def handle(self, *args, **options):
+        ids = list(
+            MenuItem.objects.exclude(image='').exclude(image__isnull=True)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        rendered = failed = 0
+        for pk, result in self.run(ids, options['workers'], options['force']):
+            if isinstance(result, Exception):
+                failed += 1
+                self.stderr.write(f"Menu item {pk}: {result}")
+            else:
+                rendered += result
+        self.stdout.write(
+            f"Checked {len(ids)} menu items, rendered {rendered} variants, {failed} failed"
+        )
+
+    def run(self, ids, workers, force):
+        if workers <= 1:
+            for pk in ids:
+                try:
+                    yield pk, generate_variants(pk, force=force)
+                except Exception as error:
+                    yield pk, error
+            return
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(backfill, pk, force): pk for pk in ids}
+            for future, pk in futures.items():
+                try:
+                    yield pk, future.result()
+                except Exception as error:
+                    yield pk, error
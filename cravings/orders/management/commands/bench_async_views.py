@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from orders.models import CartItem, Order
+
+from .seed_data import PREFIX
+
+STACKS = ('sync', 'async')
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve cravings.asgi with uvicorn, once with the DRF views alone and once "
+        "with orders.async_views, and compare throughput and latency of the hot "
+        "read endpoints at several numbers of concurrent keep-alive connections. "
+        "Needs uvicorn and the dataset made by seed_data; only reads."
+    )
+    # --serve decides which views the URLconf imports, so checks must not load it first
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, action='append',
+            help='Concurrent connections; repeat for several levels (default: 1, 16, 64, 256)',
+        )
+        parser.add_argument('--requests', type=int, default=1000, help='Timed requests per endpoint and level')
+        parser.add_argument('--warmup', type=int, default=50)
+        parser.add_argument('--only', action='append', help='Only run endpoints whose name contains this')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--label', default='', help='Stored in the report, e.g. a commit id')
+        parser.add_argument('--output', help='Also write the report to this file')
+        parser.add_argument('--serve', choices=STACKS, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError('bench_async_views needs uvicorn: pip install uvicorn')
+        if options['serve']:
+            settings.ASYNC_READ_VIEWS = options['serve'] == 'async'
+            uvicorn.run('cravings.asgi:application', port=options['port'], log_level='warning', lifespan='off')
+            return
+
+        endpoints = self.endpoints()
+        if options['only']:
+            endpoints = {
+                name: url for name, url in endpoints.items() if any(part in name for part in options['only'])
+            }
+        levels = options['concurrency'] or [1, 16, 64, 256]
+        results = {}
+        for stack in STACKS:
+            server = subprocess.Popen([
+                sys.executable, sys.argv[0], 'bench_async_views', '--serve', stack, '--port', str(options['port']),
+            ])
+            try:
+                self.wait_for_port(options['port'], server)
+                results[stack] = asyncio.run(
+                    self.run_stack(endpoints, levels, options['requests'], options['warmup'], options['port'], server.pid)
+                )
+            finally:
+                server.terminate()
+                server.wait()
+
+        report = {
+            'label': options['label'],
+            'server': f'uvicorn {uvicorn.__version__}, 1 worker',
+            'requests': options['requests'],
+            'stacks': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output)
+        self.stdout.write(output)
+
+    def endpoints(self):
+        """
+        The read endpoints as a seeded customer with a cart and orders, with
+        the customer's access token.
+        """
+        line = (
+            CartItem.objects.filter(cart__customer__username__startswith=f'{PREFIX}-')
+            .select_related('cart__customer').order_by('id').first()
+        )
+        order = line and Order.objects.filter(customer=line.cart.customer).order_by('-id').first()
+        if order is None:
+            raise CommandError('No seeded dataset found; run seed_data first')
+        customer = line.cart.customer
+        self.token = str(AccessToken.for_user(customer))
+        return {
+            'menuitem-list': reverse('menuitem-list', args=[order.restaurant_id]),
+            'order-detail': reverse('order-detail', args=[order.pk]),
+            'cart': reverse('cart'),
+            'user-role': reverse('user-role'),
+            'user-profile': reverse('user-profile'),
+        }
+
+    def wait_for_port(self, port, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'uvicorn exited with status {server.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        raise CommandError(f'uvicorn did not listen on port {port} within {timeout}s')
+
+    async def run_stack(self, endpoints, levels, count, warmup, port, pid):
+        results = {}
+        for name, url in endpoints.items():
+            request = (
+                f'GET {url} HTTP/1.1\r\nHost: localhost\r\nAccept: application/json\r\n'
+                f'Authorization: Bearer {self.token}\r\n\r\n'
+            ).encode()
+            await self.load(request, 1, warmup, port)
+            results[name] = {}
+            for concurrency in levels:
+                sampler = asyncio.ensure_future(self.sample_threads(pid))
+                started = time.perf_counter()
+                timings, errors = await self.load(request, concurrency, count, port)
+                elapsed = time.perf_counter() - started
+                sampler.cancel()
+                peak_threads = await sampler
+                timings.sort()
+                results[name][concurrency] = {
+                    'throughput_rps': round(count / elapsed, 1),
+                    'p50_ms': round(statistics.median(timings), 3),
+                    'p99_ms': round(timings[min(len(timings) - 1, round(len(timings) * 0.99))], 3),
+                    'errors': errors,
+                    'peak_server_threads': peak_threads,
+                }
+        return results
+
+    async def load(self, request, concurrency, count, port):
+        """
+        Send ``count`` requests over ``concurrency`` keep-alive connections
+        and return their latencies in milliseconds and the number of
+        responses that were not 200.
+        """
+        remaining = count
+        timings = []
+        errors = 0
+
+        async def connection():
+            nonlocal remaining, errors
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            try:
+                while remaining > 0:
+                    remaining -= 1
+                    started = time.perf_counter()
+                    writer.write(request)
+                    status = await self.read_response(reader)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    if status != 200:
+                        errors += 1
+            finally:
+                writer.close()
+
+        await asyncio.gather(*(connection() for _ in range(concurrency)))
+        return timings, errors
+
+    async def read_response(self, reader):
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.partition(b':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get(b'transfer-encoding') == b'chunked':
+            while size := int(await reader.readline(), 16):
+                await reader.readexactly(size + 2)
+            await reader.readline()
+        elif b'content-length' in headers:
+            await reader.readexactly(int(headers[b'content-length']))
+        return status
+
+    async def sample_threads(self, pid):
+        # Most threads the server ran until cancelled, read from /proc on Linux
+        peak = None
+        try:
+            while True:
+                with open(f'/proc/{pid}/status') as status:
+                    for line in status:
+                        if line.startswith('Threads:'):
+                            peak = max(peak or 0, int(line.split()[1]))
+                await asyncio.sleep(0.01)
+        except (OSError, asyncio.CancelledError):
+            return peak
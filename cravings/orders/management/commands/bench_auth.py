@@ -0,0 +1,62 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from orders.authentication import CachedJWTAuthentication, invalidate_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-request cost of authenticating a JWT with "
+        "JWTAuthentication and with CachedJWTAuthentication."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=100, help='Distinct users taking turns')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=f'bench-auth-{i}', password='!') for i in range(options['users'])
+            ])
+            factory = RequestFactory(SERVER_NAME='localhost')
+            requests = [
+                factory.get('/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+                for user in users
+            ]
+            invalidate_users(*users)
+            report = {
+                'vendor': connection.vendor,
+                'users': len(users),
+                'jwt': self.measure(JWTAuthentication(), requests, options['requests']),
+                'cached_jwt': self.measure(CachedJWTAuthentication(), requests, options['requests']),
+            }
+            invalidate_users(*users)
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def measure(self, authentication, requests, count):
+        timings = []
+        with CaptureQueriesContext(connection) as captured:
+            for i in range(count):
+                request = requests[i % len(requests)]
+                started = time.perf_counter()
+                user, token = authentication.authenticate(request)
+                timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+        return {
+            'requests': count,
+            'p50_us': round(statistics.median(timings), 1),
+            'p95_us': round(timings[min(len(timings) - 1, max(0, round(len(timings) * 0.95) - 1))], 1),
+            'mean_us': round(statistics.fmean(timings), 1),
+            'queries_per_request': round(len(captured) / count, 3),
+        }
@@ -0,0 +1,73 @@
+import json
+import statistics
+import time
+from datetime import time as clock
+from decimal import Decimal
+
+from django.contrib.auth.models import User, Group
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from orders.models import Restaurant, MenuItem
+from orders.roles import CUSTOMER
+
+
+class Command(BaseCommand):
+    help = "Measure add-to-cart and cart read latency and queries per request."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--menu-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        prefix = f'bench-cart-{int(time.time())}'
+        owner = User.objects.create_user(f'{prefix}-owner')
+        customer = User.objects.create_user(f'{prefix}-customer')
+        customer.groups.add(Group.objects.get_or_create(name=CUSTOMER)[0])
+        restaurant = Restaurant.objects.create(
+            name=prefix, opening_time=clock(0), closing_time=clock(23, 59), owner=owner
+        )
+        menu_items = MenuItem.objects.bulk_create([
+            MenuItem(restaurant=restaurant, name=f'{prefix}-{i}', price=Decimal('4.50') + i)
+            for i in range(options['menu_size'])
+        ])
+
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(customer)
+        try:
+            add = self.measure(options['requests'], lambda i: client.post(
+                reverse('cartitem-list'),
+                {'menu_item': menu_items[i % len(menu_items)].pk, 'quantity': 1},
+                format='json',
+            ))
+            read = self.measure(options['requests'], lambda i: client.get(reverse('cart')))
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+
+        self.stdout.write(json.dumps({
+            'vendor': connection.vendor,
+            'add_to_cart': add,
+            'cart_read': read,
+        }, indent=2))
+
+    def measure(self, count, request):
+        timings = []
+        queries = []
+        for i in range(count):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = request(i)
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{response.status_code}: {response.content[:200]}')
+            queries.append(len(captured))
+        timings.sort()
+        return {
+            'requests': count,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 3),
+            'queries_per_request': round(sum(queries) / len(queries), 2),
+        }
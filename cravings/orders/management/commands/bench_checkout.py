@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+from datetime import time as clock
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.exceptions import ValidationError
+
+from orders.checkout import place_order
+from orders.models import Restaurant, MenuItem, Cart, CartItem, Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark concurrent checkout: several threads race to check out the same "
+        "carts, then every order is verified to be complete and unique."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=8)
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--racers', type=int, default=2,
+                            help='Concurrent checkout attempts per cart')
+        parser.add_argument('--lines', type=int, default=5, help='Cart lines per checkout')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark data')
+
+    def handle(self, *args, **options):
+        prefix = f'bench-checkout-{int(time.time())}'
+        owner = User.objects.create_user(f'{prefix}-owner')
+        restaurant = Restaurant.objects.create(
+            name=prefix, opening_time=clock(0), closing_time=clock(23, 59), owner=owner
+        )
+        menu_items = MenuItem.objects.bulk_create([
+            MenuItem(restaurant=restaurant, name=f'{prefix}-{i}', price=Decimal('5.00') + i)
+            for i in range(options['lines'])
+        ])
+        customers = [
+            User.objects.create_user(f'{prefix}-customer-{i}') for i in range(options['customers'])
+        ]
+        carts = [Cart.objects.create(customer=customer) for customer in customers]
+        expected_total = sum(item.price * (n + 1) for n, item in enumerate(menu_items))
+
+        errors = []
+        attempts = 0
+        started = time.perf_counter()
+        try:
+            for _ in range(options['rounds']):
+                CartItem.objects.bulk_create([
+                    CartItem(cart=cart, menu_item=item, quantity=n + 1)
+                    for cart in carts for n, item in enumerate(menu_items)
+                ])
+                threads = [
+                    threading.Thread(target=self.checkout, args=(customer, errors))
+                    for customer in customers for _ in range(options['racers'])
+                ]
+                attempts += len(threads)
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            elapsed = time.perf_counter() - started
+
+            orders = Order.objects.filter(restaurant=restaurant).with_related()
+            placed = len(orders)
+            partial = [
+                order.pk for order in orders
+                if len(order.items.all()) != len(menu_items) or order.total != expected_total
+            ]
+            report = {
+                'vendor': connection.vendor,
+                'customers': len(customers),
+                'rounds': options['rounds'],
+                'attempts': attempts,
+                'orders': placed,
+                'expected_orders': len(customers) * options['rounds'],
+                'orders_per_second': round(placed / elapsed, 2),
+                'seconds': round(elapsed, 3),
+                'partial_orders': len(partial),
+                'leftover_cart_items': CartItem.objects.filter(cart__in=carts).count(),
+                'errors': errors[:10],
+            }
+        finally:
+            if not options['keep']:
+                Order.objects.filter(restaurant=restaurant).delete()
+                User.objects.filter(username__startswith=prefix).delete()
+
+        self.stdout.write(json.dumps(report, indent=2))
+        if report['orders'] != report['expected_orders'] or partial or errors:
+            self.stderr.write('Checkout invariants violated')
+
+    def checkout(self, customer, errors):
+        try:
+            place_order(customer, delivery_address='1 Benchmark Road')
+        except ValidationError:
+            # Lost the race: the cart was already checked out
+            pass
+        except Exception as exc:
+            errors.append(repr(exc))
+        finally:
+            connection.close()
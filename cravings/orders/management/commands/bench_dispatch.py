@@ -0,0 +1,154 @@
+import json
+import random
+import statistics
+import time
+from datetime import time as clock
+from decimal import Decimal
+
+from django.contrib.auth.models import User, Group
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from orders.dispatch import DISPATCH_BATCH_SIZE, DISPATCH_MAX_LOAD, dispatch_waiting
+from orders.models import Restaurant, Order, DeliveryLoad
+from orders.roles import DELIVERY_CREW
+from orders.workload import adjust_load, crew_with_load
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate automatic dispatch: every round new orders come in at each "
+        "restaurant, dispatch_waiting assigns them and drivers deliver some of "
+        "what they carry. Reports assignments per second and how evenly load "
+        "is spread, and checks that no driver ever exceeds the load limit and "
+        "that the load counters match the orders. Repeats the simulation for "
+        "every --workers value."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=20)
+        parser.add_argument('--crew', type=int, default=40)
+        parser.add_argument('--rounds', type=int, default=30)
+        parser.add_argument('--orders-per-round', type=int, default=60,
+                            help='Orders placed per round, spread at random over the restaurants')
+        parser.add_argument('--deliver', type=float, default=0.4,
+                            help='Chance that a driver delivers each active order in a round')
+        parser.add_argument('--workers', type=int, action='append',
+                            help='Restaurants dispatched concurrently; repeat to compare (default: 1, 4)')
+        parser.add_argument('--batch-size', type=int, default=DISPATCH_BATCH_SIZE)
+        parser.add_argument('--max-load', type=int, default=DISPATCH_MAX_LOAD)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Also write the report to this file')
+
+    def handle(self, *args, **options):
+        results = {}
+        for workers in options['workers'] or [1, 4]:
+            results[workers] = self.simulate(workers, options)
+        report = {
+            'vendor': connection.vendor,
+            'restaurants': options['restaurants'],
+            'crew': options['crew'],
+            'rounds': options['rounds'],
+            'orders_per_round': options['orders_per_round'],
+            'batch_size': options['batch_size'],
+            'max_load': options['max_load'],
+            'workers': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output)
+        self.stdout.write(output)
+        if any(result['overloaded'] or result['counter_mismatches'] for result in results.values()):
+            self.stderr.write('Dispatch invariants violated')
+
+    def simulate(self, workers, options):
+        prefix = f'bench-dispatch-{int(time.time())}-{workers}'
+        rng = random.Random(options['seed'])
+        owner = User.objects.create_user(f'{prefix}-owner')
+        customer = User.objects.create_user(f'{prefix}-customer')
+        restaurants = Restaurant.objects.bulk_create([
+            Restaurant(
+                name=f'{prefix}-{i}', opening_time=clock(0), closing_time=clock(0), owner=owner,
+                auto_dispatch=True,
+            )
+            for i in range(options['restaurants'])
+        ])
+        restaurant_ids = [restaurant.pk for restaurant in restaurants]
+        crew = [User.objects.create_user(f'{prefix}-crew-{i}') for i in range(options['crew'])]
+        crew_ids = [member.pk for member in crew]
+        Group.objects.get_or_create(name=DELIVERY_CREW)[0].user_set.add(*crew)
+
+        assigned = 0
+        batches = []
+        seconds = 0.0
+        spreads, idle_with_waiting, overloaded, counter_mismatches = [], 0, 0, 0
+        try:
+            for _ in range(options['rounds']):
+                Order.objects.bulk_create([
+                    Order(
+                        customer=customer, restaurant_id=rng.choice(restaurant_ids), status='ready',
+                        total=Decimal('10.00'), delivery_address='1 Dispatch Road',
+                    )
+                    for _ in range(options['orders_per_round'])
+                ])
+                started = time.perf_counter()
+                assignments = dispatch_waiting(
+                    restaurant_ids, workers, crew_ids=crew_ids,
+                    batch_size=options['batch_size'], max_load=options['max_load'],
+                )
+                seconds += time.perf_counter() - started
+                assigned += sum(len(order_ids) for order_ids in assignments.values())
+                batches.extend(len(order_ids) for order_ids in assignments.values())
+
+                loads = self.loads(crew_ids)
+                overloaded += sum(load > options['max_load'] for load in loads.values())
+                counters = dict(
+                    DeliveryLoad.objects.filter(crew_id__in=crew_ids).values_list('crew_id', 'active_orders')
+                )
+                counter_mismatches += sum(counters.get(crew_id, 0) != load for crew_id, load in loads.items())
+                spreads.append(statistics.pstdev(loads.values()))
+                if Order.objects.filter(restaurant_id__in=restaurant_ids, delivery_crew__isnull=True).exists():
+                    idle_with_waiting += sum(load < options['max_load'] for load in loads.values()) > 0
+
+                self.deliver(rng, crew_ids, options['deliver'])
+
+            final_loads = self.loads(crew_ids)
+            return {
+                'assigned_orders': assigned,
+                'assignments_per_second': round(assigned / seconds, 1) if seconds else None,
+                'dispatch_seconds': round(seconds, 3),
+                'mean_orders_per_batch': round(statistics.mean(batches), 2) if batches else 0,
+                'load_stdev_mean': round(statistics.mean(spreads), 3),
+                'rounds_with_free_drivers_and_waiting_orders': idle_with_waiting,
+                'final_load_min_max': [min(final_loads.values()), max(final_loads.values())],
+                'orders_left_waiting': Order.objects.filter(
+                    restaurant_id__in=restaurant_ids, delivery_crew__isnull=True
+                ).count(),
+                'overloaded': overloaded,
+                'counter_mismatches': counter_mismatches,
+            }
+        finally:
+            Order.objects.filter(restaurant_id__in=restaurant_ids).delete()
+            User.objects.filter(username__startswith=prefix).delete()
+
+    def loads(self, crew_ids):
+        """
+        Active orders per driver, counted from the orders table.
+        """
+        return dict(
+            crew_with_load(use_counters=False).filter(pk__in=crew_ids).values_list('id', 'assigned_orders')
+        )
+
+    def deliver(self, rng, crew_ids, chance):
+        active = list(
+            Order.objects.filter(delivery_crew_id__in=crew_ids, status='out_for_delivery')
+            .values_list('id', 'delivery_crew_id')
+        )
+        delivered = [(order_id, crew_id) for order_id, crew_id in active if rng.random() < chance]
+        Order.objects.filter(pk__in=[order_id for order_id, _ in delivered]).update(status='delivered')
+        per_crew = {}
+        for _, crew_id in delivered:
+            per_crew[crew_id] = per_crew.get(crew_id, 0) + 1
+        for crew_id, count in per_crew.items():
+            adjust_load(crew_id, -count)
@@ -0,0 +1,308 @@
+import json
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders import urls as order_urls
+from orders.archive import archive_batch, archive_cutoff, archivable_orders
+from orders.models import Restaurant, MenuItem, CartItem, Order, OrderItem, ArchivedOrder
+from orders.roles import CUSTOMER, RESTAURANT_OWNER, DELIVERY_CREW
+
+from .seed_data import PREFIX
+
+# Routes of orders.urls that the harness does not drive, and why
+SKIPPED_ROUTES = {
+    'order-stream': 'long-lived event stream; measured by bench_order_stream',
+}
+
+
+@contextmanager
+def disposable_database(suffix='bench'):
+    """
+    Point the default database, and every alias that mirrors it, at a copy
+    of it for the duration of the block, then drop the copy.
+    """
+    aliases = [alias for alias in connections
+               if alias == 'default' or connections[alias].settings_dict['TEST'].get('MIRROR') == 'default']
+    for alias in aliases:
+        connections[alias].close()
+    connection.creation.clone_test_db(suffix=suffix, verbosity=0, autoclobber=True)
+    clone = connection.creation.get_test_db_clone_settings(suffix)['NAME']
+    originals = {alias: connections[alias].settings_dict['NAME'] for alias in aliases}
+    for alias in aliases:
+        connections[alias].settings_dict['NAME'] = clone
+    try:
+        yield
+    finally:
+        for alias in aliases:
+            connections[alias].close()
+            connections[alias].settings_dict['NAME'] = originals[alias]
+        connection.creation._destroy_test_db(clone, verbosity=0)
+
+
+class Scenario:
+    def __init__(self, name, route, role, method='get', url=None, data=None, prepare=None, status=200):
+        self.name = name
+        self.route = route
+        self.role = role
+        self.method = method
+        self.url = url or reverse(route)
+        self.data = data
+        self.prepare = prepare
+        self.status = status
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every route of orders.urls and the djoser JWT endpoints against "
+        "the dataset made by seed_data and report p50/p95/p99 latency, throughput "
+        "and queries per request as JSON. Every request commits, so commit cost and "
+        "on_commit hooks are measured; the run works on a copy of the database "
+        "that is dropped afterwards, so runs are repeatable."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', action='append', help='Only run scenarios whose name contains this')
+        parser.add_argument('--password', default='cravings-bench')
+        parser.add_argument('--label', default='', help='Stored in the report, e.g. a commit id')
+        parser.add_argument('--output', help='Also write the report to this file')
+
+    def handle(self, *args, **options):
+        self.password = options['password']
+        self.tokens = {}
+        cache.clear()
+        with disposable_database():
+            fixtures = self.load_fixtures()
+            self.clients = {role: self.login(user) for role, user in fixtures['users'].items()}
+            scenarios = self.scenarios(fixtures)
+            self.check_coverage(scenarios)
+            results = {}
+            for scenario in scenarios:
+                if options['only'] and not any(part in scenario.name for part in options['only']):
+                    continue
+                results[scenario.name] = self.run(scenario, options['requests'], options['warmup'])
+
+        report = {
+            'label': options['label'],
+            'vendor': connection.vendor,
+            'dataset': {
+                'restaurants': Restaurant.objects.count(),
+                'menu_items': MenuItem.objects.count(),
+                'orders': Order.objects.count(),
+                'order_items': OrderItem.objects.count(),
+                'users': User.objects.count(),
+            },
+            'endpoints': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output)
+        self.stdout.write(output)
+
+    def load_fixtures(self):
+        """
+        Pick the users and rows every scenario works on, deterministically.
+        """
+        seeded = User.objects.filter(username__startswith=f'{PREFIX}-')
+        order = (
+            Order.objects.filter(customer__in=seeded, status='out_for_delivery', delivery_crew__isnull=False)
+            .select_related('customer', 'delivery_crew', 'restaurant__owner').order_by('id').first()
+        )
+        line = CartItem.objects.filter(cart__customer__in=seeded).select_related('cart__customer').order_by('id').first()
+        if order is None or line is None:
+            raise CommandError('No seeded dataset found; run seed_data first')
+        restaurant = order.restaurant
+        customer = line.cart.customer
+        staff = User.objects.create_user(f'{PREFIX}-bench-staff', password=self.password, is_staff=True)
+        menu_item = restaurant.menu_items.filter(is_available=True).order_by('id').first()
+        # Give the history scenarios something to read if archive_orders was never run
+        archive_batch(archivable_orders(archive_cutoff()).filter(customer=customer), 100)
+        archived_order = ArchivedOrder.objects.filter(customer=customer).order_by('-id').first()
+        customer_order = Order.objects.filter(customer=customer).order_by('-id').first()
+        if archived_order is None or customer_order is None:
+            raise CommandError(f'{customer.username} needs both live and archived orders')
+        return {
+            'users': {
+                CUSTOMER: customer,
+                RESTAURANT_OWNER: restaurant.owner,
+                DELIVERY_CREW: order.delivery_crew,
+                'staff': staff,
+            },
+            'restaurant': restaurant,
+            'menu_item': menu_item,
+            'cart_item': line,
+            'order': order,
+            'customer_order': customer_order,
+            'archived_order': archived_order,
+        }
+
+    def login(self, user):
+        client = APIClient(SERVER_NAME='localhost')
+        response = client.post(
+            reverse('jwt-create'), {'username': user.username, 'password': self.password}, format='json'
+        )
+        if response.status_code != 200:
+            raise CommandError(f'Could not log in as {user.username}: {response.content[:200]}')
+        self.tokens[user.username] = response.data
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return client
+
+    def scenarios(self, fixtures):
+        restaurant, menu_item, order = fixtures['restaurant'], fixtures['menu_item'], fixtures['order']
+        customer = fixtures['users'][CUSTOMER]
+        crew = fixtures['users'][DELIVERY_CREW]
+        tokens = self.tokens[customer.username]
+        # Cart writes stay within the restaurant the cart already holds
+        cart_menu_item = fixtures['cart_item'].menu_item_id
+        menu_url = reverse('menuitem-list', args=[restaurant.pk])
+        # Analytics of the month up to the seeded orders' last day, which need not be today
+        last_day = timezone.localtime(restaurant.orders.latest('order_date').order_date).date()
+
+        def refill_cart():
+            CartItem.objects.update_or_create(
+                cart=fixtures['cart_item'].cart, menu_item=fixtures['cart_item'].menu_item,
+                defaults={'quantity': 2},
+            )
+
+        def restock():
+            MenuItem.objects.filter(pk=menu_item.pk).update(is_available=True)
+
+        def reset_delivery():
+            Order.objects.filter(pk=order.pk).update(status='out_for_delivery', delivery_crew=crew)
+
+        # Orders the bulk transition scenario sends out for delivery over and over
+        batch_ids = list(
+            restaurant.orders.exclude(pk__in=[order.pk, fixtures['customer_order'].pk])
+            .order_by('-id').values_list('pk', flat=True)[:20]
+        )
+
+        def reset_batch():
+            Order.objects.filter(pk__in=batch_ids).update(status='preparing', delivery_crew=None)
+
+        return [
+            # djoser JWT endpoints
+            Scenario('jwt-create', 'jwt-create', None, 'post',
+                     data={'username': customer.username, 'password': self.password}),
+            Scenario('jwt-refresh', 'jwt-refresh', None, 'post', data={'refresh': tokens['refresh']}),
+            Scenario('jwt-verify', 'jwt-verify', None, 'post', data={'token': tokens['access']}),
+            Scenario('user-me', 'user-me', CUSTOMER),
+            # Restaurants and menus
+            Scenario('restaurant-list', 'restaurant-list', CUSTOMER),
+            Scenario('restaurant-list open_now', 'restaurant-list', CUSTOMER,
+                     url=reverse('restaurant-list') + '?open_now=true'),
+            Scenario('restaurant-detail', 'restaurant-detail', RESTAURANT_OWNER,
+                     url=reverse('restaurant-detail', args=[restaurant.pk])),
+            Scenario('restaurant-analytics', 'restaurant-analytics', RESTAURANT_OWNER,
+                     url=reverse('restaurant-analytics', args=[restaurant.pk]) + f'?end={last_day}'),
+            Scenario('menuitem-list', 'menuitem-list', CUSTOMER, url=menu_url),
+            Scenario('menuitem-detail', 'menuitem-detail', RESTAURANT_OWNER,
+                     url=reverse('menuitem-detail', args=[restaurant.pk, menu_item.pk])),
+            Scenario('menuitem-import', 'menuitem-import', RESTAURANT_OWNER, 'post',
+                     url=reverse('menuitem-import', args=[restaurant.pk]),
+                     data=[{'id': menu_item.pk, 'is_available': False}], prepare=restock),
+            Scenario('menuitem-export', 'menuitem-export', RESTAURANT_OWNER,
+                     url=reverse('menuitem-export', args=[restaurant.pk, 'csv'])),
+            Scenario('menuitem-search', 'menuitem-search', CUSTOMER,
+                     url=reverse('menuitem-search') + '?q=spicy+chick'),
+            # Cart
+            Scenario('cart', 'cart', CUSTOMER),
+            Scenario('cartitem-list', 'cartitem-list', CUSTOMER),
+            Scenario('cartitem-list add', 'cartitem-list', CUSTOMER, 'post',
+                     data={'menu_item': cart_menu_item, 'quantity': 1}, status=201),
+            Scenario('cartitem-detail', 'cartitem-detail', CUSTOMER,
+                     url=reverse('cartitem-detail', args=[fixtures['cart_item'].pk]), prepare=refill_cart),
+            Scenario('cart-batch', 'cart-batch', CUSTOMER, 'post', data={'operations': [
+                {'op': 'set', 'menu_item': cart_menu_item, 'quantity': 2},
+            ]}),
+            # Orders
+            Scenario('order-list customer', 'order-list', CUSTOMER),
+            Scenario('order-list owner', 'order-list', RESTAURANT_OWNER),
+            Scenario('order-list crew', 'order-list', DELIVERY_CREW),
+            Scenario('order-list checkout', 'order-list', CUSTOMER, 'post',
+                     data={'delivery_address': '1 Bench Street', 'order_date': '2025-04-06T12:00:00Z'},
+                     prepare=refill_cart, status=201),
+            Scenario('order-detail', 'order-detail', CUSTOMER,
+                     url=reverse('order-detail', args=[fixtures['customer_order'].pk])),
+            Scenario('order-export', 'order-export', RESTAURANT_OWNER,
+                     url=reverse('order-export', args=['csv']) + f'?restaurant={restaurant.pk}'),
+            Scenario('order-stream-ticket', 'order-stream-ticket', CUSTOMER, 'post', status=201),
+            Scenario('order-history', 'order-history', CUSTOMER),
+            Scenario('order-history-detail', 'order-history-detail', CUSTOMER,
+                     url=reverse('order-history-detail', args=[fixtures['archived_order'].pk])),
+            Scenario('order-history-export', 'order-history-export', RESTAURANT_OWNER,
+                     url=reverse('order-history-export', args=['ndjson']) + f'?restaurant={restaurant.pk}'),
+            Scenario('assign-delivery', 'assign-delivery', RESTAURANT_OWNER, 'patch',
+                     url=reverse('assign-delivery', args=[order.pk]), data={'delivery_crew': crew.pk}),
+            Scenario('mark-delivered', 'mark-delivered', DELIVERY_CREW, 'patch',
+                     url=reverse('mark-delivered', args=[order.pk]), prepare=reset_delivery),
+            Scenario('order-transition', 'order-transition', RESTAURANT_OWNER, 'post',
+                     data={'orders': batch_ids, 'status': 'out_for_delivery', 'delivery_crew': crew.pk},
+                     prepare=reset_batch),
+            # Users
+            Scenario('user-role', 'user-role', CUSTOMER),
+            Scenario('user-profile', 'user-profile', CUSTOMER),
+            Scenario('delivery-crew-list', 'delivery-crew-list', RESTAURANT_OWNER),
+            Scenario('request-metrics', 'request-metrics', 'staff'),
+        ]
+
+    def check_coverage(self, scenarios):
+        routes = {pattern.name for pattern in order_urls.urlpatterns if pattern.name}
+        missing = routes - {scenario.route for scenario in scenarios} - set(SKIPPED_ROUTES)
+        if missing:
+            raise CommandError(f"No benchmark scenario for: {', '.join(sorted(missing))}")
+
+    def run(self, scenario, count, warmup):
+        client = self.clients[scenario.role] if scenario.role else APIClient(SERVER_NAME='localhost')
+        if scenario.method == 'get':
+            def request():
+                return client.get(scenario.url)
+        else:
+            def request():
+                return getattr(client, scenario.method)(scenario.url, scenario.data, format='json')
+        timings, queries = [], []
+        for i in range(warmup + count):
+            if i == warmup:
+                wall_started = time.perf_counter()
+            if scenario.prepare:
+                scenario.prepare()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = request()
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            if response.status_code != scenario.status:
+                raise CommandError(
+                    f'{scenario.name}: expected {scenario.status}, got {response.status_code}: '
+                    f'{response.content[:200]}'
+                )
+            if i >= warmup:
+                timings.append(elapsed * 1000)
+                queries.append(len(captured))
+        wall_elapsed = time.perf_counter() - wall_started
+        timings.sort()
+        return {
+            'route': scenario.route,
+            'method': scenario.method.upper(),
+            'requests': count,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(self.percentile(timings, 95), 3),
+            'p99_ms': round(self.percentile(timings, 99), 3),
+            'throughput_rps': round(count / wall_elapsed, 1),
+            'queries_per_request': round(sum(queries) / len(queries), 2),
+        }
+
+    def percentile(self, timings, percent):
+        return timings[min(len(timings) - 1, max(0, round(len(timings) * percent / 100) - 1))]
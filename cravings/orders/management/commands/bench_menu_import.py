@@ -0,0 +1,67 @@
+import json
+import time
+import tracemalloc
+from datetime import time as clock
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from orders.menu_import import export_csv, import_menu, read_csv
+from orders.models import Restaurant, MenuItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a menu import of --rows new items, a bulk availability and price "
+        "toggle of all of them and a CSV export, in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with transaction.atomic():
+            owner = User.objects.create_user(f'bench-menu-import-{int(time.time())}')
+            restaurant = Restaurant.objects.create(
+                name='Bench Import', opening_time=clock(0), closing_time=clock(23, 59), owner=owner
+            )
+            create = self.csv_file(
+                ('name', 'description', 'price', 'category'),
+                ((f'Dish {i}', f'Freshly made dish number {i}', f'{4 + i % 20}.50', 'main') for i in range(rows)),
+            )
+            report = {'vendor': connection.vendor, 'rows': rows}
+            report['import_new'] = self.measure(lambda: import_menu(restaurant, read_csv(create)))
+
+            ids = MenuItem.objects.filter(restaurant=restaurant).values_list('id', flat=True)
+            toggle = self.csv_file(
+                ('id', 'is_available', 'price'),
+                ((pk, i % 2 == 0, f'{5 + i % 20}.00') for i, pk in enumerate(ids)),
+            )
+            report['import_toggle'] = self.measure(lambda: import_menu(restaurant, read_csv(toggle)))
+            report['export_csv'] = self.measure(lambda: sum(map(len, export_csv(restaurant))))
+            report['export_csv']['peak_kb'] = self.peak_memory(lambda: sum(map(len, export_csv(restaurant))))
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def csv_file(self, header, rows):
+        lines = [','.join(header)] + [','.join(map(str, row)) for row in rows]
+        return BytesIO('\n'.join(lines).encode())
+
+    def measure(self, run):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            result = run()
+            elapsed = time.perf_counter() - started
+        return {'seconds': round(elapsed, 3), 'queries': len(captured), 'result': result}
+
+    def peak_memory(self, run):
+        tracemalloc.start()
+        try:
+            run()
+            return round(tracemalloc.get_traced_memory()[1] / 1024)
+        finally:
+            tracemalloc.stop()
@@ -0,0 +1,76 @@
+import json
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Export every order as CSV and NDJSON as staff and report time to first "
+        "byte, total time, size and peak memory, next to reading the same orders "
+        "page by page from the order list."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            staff = User.objects.create_user(f'bench-order-export-{int(time.time())}', is_staff=True)
+            client = APIClient(SERVER_NAME='localhost')
+            client.force_authenticate(staff)
+            report = {'vendor': connection.vendor, 'orders': Order.objects.count()}
+            for file_format in ('csv', 'ndjson'):
+                url = reverse('order-export', args=[file_format])
+                report[file_format] = self.measure(lambda: self.stream(client, url))
+            report['order_list_pages'] = self.measure(
+                lambda: self.pages(client, reverse('order-list') + f"?page_size={options['page_size']}")
+            )
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def stream(self, client, url):
+        started = time.perf_counter()
+        response = client.get(url)
+        content = iter(response.streaming_content)
+        size = len(next(content))
+        first_byte = time.perf_counter() - started
+        size += sum(map(len, content))
+        return {'first_byte_ms': round(first_byte * 1000, 1), 'bytes': size}
+
+    def pages(self, client, url):
+        started = time.perf_counter()
+        first_byte, size, pages = None, 0, 0
+        while url:
+            response = client.get(url)
+            size += len(response.content)
+            pages += 1
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            url = None
+            for link in response.get('Link', '').split(', '):
+                if link.endswith('rel="next"'):
+                    url = link[1:link.index('>')]
+        return {'first_byte_ms': round(first_byte * 1000, 1), 'bytes': size, 'pages': pages}
+
+    def measure(self, run):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            result = run()
+            result['seconds'] = round(time.perf_counter() - started, 3)
+        result['queries'] = len(captured)
+        tracemalloc.start()
+        try:
+            run()
+            result['peak_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024)
+        finally:
+            tracemalloc.stop()
+        return result
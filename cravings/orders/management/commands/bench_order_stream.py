@@ -0,0 +1,112 @@
+import asyncio
+import json
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from cravings.asgi import application
+from orders.events import get_broker
+
+
+class StreamClient:
+    """
+    One idle SSE connection driven straight through the ASGI application.
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self.disconnected = asyncio.Event()
+        self.connected = asyncio.Event()
+        self.received = asyncio.Event()
+        self.status = None
+        self.sent_request = False
+
+    async def receive(self):
+        if not self.sent_request:
+            self.sent_request = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        elif message['type'] == 'http.response.body':
+            self.connected.set()
+            if b'event: order_status' in message.get('body', b''):
+                self.received.set()
+
+    async def run(self):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': '/api/orders/stream/',
+            'raw_path': b'/api/orders/stream/',
+            'query_string': b'',
+            'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {self.token}'.encode())],
+            'server': ('localhost', 80),
+            'client': ('127.0.0.1', 0),
+        }
+        await application(scope, self.receive, self.send)
+
+
+class Command(BaseCommand):
+    help = (
+        "Open thousands of idle order status streams against the ASGI application "
+        "in this process and measure memory per subscriber and event fan-out latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=100)
+
+    def handle(self, *args, **options):
+        prefix = f'bench-stream-{int(time.time())}'
+        users = [User.objects.create_user(f'{prefix}-{i}') for i in range(options['users'])]
+        tokens = [str(AccessToken.for_user(user)) for user in users]
+        try:
+            report = asyncio.run(self.run(tokens, options['subscribers'], [user.pk for user in users]))
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+        self.stdout.write(json.dumps(report, indent=2))
+
+    async def run(self, tokens, count, user_ids):
+        broker = get_broker()
+        clients = [StreamClient(tokens[i % len(tokens)]) for i in range(count)]
+
+        tracemalloc.start()
+        baseline = tracemalloc.take_snapshot()
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(client.run()) for client in clients]
+        await asyncio.gather(*(client.connected.wait() for client in clients))
+        connect_seconds = time.perf_counter() - started
+        growth = sum(
+            stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(baseline, 'filename')
+        )
+        tracemalloc.stop()
+
+        started = time.perf_counter()
+        broker.publish(user_ids, {'id': 1, 'type': 'order_status', 'order': 0, 'status': 'delivered'})
+        await asyncio.gather(*(client.received.wait() for client in clients))
+        fanout_seconds = time.perf_counter() - started
+
+        open_subscriptions = broker.subscriber_count()
+        for client in clients:
+            client.disconnected.set()
+        await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 30)
+
+        return {
+            'subscribers': count,
+            'rejected': sum(1 for client in clients if client.status != 200),
+            'connect_seconds': round(connect_seconds, 3),
+            'bytes_per_subscriber': int(growth / count),
+            'fanout_ms': round(fanout_seconds * 1000, 2),
+            'open_subscriptions': open_subscriptions,
+            'leaked_subscriptions': broker.subscriber_count(),
+        }
@@ -0,0 +1,145 @@
+import json
+import random
+import statistics
+import time
+from datetime import time as clock
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from orders.models import Restaurant, MenuItem
+from orders.models import MenuSearchTerm
+from orders.search import build_terms, search_menu_items
+
+COMMON_WORDS = (
+    'chicken beef lamb tofu shrimp salmon spicy grilled fried roasted garlic lemon '
+    'pepper cheese tomato basil mushroom onion rice noodle curry burger pizza pasta '
+    'salad soup taco wrap sandwich sushi ramen dumpling cake pie chocolate vanilla '
+    'mango coconut honey smoked crispy fresh classic house special double'
+).split()
+SYLLABLES = 'ka ri mo ta lu be so na vi do pe gu ze fa lo mi tu ra ne ko'.split()
+
+
+def vocabulary(rng, size):
+    """
+    Common dish words followed by made-up ones; drawing with 1/rank weights
+    gives the long-tailed word frequencies of real menus.
+    """
+    words = list(COMMON_WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = ''.join(rng.choice(SYLLABLES) for i in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    weights = [1 / rank for rank in range(1, size + 1)]
+    return words, weights
+
+
+class Command(BaseCommand):
+    help = (
+        "Build a synthetic menu catalogue, index it and measure search latency "
+        "against an icontains scan over the same rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100000)
+        parser.add_argument('--restaurants', type=int, default=200)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--vocabulary', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.words, self.weights = vocabulary(rng, options['vocabulary'])
+        prefix = f'bench-search-{int(time.time())}'
+        owner = User.objects.create_user(f'{prefix}-owner')
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(owner)
+        try:
+            restaurants = Restaurant.objects.bulk_create([
+                Restaurant(
+                    name=f'{self.pick(rng, 1).title()} {prefix} {i}',
+                    opening_time=clock(0), closing_time=clock(23, 59), owner=owner,
+                )
+                for i in range(options['restaurants'])
+            ])
+            started = time.perf_counter()
+            MenuItem.objects.bulk_create([
+                MenuItem(
+                    restaurant=rng.choice(restaurants),
+                    name=self.pick(rng, 3).title(),
+                    description=self.pick(rng, 10),
+                    price=Decimal(rng.randint(300, 3000)) / 100,
+                )
+                for i in range(options['items'])
+            ], batch_size=2000)
+            items = MenuItem.objects.with_related().filter(restaurant__in=restaurants).order_by('pk')
+            last_pk = 0
+            while True:
+                chunk = list(items.filter(pk__gt=last_pk)[:2000])
+                if not chunk:
+                    break
+                MenuSearchTerm.objects.bulk_create(
+                    [term for item in chunk for term in build_terms(item, item.restaurant.name)],
+                    batch_size=2000,
+                )
+                last_pk = chunk[-1].pk
+            index_seconds = time.perf_counter() - started
+
+            queries = [self.query(rng) for i in range(options['queries'])]
+            lookup = self.measure(queries, lambda q: search_menu_items(q, is_available=True))
+            endpoint = self.measure(queries, lambda q: client.get(reverse('menuitem-search'), {'q': q}))
+            scan = self.measure(queries, lambda q: self.scan(q))
+        finally:
+            # Cascades to the restaurants, menu items and index rows
+            User.objects.filter(username__startswith=prefix).delete()
+
+        self.stdout.write(json.dumps({
+            'vendor': connection.vendor,
+            'items': options['items'],
+            'build_and_index_seconds': round(index_seconds, 2),
+            'index_lookup': lookup,
+            'search_endpoint': endpoint,
+            'icontains_scan': scan,
+        }, indent=2))
+
+    def pick(self, rng, count):
+        return ' '.join(rng.choices(self.words, self.weights, k=count))
+
+    def query(self, rng):
+        words = self.pick(rng, rng.randint(1, 2)).split()
+        # Half of the queries are still being typed
+        if rng.random() < 0.5:
+            words[-1] = words[-1][:rng.randint(2, len(words[-1]))]
+        return ' '.join(words)
+
+    def scan(self, query):
+        filters = Q()
+        for word in query.split():
+            filters &= (
+                Q(name__icontains=word) | Q(description__icontains=word)
+                | Q(restaurant__name__icontains=word)
+            )
+        # Ordered so that, like a ranked search, it has to look at every match
+        return list(MenuItem.objects.filter(filters, is_available=True).order_by('name')[:20])
+
+    def measure(self, queries, run):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            response = run(query)
+            timings.append((time.perf_counter() - started) * 1000)
+            if getattr(response, 'status_code', 200) >= 400:
+                raise RuntimeError(f'{response.status_code}: {response.content[:200]}')
+        timings.sort()
+        return {
+            'queries': len(timings),
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 3),
+        }
@@ -0,0 +1,97 @@
+import json
+import time
+from datetime import time as clock
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from orders.models import Restaurant, MenuItem, Order, OrderItem
+from orders.projections import RestaurantProjection, MenuItemProjection, OrderProjection
+from orders.renderers import FastJSONRenderer, orjson
+from orders.serializers import RestaurantSerializer, MenuItemSerializer, OrderSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure list serialization throughput in rows per second: DRF serializers "
+        "against the values() projections, and JSONRenderer against FastJSONRenderer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        prefix = f'bench-serializers-{int(time.time())}'
+        request = RequestFactory(SERVER_NAME='localhost').get('/')
+        owner = User.objects.create_user(f'{prefix}-owner')
+        customer = User.objects.create_user(f'{prefix}-customer')
+        try:
+            restaurants = Restaurant.objects.bulk_create([
+                Restaurant(name=f'{prefix} {i}', opening_time=clock(9), closing_time=clock(22), owner=owner)
+                for i in range(rows)
+            ])
+            menu_items = MenuItem.objects.bulk_create([
+                MenuItem(
+                    restaurant=restaurants[i % 50], name=f'Dish {i}', description='Freshly made',
+                    price=Decimal('7.25'), image=f'menu_items/{i}.jpg',
+                )
+                for i in range(rows)
+            ])
+            orders = Order.objects.bulk_create([
+                Order(
+                    customer=customer, restaurant=restaurants[0], status='delivered',
+                    total=Decimal('21.75'), delivery_address=f'{i} Main Street',
+                )
+                for i in range(rows)
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, menu_item=menu_items[j], quantity=1, unit_price=Decimal('7.25'))
+                for order in orders for j in range(3)
+            ], batch_size=2000)
+
+            cases = [
+                ('restaurants', Restaurant.objects.filter(owner=owner).with_related(),
+                 RestaurantSerializer, RestaurantProjection),
+                ('menu_items', MenuItem.objects.filter(restaurant__owner=owner).with_related(),
+                 MenuItemSerializer, MenuItemProjection),
+                ('orders', Order.objects.filter(customer=customer).with_related(),
+                 OrderSerializer, OrderProjection),
+            ]
+            report = {'rows': rows, 'orjson': orjson is not None}
+            for name, queryset, serializer_class, projection_class in cases:
+                report[name] = self.compare(
+                    request, queryset, serializer_class, projection_class, options['repeat']
+                )
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def compare(self, request, queryset, serializer_class, projection_class, repeat):
+        def serializer():
+            return serializer_class(list(queryset), many=True, context={'request': request}).data
+
+        def projection():
+            projected = projection_class(request)
+            return projected.represent(list(projected.project(queryset)))
+
+        data = projection()
+        return {
+            'serializer_rows_per_s': self.rate(serializer, len(data), repeat),
+            'projection_rows_per_s': self.rate(projection, len(data), repeat),
+            'json_renderer_rows_per_s': self.rate(lambda: JSONRenderer().render(data), len(data), repeat),
+            'fast_renderer_rows_per_s': self.rate(lambda: FastJSONRenderer().render(data), len(data), repeat),
+        }
+
+    def rate(self, run, rows, repeat):
+        best = None
+        for i in range(repeat):
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return int(rows / best)
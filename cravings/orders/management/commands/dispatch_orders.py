@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.dispatch import DISPATCH_BATCH_SIZE, DISPATCH_MAX_LOAD, dispatch_waiting
+
+
+class Command(BaseCommand):
+    help = (
+        "Hand the waiting orders of restaurants in auto-dispatch mode to the least "
+        "loaded delivery crew members, several orders of one restaurant per driver. "
+        "Runs once, or every --interval seconds until stopped; orders that come in "
+        "between runs are batched together."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Seconds between runs; run once if not given')
+        parser.add_argument('--workers', type=int, default=1, help='Restaurants dispatched concurrently')
+        parser.add_argument(
+            '--batch-size', type=int, default=DISPATCH_BATCH_SIZE,
+            help=f'Orders per driver and restaurant in one run (default: {DISPATCH_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--max-load', type=int, default=DISPATCH_MAX_LOAD,
+            help=f'Active orders above which a driver gets no more (default: {DISPATCH_MAX_LOAD})',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            assignments = dispatch_waiting(
+                workers=options['workers'], batch_size=options['batch_size'], max_load=options['max_load'],
+            )
+            orders = sum(len(order_ids) for order_ids in assignments.values())
+            self.stdout.write(
+                f"Assigned {orders} orders to {len(assignments)} drivers "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from orders.workload import rebuild_load
+
+
+class Command(BaseCommand):
+    help = "Recompute every delivery crew member's active order counter from the orders table."
+
+    def handle(self, *args, **options):
+        counts = rebuild_load()
+        self.stdout.write(f"Rebuilt delivery load for {len(counts)} busy crew members")
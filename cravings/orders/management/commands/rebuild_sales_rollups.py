@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from orders import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollups from the orders tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurant', type=int, action='append', dest='restaurants',
+                            help='Only rebuild this restaurant (repeatable)')
+        parser.add_argument('--since', help='Only rebuild days on or after YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = parse_date(options['since'])
+            except ValueError:
+                since = None
+            if since is None:
+                raise CommandError('--since must be a date in the YYYY-MM-DD format')
+        days = rollups.rebuild(restaurant_ids=options['restaurants'], since=since)
+        self.stdout.write(f"Rebuilt {days} restaurant-days of sales")
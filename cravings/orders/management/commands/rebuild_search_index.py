@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the menu search index from every menu item."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(chunk_size=options['chunk_size'])
+        self.stdout.write(f"Indexed {indexed} menu items")
@@ -0,0 +1,246 @@
+import random
+import time
+from datetime import datetime, time as clock, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from orders import rollups
+from orders.models import Restaurant, MenuItem, Cart, CartItem, Order, OrderItem
+from orders.roles import RESTAURANT_OWNER, CUSTOMER, DELIVERY_CREW
+from orders.search import rebuild_index
+from orders.workload import rebuild_load
+
+PREFIX = 'seed'
+WORDS = (
+    'chicken beef lamb tofu shrimp salmon spicy grilled fried roasted garlic lemon '
+    'pepper cheese tomato basil mushroom onion rice noodle curry burger pizza pasta '
+    'salad soup taco wrap sandwich sushi ramen dumpling cake pie chocolate vanilla '
+    'mango coconut honey smoked crispy fresh classic house special double'
+).split()
+CATEGORIES = [choice for choice, label in MenuItem.CATEGORY_CHOICES]
+# Share of orders in each status; most history is delivered
+STATUSES = [('delivered', 85), ('cancelled', 5), ('out_for_delivery', 5), ('preparing', 5)]
+# Last order day unless --end-date says otherwise, so that runs on different
+# days produce the same dataset
+DEFAULT_END_DATE = '2025-04-06'
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a reproducible synthetic dataset for benchmarks: owners, customers "
+        "and delivery crew in their groups, restaurants with menus, order history "
+        "and filled carts. Every generated user is named seed-<role>-<n> and shares "
+        "the --password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--restaurants', type=int, default=2000)
+        parser.add_argument('--menu-items', type=int, default=100, help='Per restaurant')
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--customers', type=int, default=20000)
+        parser.add_argument('--crew', type=int, default=500)
+        parser.add_argument('--days', type=int, default=365, help='Spread orders over this many days')
+        parser.add_argument('--end-date', default=DEFAULT_END_DATE,
+                            help='Last order day, YYYY-MM-DD (default: %(default)s)')
+        parser.add_argument('--password', default='cravings-bench')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--flush', action='store_true', help='Delete a previous seeded dataset first')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        try:
+            end_date = parse_date(options['end_date'])
+        except ValueError:
+            end_date = None
+        if end_date is None:
+            raise CommandError('--end-date must be a date in the YYYY-MM-DD format')
+
+        seeded = User.objects.filter(username__startswith=f'{PREFIX}-')
+        if seeded.exists():
+            if not options['flush']:
+                raise CommandError('A seeded dataset already exists; pass --flush to replace it')
+            self.step('Deleting the previous dataset', seeded.delete)
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            users = self.step('Users', self.create_users, options)
+            restaurants = self.step(
+                'Restaurants', self.create_restaurants, users[RESTAURANT_OWNER], options['restaurants']
+            )
+            menus = self.step('Menu items', self.create_menu_items, restaurants, options['menu_items'])
+            self.step(
+                'Orders', self.create_orders, users, menus, options['orders'],
+                end_date, options['days'],
+            )
+            self.step('Carts', self.create_carts, users[CUSTOMER], menus)
+            self.reset_sequences()
+
+        self.step('Sales rollups', rollups.rebuild)
+        self.step('Delivery load', rebuild_load)
+        self.step('Search index', rebuild_index)
+        self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+    def step(self, label, function, *args):
+        started = time.perf_counter()
+        result = function(*args)
+        self.stdout.write(f'{label}: {time.perf_counter() - started:.1f}s')
+        return result
+
+    def next_id(self, model):
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def bulk_create(self, model, rows):
+        """
+        Insert ``rows`` (an iterable of unsaved instances) in batches without
+        holding them all in memory.
+        """
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch)
+
+    def create_users(self, options):
+        # Hashing once keeps a million-row seed from spending its time in PBKDF2
+        password = make_password(options['password'])
+        counts = {
+            RESTAURANT_OWNER: max(options['restaurants'] // 2, 1),
+            CUSTOMER: options['customers'],
+            DELIVERY_CREW: options['crew'],
+        }
+        users = {}
+        for role, count in counts.items():
+            group = Group.objects.get_or_create(name=role)[0]
+            slug = role.split()[-1].lower()
+            first_id = self.next_id(User)
+            self.bulk_create(User, (
+                User(id=first_id + i, username=f'{PREFIX}-{slug}-{i}', password=password,
+                     email=f'{PREFIX}-{slug}-{i}@example.com')
+                for i in range(count)
+            ))
+            ids = list(range(first_id, first_id + count))
+            self.bulk_create(User.groups.through, (
+                User.groups.through(user_id=user_id, group_id=group.pk) for user_id in ids
+            ))
+            users[role] = ids
+        return users
+
+    def create_restaurants(self, owner_ids, count):
+        first_id = self.next_id(Restaurant)
+        restaurants = []
+        for i in range(count):
+            opening = self.rng.choice([6, 8, 10, 11, 12, 17, 18])
+            if self.rng.random() < 0.1:
+                # Open past midnight
+                closing = (opening + self.rng.randint(8, 14)) % 24
+            else:
+                closing = min(opening + self.rng.randint(6, 12), 23)
+            restaurants.append(Restaurant(
+                id=first_id + i,
+                name=f'{self.rng.choice(WORDS).title()} {self.rng.choice(WORDS).title()} {i}',
+                description=' '.join(self.rng.sample(WORDS, 8)),
+                opening_time=clock(opening), closing_time=clock(closing),
+                owner_id=owner_ids[i % len(owner_ids)],
+            ))
+        self.bulk_create(Restaurant, restaurants)
+        return [restaurant.pk for restaurant in restaurants]
+
+    def create_menu_items(self, restaurant_ids, per_restaurant):
+        """
+        Returns ``{restaurant_id: [(menu_item_id, price), ...]}``.
+        """
+        next_id = self.next_id(MenuItem)
+        menus = {}
+        rows = []
+        for restaurant_id in restaurant_ids:
+            menu = menus[restaurant_id] = []
+            for i in range(per_restaurant):
+                price = Decimal(self.rng.randint(250, 3500)) / 100
+                rows.append(MenuItem(
+                    id=next_id, restaurant_id=restaurant_id,
+                    name=' '.join(self.rng.sample(WORDS, 3)).title(),
+                    description=' '.join(self.rng.sample(WORDS, 10)),
+                    price=price,
+                    is_available=self.rng.random() < 0.95,
+                    category=self.rng.choice(CATEGORIES),
+                ))
+                menu.append((next_id, price))
+                next_id += 1
+        self.bulk_create(MenuItem, rows)
+        return menus
+
+    def create_orders(self, users, menus, count, end_date, days):
+        customers, crew = users[CUSTOMER], users[DELIVERY_CREW]
+        restaurant_ids = list(menus)
+        statuses, weights = zip(*STATUSES)
+        end = timezone.make_aware(datetime.combine(end_date, clock(23, 59)))
+        first_id = self.next_id(Order)
+        next_item_id = self.next_id(OrderItem)
+        orders, items = [], []
+        for i in range(count):
+            restaurant_id = self.rng.choice(restaurant_ids)
+            status = self.rng.choices(statuses, weights)[0]
+            order_id = first_id + i
+            menu = menus[restaurant_id]
+            total = Decimal('0.00')
+            for menu_item_id, price in self.rng.sample(menu, min(self.rng.randint(1, 4), len(menu))):
+                quantity = self.rng.randint(1, 3)
+                total += price * quantity
+                items.append(OrderItem(
+                    id=next_item_id, order_id=order_id, menu_item_id=menu_item_id,
+                    quantity=quantity, unit_price=price,
+                ))
+                next_item_id += 1
+            orders.append(Order(
+                id=order_id,
+                customer_id=self.rng.choice(customers),
+                restaurant_id=restaurant_id,
+                delivery_crew_id=self.rng.choice(crew) if status != 'preparing' and crew else None,
+                status=status,
+                total=total,
+                delivery_address=f'{self.rng.randint(1, 999)} {self.rng.choice(WORDS).title()} Street',
+                order_date=end - timedelta(seconds=self.rng.randint(0, days * 86400)),
+            ))
+            if len(orders) >= self.batch_size:
+                Order.objects.bulk_create(orders)
+                OrderItem.objects.bulk_create(items)
+                orders, items = [], []
+        if orders:
+            Order.objects.bulk_create(orders)
+            OrderItem.objects.bulk_create(items)
+
+    def create_carts(self, customer_ids, menus):
+        # A quarter of the customers have something in their cart
+        first_id = self.next_id(Cart)
+        restaurant_ids = list(menus)
+        carts, lines = [], []
+        for i, customer_id in enumerate(self.rng.sample(customer_ids, len(customer_ids) // 4)):
+            carts.append(Cart(id=first_id + i, customer_id=customer_id))
+            menu = menus[self.rng.choice(restaurant_ids)]
+            for menu_item_id, price in self.rng.sample(menu, min(3, len(menu))):
+                lines.append(CartItem(cart_id=first_id + i, menu_item_id=menu_item_id,
+                                      quantity=self.rng.randint(1, 3)))
+        self.bulk_create(Cart, carts)
+        self.bulk_create(CartItem, lines)
+
+    def reset_sequences(self):
+        # Rows were inserted with explicit ids; move the backends' sequences past them
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Restaurant, MenuItem, Cart, Order, OrderItem]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,96 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .roles import has_role, RESTAURANT_OWNER
+
+MENU_CACHE_TIMEOUT = getattr(settings, 'MENU_CACHE_TIMEOUT', 60 * 60)
+
+
+def version_key(restaurant_id):
+    return f'orders:menu-version:{restaurant_id}'
+
+
+def get_menu_version(restaurant_id):
+    """
+    Current version of a restaurant's menu.
+
+    Versions start from the clock rather than 1 so that a version key lost to
+    eviction or a cache restart never hands out an ETag used before.
+    """
+    key = version_key(restaurant_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key, 0)
+    return version
+
+
+async def aget_menu_version(restaurant_id):
+    key = version_key(restaurant_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key, 0)
+    return version
+
+
+def bump_menu_version(restaurant_id):
+    key = version_key(restaurant_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def menu_variant(user):
+    """
+    Which subset of a menu ``user`` is shown: staff see every item, owners see
+    their own restaurant's items, everyone else only available items.
+    """
+    if user.is_staff:
+        return 'staff'
+    if has_role(user, RESTAURANT_OWNER):
+        return f'owner:{user.pk}'
+    return 'public'
+
+
+def menu_etag(request, restaurant_id):
+    return version_etag(request, get_menu_version(restaurant_id))
+
+
+async def amenu_etag(request, restaurant_id):
+    # The user's roles must already be loaded, see roles.aget_roles
+    return version_etag(request, await aget_menu_version(restaurant_id))
+
+
+def version_etag(request, version):
+    fingerprint = '|'.join([
+        str(version),
+        menu_variant(request.user),
+        request.build_absolute_uri(),
+        request.accepted_renderer.format,
+    ])
+    return '"%s"' % hashlib.md5(fingerprint.encode()).hexdigest()
+
+
+def cache_key(etag):
+    return 'orders:menu:' + etag.strip('"')
+
+
+def get_cached_menu(etag):
+    return cache.get(cache_key(etag))
+
+
+async def aget_cached_menu(etag):
+    return await cache.aget(cache_key(etag))
+
+
+def set_cached_menu(etag, data, headers):
+    cache.set(cache_key(etag), (data, headers), MENU_CACHE_TIMEOUT)
+
+
+async def aset_cached_menu(etag, data, headers):
+    await cache.aset(cache_key(etag), (data, headers), MENU_CACHE_TIMEOUT)
@@ -0,0 +1,213 @@
+import codecs
+import csv
+import json
+from collections import defaultdict
+from itertools import count, islice
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from rest_framework.exceptions import ValidationError
+
+from .menu_cache import bump_menu_version
+from .models import MenuItem, MenuSearchTerm
+from .order_export import Echo
+from .search import index_menu_items
+from .serializers import MenuImportRowSerializer
+
+# Columns of an export, which an import accepts back unchanged
+MENU_FIELDS = ('id', 'name', 'description', 'price', 'is_available', 'category')
+# Rows validated and written together
+MENU_IMPORT_CHUNK_SIZE = getattr(settings, 'MENU_IMPORT_CHUNK_SIZE', 1000)
+MENU_IMPORT_MAX_ROWS = getattr(settings, 'MENU_IMPORT_MAX_ROWS', 20000)
+# Rows read per query while exporting
+MENU_EXPORT_CHUNK_SIZE = 2000
+# A failed import reports at most this many row errors
+MAX_IMPORT_ERRORS = 50
+# Changing these means rebuilding the item's search index entries
+INDEXED_FIELDS = {'name', 'description', 'category'}
+# A field set to at most this many distinct values in a chunk is written with
+# one UPDATE per value instead of bulk_update's CASE per row
+MAX_GROUPED_VALUES = 20
+
+
+def read_csv(upload):
+    """
+    Rows of an uploaded CSV file, read as they are needed. Only the columns
+    present in the header are set; an empty ``id`` adds a new item.
+    """
+    try:
+        for row in csv.DictReader(codecs.iterdecode(upload, 'utf-8-sig')):
+            row = {field: value for field, value in row.items() if field in MENU_FIELDS}
+            if not row.get('id'):
+                row.pop('id', None)
+            yield row
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise ValidationError({'file': f'Invalid CSV: {exc}'})
+
+
+def read_json(upload):
+    try:
+        rows = json.load(upload)
+    except ValueError as exc:
+        raise ValidationError({'file': f'Invalid JSON: {exc}'})
+    if not isinstance(rows, list):
+        raise ValidationError({'file': 'Expected a list of menu items.'})
+    return rows
+
+
+def import_menu(restaurant, rows, chunk_size=MENU_IMPORT_CHUNK_SIZE):
+    """
+    Add and update ``restaurant``'s menu items from ``rows``, dicts with the
+    columns of ``MENU_FIELDS``, in one transaction.
+
+    A row with an ``id`` updates only the fields it has, so ``id`` and
+    ``is_available`` or ``price`` columns alone toggle availability or
+    reprice items in bulk; a row without one adds an item. Rows are validated
+    and written ``chunk_size`` at a time with one bulk INSERT and one bulk
+    UPDATE per changed field and chunk. If any row is invalid nothing is written and the first
+    ``MAX_IMPORT_ERRORS`` errors are raised as a ValidationError, by row
+    number counted from 1.
+
+    bulk_create and bulk_update send no signals, so the search index and the
+    menu version are kept up to date here. Images are not imported, so there
+    are never image variants to schedule.
+
+    Returns the number of items created, updated and left unchanged.
+    """
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0}
+    errors = {}
+    seen_ids = set()
+    returns_ids = connections[MenuItem.objects.db].features.can_return_rows_from_bulk_insert
+    reindex_menu = False
+    rows = iter(rows)
+    with transaction.atomic():
+        for start in count(0, chunk_size):
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            if start + len(chunk) > MENU_IMPORT_MAX_ROWS:
+                raise ValidationError(
+                    {'file': f'At most {MENU_IMPORT_MAX_ROWS} rows can be imported at once.'}
+                )
+            serializer = MenuImportRowSerializer(data=chunk, many=True)
+            valid = serializer.is_valid()
+            # Errors by position in the chunk; DRF before 3.16 lists every row
+            chunk_errors = {}
+            if not valid:
+                errors_found = serializer.errors
+                if isinstance(errors_found, list):
+                    errors_found = dict(enumerate(errors_found))
+                chunk_errors = {position: found for position, found in errors_found.items() if found}
+            validated = serializer.validated_data if valid else []
+
+            ids = [row['id'] for row in validated if 'id' in row]
+            existing = restaurant.menu_items.in_bulk(ids) if ids else {}
+            for position, row in enumerate(validated):
+                if 'id' not in row:
+                    continue
+                if row['id'] in seen_ids:
+                    chunk_errors[position] = {'id': ['Duplicate menu item.']}
+                elif row['id'] not in existing:
+                    chunk_errors[position] = {'id': ['No such menu item in this restaurant.']}
+                seen_ids.add(row['id'])
+            errors.update(
+                (start + position + 1, row_errors) for position, row_errors in sorted(chunk_errors.items())
+            )
+            # Keep validating to report more errors, but write nothing more
+            if errors:
+                if len(errors) >= MAX_IMPORT_ERRORS:
+                    break
+                continue
+
+            added, reindexed, toggled = [], [], {True: [], False: []}
+            changed = defaultdict(list)
+            for row in validated:
+                if 'id' not in row:
+                    added.append(MenuItem(restaurant=restaurant, **row))
+                    continue
+                item = existing[row['id']]
+                row_changes = {
+                    field for field, value in row.items() if field != 'id' and getattr(item, field) != value
+                }
+                if not row_changes:
+                    counts['unchanged'] += 1
+                    continue
+                for field in row_changes:
+                    setattr(item, field, row[field])
+                    changed[field].append(item)
+                counts['updated'] += 1
+                if row_changes & INDEXED_FIELDS:
+                    reindexed.append(item)
+                elif 'is_available' in row_changes:
+                    toggled[item.is_available].append(item.pk)
+
+            if added:
+                MenuItem.objects.bulk_create(added)
+                counts['created'] += len(added)
+                if returns_ids:
+                    reindexed.extend(added)
+                else:
+                    # No ids to index the new items by (MySQL)
+                    reindex_menu = True
+            for field, items in changed.items():
+                write_field(items, field)
+            if reindexed and not reindex_menu:
+                index_menu_items(reindexed)
+            for is_available, pks in toggled.items():
+                if pks:
+                    MenuSearchTerm.objects.filter(menu_item__in=pks).update(is_available=is_available)
+
+        if errors:
+            raise ValidationError({'rows': dict(islice(errors.items(), MAX_IMPORT_ERRORS))})
+        if reindex_menu:
+            index_menu_items(restaurant.menu_items.all())
+        if counts['created'] or counts['updated']:
+            transaction.on_commit(lambda: bump_menu_version(restaurant.pk))
+    return counts
+
+
+def write_field(items, field):
+    """
+    Save ``field`` of ``items``. Toggles and repricing set most rows to one of
+    a few values, which a plain UPDATE per value writes far faster than
+    bulk_update.
+    """
+    by_value = defaultdict(list)
+    for item in items:
+        by_value[getattr(item, field)].append(item.pk)
+    if len(by_value) > MAX_GROUPED_VALUES:
+        MenuItem.objects.bulk_update(items, [field])
+        return
+    for value, pks in by_value.items():
+        MenuItem.objects.filter(pk__in=pks).update(**{field: value})
+
+
+def export_rows(restaurant):
+    """
+    Every menu item of ``restaurant`` as a tuple of ``MENU_FIELDS``, read in
+    chunks by id so memory use does not grow with the menu.
+    """
+    queryset = MenuItem.objects.filter(restaurant=restaurant).order_by('id').values_list(*MENU_FIELDS)
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk)[:MENU_EXPORT_CHUNK_SIZE])
+        yield from chunk
+        if len(chunk) < MENU_EXPORT_CHUNK_SIZE:
+            return
+        last_pk = chunk[-1][0]
+
+
+def export_csv(restaurant):
+    writer = csv.writer(Echo())
+    yield writer.writerow(MENU_FIELDS)
+    for row in export_rows(restaurant):
+        yield writer.writerow(row)
+
+
+def export_json(restaurant):
+    separator = '['
+    for row in export_rows(restaurant):
+        yield separator + json.dumps(dict(zip(MENU_FIELDS, row)), cls=DjangoJSONEncoder)
+        separator = ',\n'
+    yield '[]\n' if separator == '[' else ']\n'
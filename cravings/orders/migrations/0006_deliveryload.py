@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_delivery_load(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    DeliveryLoad = apps.get_model('orders', 'DeliveryLoad')
+    active = (
+        Order.objects.filter(status='out_for_delivery', delivery_crew__isnull=False)
+        .values('delivery_crew').annotate(count=models.Count('id'))
+    )
+    DeliveryLoad.objects.bulk_create([
+        DeliveryLoad(crew_id=row['delivery_crew'], active_orders=row['count']) for row in active
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('orders', '0005_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryLoad',
+            fields=[
+                ('crew', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='delivery_load', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('active_orders', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['active_orders'], name='deliveryload_active_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_delivery_load, migrations.RunPython.noop),
+    ]
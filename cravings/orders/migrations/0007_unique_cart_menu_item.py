@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    CartItem = apps.get_model('orders', 'CartItem')
+    duplicates = (
+        CartItem.objects.values('cart', 'menu_item')
+        .annotate(count=models.Count('id'), quantity=models.Sum('quantity'), keep=models.Min('id'))
+        .filter(count__gt=1)
+    )
+    for row in duplicates:
+        CartItem.objects.filter(pk=row['keep']).update(quantity=row['quantity'])
+        CartItem.objects.filter(
+            cart=row['cart'], menu_item=row['menu_item']
+        ).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_deliveryload'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'menu_item'), name='unique_cart_menu_item'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField()),
+                ('category', models.CharField(max_length=100)),
+                ('is_available', models.BooleanField()),
+                ('menu_item', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='orders.menuitem')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='orders.restaurant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'weight', 'menu_item', 'is_available'], name='menusearch_term_idx'), models.Index(fields=['menu_item', 'term', 'weight', 'is_available'], name='menusearch_item_idx')],
+                'constraints': [models.UniqueConstraint(fields=('term', 'menu_item'), name='unique_menu_search_term')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_menu_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='spans_midnight',
+            field=models.GeneratedField(db_persist=True, expression=models.Q(('closing_time__lte', models.F('opening_time'))), output_field=models.BooleanField()),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['opening_time', 'closing_time', 'spans_midnight'], name='restaurant_opening_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['closing_time', 'spans_midnight'], name='restaurant_closing_idx'),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:55
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.utils import timezone
+
+STATUS_CHOICES = [
+    ('preparing', 'Preparing'),
+    ('out_for_delivery', 'Out for Delivery'),
+    ('delivered', 'Delivered'),
+    ('cancelled', 'Cancelled'),
+]
+# As orders.rollups.EXCLUDED_STATUSES
+EXCLUDED_STATUSES = ('cancelled',)
+
+
+def normalize_status(apps, schema_editor):
+    # Checkout wrote 'pending' and the old default was the label 'Preparing'
+    renames = {label: value for value, label in STATUS_CHOICES}
+    renames['pending'] = 'preparing'
+    # Orders the sales rollups counted and now leave out ('Cancelled'), or
+    # the other way round
+    days = set()
+    for name in ('Order', 'ArchivedOrder'):
+        model = apps.get_model('orders', name)
+        for old, new in renames.items():
+            renamed = model.objects.filter(status=old)
+            if (old in EXCLUDED_STATUSES) != (new in EXCLUDED_STATUSES):
+                days.update(
+                    (restaurant_id, timezone.localdate(order_date))
+                    for restaurant_id, order_date in renamed.values_list('restaurant_id', 'order_date')
+                )
+            renamed.update(status=new)
+    rebuild_rollups(apps, days)
+
+
+def rebuild_rollups(apps, days):
+    """
+    Recompute the sales rollups of ``days``, (restaurant_id, day) pairs,
+    from the live and archived orders, like orders.rollups.rebuild.
+    """
+    DailySales = apps.get_model('orders', 'DailySales')
+    DailyItemSales = apps.get_model('orders', 'DailyItemSales')
+    sources = [
+        (apps.get_model('orders', 'Order'), apps.get_model('orders', 'OrderItem')),
+        (apps.get_model('orders', 'ArchivedOrder'), apps.get_model('orders', 'ArchivedOrderItem')),
+    ]
+    amount = ExpressionWrapper(
+        F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=14, decimal_places=2)
+    )
+    for restaurant_id, day in days:
+        count, revenue = 0, Decimal('0')
+        per_item = defaultdict(lambda: [0, Decimal('0')])
+        for order_model, item_model in sources:
+            orders = order_model.objects.filter(restaurant_id=restaurant_id, order_date__date=day).exclude(
+                status__in=EXCLUDED_STATUSES
+            )
+            totals = orders.aggregate(count=Count('id'), revenue=Sum('total'))
+            count += totals['count']
+            revenue += totals['revenue'] or 0
+            items = (
+                item_model.objects.filter(order__in=orders).order_by().values_list('menu_item_id')
+                .annotate(sold=Sum('quantity'), revenue=Sum(amount))
+            )
+            for menu_item_id, sold, item_revenue in items:
+                per_item[menu_item_id][0] += sold
+                per_item[menu_item_id][1] += item_revenue
+        DailySales.objects.update_or_create(
+            restaurant_id=restaurant_id, day=day, defaults={'orders': count, 'revenue': revenue}
+        )
+        DailyItemSales.objects.filter(restaurant_id=restaurant_id, day=day).delete()
+        DailyItemSales.objects.bulk_create([
+            DailyItemSales(
+                restaurant_id=restaurant_id, day=day, menu_item_id=menu_item_id, quantity=sold, revenue=item_revenue
+            )
+            for menu_item_id, (sold, item_revenue) in per_item.items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0015_restaurant_auto_dispatch'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=STATUS_CHOICES, default='preparing', max_length=20),
+        ),
+        migrations.RunPython(normalize_status, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User, Group
 from django.utils import timezone
+from .querysets import (
+    RestaurantQuerySet, MenuItemQuerySet, CartQuerySet, CartItemQuerySet, OrderQuerySet,
+    ArchivedOrderQuerySet
+)
 
 class Restaurant(models.Model):
     name = models.CharField(max_length=255)
@@ -8,6 +12,23 @@ class Restaurant(models.Model):
     opening_time = models.TimeField()
     closing_time = models.TimeField()
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='restaurants')
+    # Closes after midnight, e.g. 18:00-02:00; equal times mean open all day
+    spans_midnight = models.GeneratedField(
+        expression=models.Q(closing_time__lte=models.F('opening_time')),
+        output_field=models.BooleanField(),
+        db_persist=True,
+    )
+    # Hand waiting orders to drivers automatically, see orders.dispatch
+    auto_dispatch = models.BooleanField(default=False)
+    
+    objects = RestaurantQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # "Open at" filtering, see RestaurantQuerySet.open_at
+            models.Index(fields=['opening_time', 'closing_time', 'spans_midnight'], name='restaurant_opening_idx'),
+            models.Index(fields=['closing_time', 'spans_midnight'], name='restaurant_closing_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -22,20 +43,39 @@ class MenuItem(models.Model):
         ('special', 'Special'),
     ]
     
-    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='menu_items')
+    # Indexed by the composite indexes in Meta
+    restaurant = models.ForeignKey(
+        Restaurant, on_delete=models.CASCADE, related_name='menu_items', db_index=False
+    )
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to='menu_items/', null=True, blank=True)
+    # Resized copies of ``image`` by variant name, see orders.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_available = models.BooleanField(default=True)
     category = models.CharField(max_length=100, choices=CATEGORY_CHOICES, default='main')
     
+    objects = MenuItemQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # Keyset pagination of a restaurant's menu
+            models.Index(fields=['restaurant', 'category', 'id'], name='menuitem_menu_page_idx'),
+            # The same for customers, who only see available items
+            models.Index(
+                fields=['restaurant', 'is_available', 'category', 'id'], name='menuitem_available_idx'
+            ),
+        ]
+    
     def __str__(self):
         return f"{self.name} - {self.restaurant.name}"
 
 class Cart(models.Model):
     customer = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     
+    objects = CartQuerySet.as_manager()
+    
     def __str__(self):
         return f"Cart for {self.customer.username}"
 
@@ -44,6 +84,13 @@ class CartItem(models.Model):
     menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     
+    objects = CartItemQuerySet.as_manager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'menu_item'], name='unique_cart_menu_item'),
+        ]
+    
     def __str__(self):
         return f"{self.quantity} x {self.menu_item.name}"
     
@@ -54,25 +101,49 @@ class CartItem(models.Model):
 class Order(models.Model):
     STATUS_CHOICES = [
         ('preparing', 'Preparing'),
+        ('ready', 'Ready for Pickup'),
         ('out_for_delivery', 'Out for Delivery'),
         ('delivered', 'Delivered'),
         ('cancelled', 'Cancelled'),
     ]
     
-    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
-    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='orders')
+    # The foreign keys are indexed by the composite indexes in Meta
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders', db_index=False)
+    restaurant = models.ForeignKey(
+        Restaurant, on_delete=models.CASCADE, related_name='orders', db_index=False
+    )
     delivery_crew = models.ForeignKey(
         User, 
         on_delete=models.SET_NULL, 
         related_name='delivery_orders',
         null=True,
-        blank=True
+        blank=True,
+        db_index=False,
     )
-    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Preparing')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='preparing')
     total = models.DecimalField(max_digits=10, decimal_places=2)
     delivery_address = models.TextField()
     order_date = models.DateTimeField(default=timezone.now)
     
+    objects = OrderQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # Keyset pagination of order listings
+            models.Index(fields=['order_date', 'id'], name='order_date_page_idx'),
+            # The same per customer, per restaurant and status (owners) and
+            # per crew member and status (crew listings and delivery load counts)
+            models.Index(fields=['customer', 'order_date', 'id'], name='order_customer_date_idx'),
+            models.Index(
+                fields=['restaurant', 'status', 'order_date', 'id'], name='order_restaurant_status_idx'
+            ),
+            models.Index(
+                fields=['delivery_crew', 'status', 'order_date', 'id'], name='order_crew_status_idx'
+            ),
+            # Order exports, restaurant by restaurant in id order
+            models.Index(fields=['restaurant', 'id'], name='order_export_idx'),
+        ]
+    
     def __str__(self):
         return f"Order #{self.id} - {self.customer.username}"
 
@@ -88,3 +159,154 @@ class OrderItem(models.Model):
     @property
     def subtotal(self):
         return self.quantity * self.unit_price
+
+
+class ArchivedOrder(models.Model):
+    """
+    A completed order moved out of the live tables by ``archive_orders``.
+    Keeps the id it had as an ``Order``.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    customer = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='archived_orders', db_index=False
+    )
+    restaurant = models.ForeignKey(
+        Restaurant, on_delete=models.CASCADE, related_name='archived_orders', db_index=False
+    )
+    delivery_crew = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name='archived_deliveries',
+        null=True,
+        blank=True,
+        db_index=False,
+    )
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    delivery_address = models.TextField()
+    order_date = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+    
+    objects = ArchivedOrderQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # Keyset pagination of order history, overall and per customer,
+            # restaurant and crew member
+            models.Index(fields=['order_date', 'id'], name='archivedorder_date_idx'),
+            models.Index(fields=['customer', 'order_date', 'id'], name='archivedorder_customer_idx'),
+            models.Index(fields=['restaurant', 'order_date', 'id'], name='archivedorder_restaurant_idx'),
+            models.Index(fields=['delivery_crew', 'order_date', 'id'], name='archivedorder_crew_idx'),
+            # Order history exports, restaurant by restaurant in id order
+            models.Index(fields=['restaurant', 'id'], name='archivedorder_export_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Archived order #{self.id} - {self.customer.username}"
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.menu_item.name}"
+    
+    @property
+    def subtotal(self):
+        return self.quantity * self.unit_price
+
+
+class DeliveryLoad(models.Model):
+    """
+    Number of orders a delivery crew member is currently delivering, kept up
+    to date by the assign/deliver transitions.
+    """
+    crew = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='delivery_load'
+    )
+    active_orders = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['active_orders'], name='deliveryload_active_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.crew.username}: {self.active_orders} active"
+
+class DailySales(models.Model):
+    """
+    Per-restaurant, per-day order count and revenue, maintained incrementally
+    as orders are placed and cancelled.
+    """
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'day'], name='unique_daily_sales'),
+        ]
+    
+    def __str__(self):
+        return f"{self.restaurant.name} on {self.day}: {self.orders} orders"
+
+class DailyItemSales(models.Model):
+    """
+    Per-restaurant, per-day, per-menu-item quantity sold and revenue.
+    """
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='daily_item_sales')
+    day = models.DateField()
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['restaurant', 'day', 'menu_item'], name='unique_daily_item_sales'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.menu_item.name} on {self.day}: {self.quantity} sold"
+
+class MenuSearchTerm(models.Model):
+    """
+    Inverted index entry: one row per distinct word of a menu item's name,
+    description or restaurant name. Filter columns are copied from the menu
+    item so a search never has to scan ``MenuItem``.
+    """
+    term = models.CharField(max_length=64)
+    menu_item = models.ForeignKey(
+        MenuItem, on_delete=models.CASCADE, related_name='search_terms', db_index=False
+    )
+    weight = models.PositiveSmallIntegerField()
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='+')
+    category = models.CharField(max_length=100)
+    is_available = models.BooleanField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'menu_item'], name='unique_menu_search_term'),
+        ]
+        indexes = [
+            # Cover the candidate lookup, best postings first, and the ranking
+            # of those candidates, so a search never reads the table rows
+            models.Index(
+                fields=['term', 'weight', 'menu_item', 'is_available'], name='menusearch_term_idx'
+            ),
+            models.Index(
+                fields=['menu_item', 'term', 'weight', 'is_available'], name='menusearch_item_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.term} -> {self.menu_item_id}"
@@ -0,0 +1,100 @@
+import csv
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .renderers import FastJSONRenderer
+
+# Orders read, with their items, per pair of queries
+ORDER_EXPORT_CHUNK_SIZE = getattr(settings, 'ORDER_EXPORT_CHUNK_SIZE', 1000)
+
+# One CSV row per order item; orders without items get one row with the
+# item columns left empty
+ORDER_COLUMNS = (
+    'order_id', 'order_date', 'status', 'customer_name', 'restaurant_name',
+    'delivery_crew_name', 'delivery_address', 'total',
+)
+ITEM_COLUMNS = ('item_id', 'menu_item', 'menu_item_name', 'quantity', 'unit_price', 'subtotal')
+
+
+class Echo:
+    """
+    File-like object handing back what csv.writer writes to it, so streamed
+    CSV responses can yield each row.
+    """
+    def write(self, value):
+        return value
+
+
+def date_range(queryset, start=None, end=None):
+    """
+    Orders placed on the days ``start`` to ``end``, both included, in the
+    current time zone.
+    """
+    if start is not None:
+        queryset = queryset.filter(order_date__gte=day_start(start))
+    if end is not None:
+        queryset = queryset.filter(order_date__lt=day_start(end + timedelta(days=1)))
+    return queryset
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def order_chunks(queryset, projection, restaurant_ids=None, chunk_size=ORDER_EXPORT_CHUNK_SIZE):
+    """
+    Represent the orders of ``queryset`` with ``projection``, ``chunk_size``
+    at a time: in id order, or restaurant by restaurant and in id order
+    within each when ``restaurant_ids`` is given.
+    """
+    if restaurant_ids is None:
+        yield from id_chunks(queryset, projection, chunk_size)
+        return
+    for restaurant_id in restaurant_ids:
+        yield from id_chunks(queryset.filter(restaurant_id=restaurant_id), projection, chunk_size)
+
+
+def id_chunks(queryset, projection, chunk_size):
+    # Each chunk is one query seeking past the last id, rather than a cursor
+    # held open for the whole download, and one for the chunk's items. Per
+    # restaurant the seek runs on the (restaurant, id) export index.
+    rows = projection.project(queryset).order_by('id')
+    last_pk = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last_pk)[:chunk_size])
+        if chunk:
+            yield projection.represent(chunk)
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1]['id']
+
+
+def export_csv(chunks):
+    writer = csv.writer(Echo())
+    # Sent before the first query so the download starts right away
+    yield writer.writerow(ORDER_COLUMNS + ITEM_COLUMNS)
+    for orders in chunks:
+        lines = []
+        for order in orders:
+            head = [
+                order['id'], order['order_date'], order['status'], order['customer_name'],
+                order['restaurant_name'], order.get('delivery_crew_name', ''),
+                order['delivery_address'], order['total'],
+            ]
+            for item in order['items']:
+                lines.append(head + [
+                    item['id'], item['menu_item'], item['menu_item_name'], item['quantity'],
+                    item['unit_price'], item['subtotal'],
+                ])
+            if not order['items']:
+                lines.append(head + [''] * len(ITEM_COLUMNS))
+        yield ''.join(writer.writerow(line) for line in lines)
+
+
+def export_ndjson(chunks):
+    # One order per line, encoded like the API's JSON responses
+    renderer = FastJSONRenderer()
+    for orders in chunks:
+        yield b''.join(renderer.render(order) + b'\n' for order in orders)
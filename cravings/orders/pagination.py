@@ -0,0 +1,146 @@
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a composite ordering.
+
+    The cursor holds the ordering values of the last row on a page and the next
+    page is fetched with a ``WHERE (a, b) > (x, y)`` style filter, so every page
+    costs the same regardless of depth and rows inserted ahead of the cursor do
+    not shift later pages. The last ordering field must be unique.
+
+    Response bodies stay plain lists; the cursors are sent in a ``Link`` header.
+    """
+    ordering = ('id',)
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.build_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.build_page([row async for row in self.get_page_queryset(queryset, request)])
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Return the (lazy) queryset for the requested page, including one look-ahead row.
+        """
+        self.request = request
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+        self.reverse, values = self.decode_cursor(request)
+        self.has_cursor = values is not None
+
+        ordering = self.get_ordering()
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, values))
+        return queryset[:self.page_size + 1]
+
+    def build_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            has_next, has_previous = self.has_cursor, has_more
+        else:
+            has_next, has_previous = has_more, self.has_cursor
+
+        self.next_cursor = self.encode_cursor(rows[-1], False) if rows and has_next else None
+        self.previous_cursor = self.encode_cursor(rows[0], True) if rows and has_previous else None
+        return rows
+
+    def get_paginated_response(self, data):
+        links = []
+        if self.next_cursor:
+            links.append(f'<{self.get_link(self.next_cursor)}>; rel="next"')
+        if self.previous_cursor:
+            links.append(f'<{self.get_link(self.previous_cursor)}>; rel="prev"')
+        headers = {'Link': ', '.join(links)} if links else None
+        return Response(data, headers=headers)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self):
+        if not self.reverse:
+            return self.ordering
+        return tuple(
+            field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering
+        )
+
+    def seek_filter(self, ordering, values):
+        """
+        Rows strictly after ``values`` in ``ordering``:
+        ``a > x OR (a = x AND b > y) OR ...`` with ``<`` for descending fields.
+        """
+        clauses = []
+        for position, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {f.lstrip('-'): value for f, value in zip(ordering[:position], values)}
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': values[position]}))
+        return reduce(or_, clauses)
+
+    def get_key(self, row):
+        names = [field.lstrip('-') for field in self.ordering]
+        if isinstance(row, dict):
+            return [row[name] for name in names]
+        return [getattr(row, name) for name in names]
+
+    def encode_cursor(self, row, reverse):
+        key = [value.isoformat() if hasattr(value, 'isoformat') else value for value in self.get_key(row)]
+        payload = json.dumps({'r': int(reverse), 'k': key}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            fields = [self.model._meta.get_field(field.lstrip('-')) for field in self.ordering]
+            key = payload['k']
+            if len(key) != len(fields):
+                raise ValueError
+            values = [field.to_python(value) for field, value in zip(fields, key)]
+            return bool(payload['r']), values
+        except (TypeError, ValueError, KeyError, binascii.Error, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_link(self, cursor):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+
+class OrderPagination(KeysetPagination):
+    ordering = ('-order_date', '-id')
+
+
+class MenuItemPagination(KeysetPagination):
+    ordering = ('category', 'id')
+    page_size = 100
+    max_page_size = 500
+
+
+class RestaurantPagination(KeysetPagination):
+    ordering = ('id',)
@@ -1,19 +1,23 @@
 from rest_framework import permissions
+from .roles import aget_roles, has_role, RESTAURANT_OWNER, DELIVERY_CREW, CUSTOMER
 
 class IsRestaurantOwner(permissions.BasePermission):
     """
     Custom permission to only allow restaurant owners to access their restaurants.
     """
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Restaurant Owner').exists()
+        return has_role(request.user, RESTAURANT_OWNER)
+
+    async def ahas_permission(self, request, view):
+        return RESTAURANT_OWNER in await aget_roles(request.user)
     
     def has_object_permission(self, request, view, obj):
         # For Restaurant model
         if hasattr(obj, 'owner'):
-            return obj.owner == request.user
+            return obj.owner_id == request.user.id
         # For MenuItem model
         if hasattr(obj, 'restaurant'):
-            return obj.restaurant.owner == request.user
+            return obj.restaurant.owner_id == request.user.id
         return False
 
 class IsDeliveryCrew(permissions.BasePermission):
@@ -21,24 +25,30 @@ class IsDeliveryCrew(permissions.BasePermission):
     Custom permission to only allow delivery crew members to access their assigned orders.
     """
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Delivery Crew').exists()
+        return has_role(request.user, DELIVERY_CREW)
+
+    async def ahas_permission(self, request, view):
+        return DELIVERY_CREW in await aget_roles(request.user)
     
     def has_object_permission(self, request, view, obj):
         # Check if the user is assigned to this order
-        return obj.delivery_crew == request.user
+        return obj.delivery_crew_id == request.user.id
 
 class IsCustomer(permissions.BasePermission):
     """
     Custom permission to only allow customers to access their own orders.
     """
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Customer').exists() or request.user.is_staff
+        return has_role(request.user, CUSTOMER) or request.user.is_staff
+
+    async def ahas_permission(self, request, view):
+        return CUSTOMER in await aget_roles(request.user) or request.user.is_staff
     
     def has_object_permission(self, request, view, obj):
         # For Cart model
         if hasattr(obj, 'customer'):
-            return obj.customer == request.user
+            return obj.customer_id == request.user.id
         # For CartItem model
         if hasattr(obj, 'cart'):
-            return obj.cart.customer == request.user
+            return obj.cart.customer_id == request.user.id
         return False 
\ No newline at end of file
@@ -0,0 +1,166 @@
+from collections import defaultdict
+
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .images import current_variants
+from .instrumentation import measure_serialization
+from .models import MenuItem, OrderItem, ArchivedOrderItem
+from .serializers import OrderSerializer
+
+
+def decimal_string(value):
+    # DecimalField's representation with COERCE_DECIMAL_TO_STRING
+    return None if value is None else f'{value:f}'
+
+
+class Projection:
+    """
+    Read-only representation of list rows built straight from ``values()``,
+    with the same output as the resource's serializer. The serializers stay
+    in charge of validation and writes; this skips their per-field machinery
+    on large list responses.
+
+    ``fields`` are the value paths to select; they must include the
+    paginator's ordering fields. ``represent`` turns one page of those rows
+    into response dicts.
+    """
+    fields = ()
+
+    def __init__(self, request):
+        self.request = request
+
+    def project(self, queryset):
+        return queryset.prefetch_related(None).values(*self.fields)
+
+    def represent(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+    def to_representation(self, row):
+        raise NotImplementedError
+
+
+class RestaurantProjection(Projection):
+    fields = (
+        'id', 'name', 'description', 'opening_time', 'closing_time', 'auto_dispatch', 'owner_id',
+        'owner__username',
+    )
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+            'opening_time': row['opening_time'].isoformat(),
+            'closing_time': row['closing_time'].isoformat(),
+            'auto_dispatch': row['auto_dispatch'],
+            'owner': row['owner_id'],
+            'owner_name': row['owner__username'],
+        }
+
+
+class MenuItemProjection(Projection):
+    fields = (
+        'id', 'restaurant_id', 'restaurant__name', 'name', 'description', 'price',
+        'image', 'image_variants', 'is_available', 'category',
+    )
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.storage = MenuItem._meta.get_field('image').storage
+        self.origin = request.build_absolute_uri('/')[:-1]
+
+    def url(self, name):
+        # What build_absolute_uri does with the storage's (already quoted)
+        # path, without re-parsing the request for every row
+        url = self.storage.url(name)
+        return self.origin + url if url.startswith('/') and not url.startswith('//') else url
+
+    def to_representation(self, row):
+        image = row['image']
+        image_url = self.url(image) if image else None
+        return {
+            'id': row['id'],
+            'restaurant': row['restaurant_id'],
+            'restaurant_name': row['restaurant__name'],
+            'name': row['name'],
+            'description': row['description'],
+            'price': decimal_string(row['price']),
+            'image': image_url,
+            'image_url': image_url,
+            'image_variants': {
+                name: self.url(entry['path'])
+                for name, entry in current_variants(image, row['image_variants']).items()
+            },
+            'is_available': row['is_available'],
+            'category': row['category'],
+        }
+
+
+class OrderProjection(Projection):
+    fields = (
+        'id', 'customer__username', 'restaurant__name', 'delivery_crew__username', 'status',
+        'total', 'delivery_address', 'order_date',
+    )
+    item_model = OrderItem
+    item_fields = ('id', 'order_id', 'menu_item_id', 'menu_item__name', 'quantity', 'unit_price')
+    date_format = OrderSerializer._declared_fields['order_date'].format
+
+    def represent(self, rows):
+        if not rows:
+            return []
+        # One query for the items of the whole page, like the prefetch
+        items = defaultdict(list)
+        lines = (
+            self.item_model.objects.filter(order_id__in=[row['id'] for row in rows])
+            .order_by('order_id', 'id').values_list(*self.item_fields)
+        )
+        for pk, order_id, menu_item_id, menu_item_name, quantity, unit_price in lines:
+            items[order_id].append({
+                'id': pk,
+                'menu_item': menu_item_id,
+                'menu_item_name': menu_item_name,
+                'quantity': quantity,
+                'unit_price': decimal_string(unit_price),
+                'subtotal': quantity * unit_price,
+            })
+        return [self.to_representation(row, items[row['id']]) for row in rows]
+
+    def to_representation(self, row, items):
+        data = {
+            'id': row['id'],
+            'customer_name': row['customer__username'],
+            'restaurant_name': row['restaurant__name'],
+        }
+        # The serializer leaves the key out for unassigned orders
+        if row['delivery_crew__username'] is not None:
+            data['delivery_crew_name'] = row['delivery_crew__username']
+        data.update({
+            'status': row['status'],
+            'total': decimal_string(row['total']),
+            'delivery_address': row['delivery_address'],
+            'items': items,
+            'order_date': timezone.localtime(row['order_date']).strftime(self.date_format),
+        })
+        return data
+
+
+class ArchivedOrderProjection(OrderProjection):
+    item_model = ArchivedOrderItem
+
+
+class ProjectedListMixin:
+    """
+    Serve ``list`` through ``projection_class`` instead of the serializer.
+    """
+    projection_class = None
+
+    def list(self, request, *args, **kwargs):
+        projection = self.projection_class(request)
+        queryset = projection.project(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        with measure_serialization():
+            data = projection.represent(list(queryset) if page is None else page)
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
@@ -0,0 +1,113 @@
+from decimal import Decimal
+
+from django.db import models
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
+
+from .roles import has_role, RESTAURANT_OWNER, DELIVERY_CREW
+
+
+class RestaurantQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related('owner')
+
+    def visible_to(self, user):
+        if user.is_staff:
+            return self
+        if has_role(user, RESTAURANT_OWNER):
+            return self.filter(owner=user)
+        return self
+
+    def open_at(self, at):
+        """
+        Restaurants open at the time of day ``at``. Same-day hours match
+        ``opening_time <= at < closing_time``; overnight hours match either side
+        of midnight. Each branch of the OR starts with a range on one of the
+        hours indexes.
+        """
+        return self.filter(
+            Q(opening_time__lte=at) & (Q(closing_time__gt=at) | Q(spans_midnight=True))
+            | Q(closing_time__gt=at, spans_midnight=True)
+        )
+
+
+class MenuItemQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related('restaurant')
+
+    def visible_to(self, user):
+        if user.is_staff:
+            return self
+        if has_role(user, RESTAURANT_OWNER):
+            return self.filter(restaurant__owner=user)
+        # Value() makes SQLite compare the column (is_available = true) instead
+        # of testing it bare, which it cannot seek menuitem_available_idx with
+        return self.filter(is_available=Value(True))
+
+
+def line_total():
+    """
+    ``quantity * menu_item.price`` for a cart line, as a database expression.
+    """
+    return models.ExpressionWrapper(
+        models.F('quantity') * models.F('menu_item__price'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+class CartQuerySet(models.QuerySet):
+    def with_related(self):
+        from .models import CartItem
+        return self.prefetch_related(
+            models.Prefetch('items', queryset=CartItem.objects.with_related())
+        )
+
+    def with_total(self):
+        from .models import CartItem
+        totals = CartItem.objects.filter(cart=models.OuterRef('pk')).order_by().values('cart')
+        return self.annotate(total_amount=Coalesce(
+            models.Subquery(totals.annotate(total=models.Sum(line_total())).values('total')),
+            Value(Decimal('0.00')),
+        ))
+
+
+class CartItemQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related('menu_item', 'cart')
+
+    def total_amount(self):
+        total = self.order_by().aggregate(total=models.Sum(line_total()))['total']
+        return total or Decimal('0.00')
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_related(self):
+        from .models import OrderItem
+        return self.select_related('customer', 'restaurant', 'delivery_crew').prefetch_related(
+            models.Prefetch('items', queryset=OrderItem.objects.select_related('menu_item'))
+        )
+
+    def visible_to(self, user, crew_status=None):
+        """
+        Orders a user may see: everything for staff, their restaurants' orders
+        for owners, assigned orders for delivery crew (optionally narrowed to
+        ``crew_status``), and their own otherwise.
+        """
+        if user.is_staff:
+            return self
+        if has_role(user, RESTAURANT_OWNER):
+            return self.filter(restaurant__owner=user)
+        if has_role(user, DELIVERY_CREW):
+            queryset = self.filter(delivery_crew=user)
+            if crew_status:
+                queryset = queryset.filter(status=crew_status)
+            return queryset
+        return self.filter(customer=user)
+
+
+class ArchivedOrderQuerySet(OrderQuerySet):
+    def with_related(self):
+        from .models import ArchivedOrderItem
+        return self.select_related('customer', 'restaurant', 'delivery_crew').prefetch_related(
+            models.Prefetch('items', queryset=ArchivedOrderItem.objects.select_related('menu_item'))
+        )
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .routers import primary_reads
+
+RESTAURANT_OWNER = 'Restaurant Owner'
+DELIVERY_CREW = 'Delivery Crew'
+CUSTOMER = 'Customer'
+
+ROLE_CACHE_TIMEOUT = getattr(settings, 'ROLE_CACHE_TIMEOUT', 60 * 15)
+
+
+def role_cache_key(user_id):
+    return f'orders:roles:{user_id}'
+
+
+def get_roles(user):
+    """
+    Return the names of the groups ``user`` belongs to.
+
+    The result is memoized on the user object for the rest of the request and
+    in the cache across requests; ``invalidate_roles`` drops the cached copy
+    whenever group membership changes.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, '_cached_roles', None)
+    if roles is None:
+        key = role_cache_key(user.pk)
+        roles = cache.get(key)
+        if roles is None:
+            with primary_reads():
+                roles = frozenset(user.groups.values_list('name', flat=True))
+            cache.set(key, roles, ROLE_CACHE_TIMEOUT)
+        user._cached_roles = roles
+    return roles
+
+
+async def aget_roles(user):
+    """
+    ``get_roles`` for async views. It memoizes on the user too, so sync code
+    later in the request, such as ``has_role`` in the querysets' ``visible_to``,
+    runs without I/O.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    roles = getattr(user, '_cached_roles', None)
+    if roles is None:
+        key = role_cache_key(user.pk)
+        roles = await cache.aget(key)
+        if roles is None:
+            with primary_reads():
+                roles = frozenset([name async for name in user.groups.values_list('name', flat=True)])
+            await cache.aset(key, roles, ROLE_CACHE_TIMEOUT)
+        user._cached_roles = roles
+    return roles
+
+
+def has_role(user, role):
+    return role in get_roles(user)
+
+
+def invalidate_roles(*user_ids):
+    cache.delete_many([role_cache_key(user_id) for user_id in user_ids])
@@ -0,0 +1,224 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySales, DailyItemSales, Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+
+# Orders in these states do not count towards sales
+EXCLUDED_STATUSES = ('cancelled',)
+
+
+def _bump(model, key, deltas):
+    """
+    Add ``deltas`` to the rollup row identified by ``key``, creating it if needed.
+    """
+    increments = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**key).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **deltas)
+    except IntegrityError:
+        # Created concurrently between our UPDATE and INSERT
+        model.objects.filter(**key).update(**increments)
+
+
+def _bump_many(model, rows):
+    """
+    Apply several ``(key, deltas)`` increments to one rollup table with one
+    read, one bulk UPDATE and one bulk INSERT.
+    """
+    filters = Q()
+    for key, deltas in rows:
+        filters |= Q(**key)
+    key_fields = list(rows[0][0])
+    existing = {
+        tuple(getattr(row, field) for field in key_fields): row
+        for row in model.objects.filter(filters)
+    }
+    updates, creates = [], []
+    for key, deltas in rows:
+        row = existing.get(tuple(key.values()))
+        if row is None:
+            creates.append((key, deltas))
+            continue
+        for field, delta in deltas.items():
+            setattr(row, field, F(field) + delta)
+        updates.append(row)
+    if updates:
+        model.objects.bulk_update(updates, list(rows[0][1]))
+    if creates:
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create([model(**key, **deltas) for key, deltas in creates])
+        except IntegrityError:
+            for key, deltas in creates:
+                _bump(model, key, deltas)
+
+
+def apply_order(order, lines, sign=1):
+    """
+    Add (``sign=1``) or remove (``sign=-1``) one order and its lines, given as
+    ``(menu_item_id, quantity, unit_price)`` tuples, from the rollups.
+    """
+    day = timezone.localdate(order.order_date)
+    _bump(
+        DailySales,
+        {'restaurant_id': order.restaurant_id, 'day': day},
+        {'orders': sign, 'revenue': sign * order.total},
+    )
+    per_item = defaultdict(lambda: [0, Decimal('0')])
+    for menu_item_id, quantity, unit_price in lines:
+        per_item[menu_item_id][0] += quantity
+        per_item[menu_item_id][1] += quantity * unit_price
+    if per_item:
+        _bump_many(DailyItemSales, [
+            (
+                {'restaurant_id': order.restaurant_id, 'day': day, 'menu_item_id': menu_item_id},
+                {'quantity': sign * quantity, 'revenue': sign * revenue},
+            )
+            for menu_item_id, (quantity, revenue) in per_item.items()
+        ])
+
+
+def order_lines(order):
+    return list(order.items.values_list('menu_item_id', 'quantity', 'unit_price'))
+
+
+def status_changed(order, old_status, new_status):
+    """
+    Keep the rollups in step with a status transition: cancelling an order
+    removes it from the day's sales and reinstating it adds it back.
+    """
+    statuses_changed([(order, old_status, new_status)])
+
+
+def statuses_changed(changes):
+    """
+    ``status_changed`` for several ``(order, old_status, new_status)`` at
+    once: the lines of all the orders are read with one query and each
+    rollup table gets one read, one UPDATE and at most one INSERT.
+    """
+    moved = {}
+    for order, old_status, new_status in changes:
+        was_counted = old_status not in EXCLUDED_STATUSES
+        is_counted = new_status not in EXCLUDED_STATUSES
+        if was_counted != is_counted:
+            moved[order.pk] = (order, 1 if is_counted else -1)
+    if not moved:
+        return
+
+    days = defaultdict(lambda: [0, Decimal('0')])
+    items = defaultdict(lambda: [0, Decimal('0')])
+    for order, sign in moved.values():
+        totals = days[order.restaurant_id, timezone.localdate(order.order_date)]
+        totals[0] += sign
+        totals[1] += sign * order.total
+    lines = OrderItem.objects.filter(order_id__in=moved).values_list(
+        'order_id', 'menu_item_id', 'quantity', 'unit_price'
+    )
+    for order_id, menu_item_id, quantity, unit_price in lines:
+        order, sign = moved[order_id]
+        totals = items[order.restaurant_id, timezone.localdate(order.order_date), menu_item_id]
+        totals[0] += sign * quantity
+        totals[1] += sign * quantity * unit_price
+
+    _bump_many(DailySales, [
+        ({'restaurant_id': restaurant_id, 'day': day}, {'orders': count, 'revenue': revenue})
+        for (restaurant_id, day), (count, revenue) in days.items()
+    ])
+    if items:
+        _bump_many(DailyItemSales, [
+            (
+                {'restaurant_id': restaurant_id, 'day': day, 'menu_item_id': menu_item_id},
+                {'quantity': quantity, 'revenue': revenue},
+            )
+            for (restaurant_id, day, menu_item_id), (quantity, revenue) in items.items()
+        ])
+
+
+def order_deleted(order):
+    if order.status not in EXCLUDED_STATUSES:
+        apply_order(order, order_lines(order), sign=-1)
+
+
+def _day_rows(orders):
+    return (
+        orders.annotate(day=TruncDate('order_date')).order_by()
+        .values_list('restaurant_id', 'day')
+        .annotate(count=Count('id'), amount=Sum('total'))
+    )
+
+
+def _item_rows(items):
+    return (
+        items.annotate(day=TruncDate('order__order_date')).order_by()
+        .values_list('order__restaurant_id', 'day', 'menu_item_id')
+        .annotate(sold=Sum('quantity'), amount=Sum(ExpressionWrapper(
+            F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=14, decimal_places=2)
+        )))
+    )
+
+
+@transaction.atomic
+def rebuild(restaurant_ids=None, since=None):
+    """
+    Recompute the rollups from the live and archived orders tables, optionally
+    limited to some restaurants and to days on or after ``since``.
+    """
+    sources = [
+        (Order.objects.exclude(status__in=EXCLUDED_STATUSES),
+         OrderItem.objects.exclude(order__status__in=EXCLUDED_STATUSES)),
+        (ArchivedOrder.objects.exclude(status__in=EXCLUDED_STATUSES),
+         ArchivedOrderItem.objects.exclude(order__status__in=EXCLUDED_STATUSES)),
+    ]
+    daily = DailySales.objects.all()
+    daily_items = DailyItemSales.objects.all()
+    if restaurant_ids is not None:
+        sources = [
+            (orders.filter(restaurant_id__in=restaurant_ids),
+             items.filter(order__restaurant_id__in=restaurant_ids))
+            for orders, items in sources
+        ]
+        daily = daily.filter(restaurant_id__in=restaurant_ids)
+        daily_items = daily_items.filter(restaurant_id__in=restaurant_ids)
+    if since is not None:
+        sources = [
+            (orders.filter(order_date__date__gte=since), items.filter(order__order_date__date__gte=since))
+            for orders, items in sources
+        ]
+        daily = daily.filter(day__gte=since)
+        daily_items = daily_items.filter(day__gte=since)
+
+    daily.delete()
+    daily_items.delete()
+
+    # A day can have orders in both tables, so add the two up
+    day_totals = defaultdict(lambda: [0, Decimal('0')])
+    item_totals = defaultdict(lambda: [0, Decimal('0')])
+    for orders, items in sources:
+        for restaurant_id, day, count, amount in _day_rows(orders).iterator():
+            totals = day_totals[restaurant_id, day]
+            totals[0] += count
+            totals[1] += amount
+        for restaurant_id, day, menu_item_id, sold, amount in _item_rows(items).iterator():
+            totals = item_totals[restaurant_id, day, menu_item_id]
+            totals[0] += sold
+            totals[1] += amount
+
+    created = DailySales.objects.bulk_create([
+        DailySales(restaurant_id=restaurant_id, day=day, orders=count, revenue=amount)
+        for (restaurant_id, day), (count, amount) in day_totals.items()
+    ], batch_size=1000)
+    DailyItemSales.objects.bulk_create([
+        DailyItemSales(
+            restaurant_id=restaurant_id, day=day, menu_item_id=menu_item_id,
+            quantity=sold, revenue=amount
+        )
+        for (restaurant_id, day, menu_item_id), (sold, amount) in item_totals.items()
+    ], batch_size=1000)
+    return len(created)
@@ -0,0 +1,167 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+# How long a user's reads stay on the primary after they write, so they read
+# their own writes while the replicas catch up
+REPLICA_PIN_SECONDS = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_scope = ContextVar('orders_read_scope', default=None)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def pin_key(user_id):
+    return f'orders:primary-pin:{user_id}'
+
+
+class ReadScope:
+    """
+    Where the reads of one request go: the replica picked for it, until the
+    request writes or turns out to come from a user who wrote recently.
+    """
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+class ReplicaRouter:
+    """
+    Keep every write on the primary (``default``) and send the reads of
+    read-only requests to one of ``DATABASE_REPLICAS``.
+
+    Reads stay on the primary outside requests (commands, workers), inside
+    transactions, for the rest of a request once it has written, and for
+    ``REPLICA_PIN_SECONDS`` after a user's last write. ``ReadScopeMiddleware``
+    sets up the per-request state.
+    """
+
+    def db_for_read(self, model, **hints):
+        scope = _scope.get()
+        if scope is None or scope.replica is None:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return scope.replica
+
+    def db_for_write(self, model, **hints):
+        scope = _scope.get()
+        if scope is not None:
+            scope.replica = None
+            scope.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the primary's rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+
+def read_own_writes(user_id):
+    """
+    Send the rest of the request's reads to the primary if ``user_id`` wrote
+    within ``REPLICA_PIN_SECONDS``. Called by CachedJWTAuthentication.
+    """
+    scope = _scope.get()
+    if scope is not None and scope.replica is not None and cache.get(pin_key(user_id)):
+        scope.replica = None
+
+
+async def aread_own_writes(user_id):
+    scope = _scope.get()
+    if scope is not None and scope.replica is not None and await cache.aget(pin_key(user_id)):
+        scope.replica = None
+
+
+@contextmanager
+def primary_reads():
+    """
+    Read from the primary within the block. For reads that refill a cache:
+    invalidating an entry only helps if the refill cannot come from a
+    replica that has not seen the change yet.
+    """
+    scope = _scope.get()
+    if scope is None or scope.replica is None:
+        yield
+        return
+    replica, scope.replica = scope.replica, None
+    try:
+        yield
+    finally:
+        # Unless the block wrote
+        if not scope.wrote:
+            scope.replica = replica
+
+
+class ReadScopeMiddleware:
+    """
+    Lets read-only requests use a replica (see ``ReplicaRouter``) and
+    remembers users whose requests wrote, so their next requests read from
+    the primary. Streamed responses read after the middleware returns, from
+    the primary.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        scope = self.new_scope(request)
+        token = _scope.set(scope)
+        try:
+            response = self.get_response(request)
+        finally:
+            _scope.reset(token)
+        user_id = self.writer(request, scope)
+        if user_id is not None:
+            cache.set(pin_key(user_id), True, REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        scope = self.new_scope(request)
+        token = _scope.set(scope)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _scope.reset(token)
+        user_id = self.writer(request, scope)
+        if user_id is not None:
+            await cache.aset(pin_key(user_id), True, REPLICA_PIN_SECONDS)
+        return response
+
+    def new_scope(self, request):
+        replicas = replica_aliases()
+        if request.method not in SAFE_METHODS or not replicas:
+            return ReadScope(None)
+        return ReadScope(random.choice(replicas))
+
+    def writer(self, request, scope):
+        # DRF sets the user it authenticated on the underlying request too.
+        # Django's lazy session user is only looked at if something loaded
+        # it already: loading it would take a query, which the event loop
+        # does not allow.
+        user = getattr(request, 'user', None)
+        if not scope.wrote or user is None or (type(user) is SimpleLazyObject and user._wrapped is empty):
+            return None
+        return user.pk if user.is_authenticated else None
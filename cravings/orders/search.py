@@ -0,0 +1,140 @@
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import connections, transaction
+from django.db.models import Case, Count, IntegerField, Q, Sum, When
+
+from .models import MenuItem, MenuSearchTerm
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+PREFIX_UPPER_BOUND = '\U0010ffff'
+SEARCH_CANDIDATES = 500
+
+# How much a word counts towards the rank, by where it appears
+FIELD_WEIGHTS = (
+    ('name', 3),
+    ('restaurant__name', 2),
+    ('description', 1),
+)
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text.lower())]
+
+
+def build_terms(menu_item, restaurant_name):
+    """
+    Index rows for one menu item. A word that appears in several fields gets
+    the sum of their weights.
+    """
+    weights = {}
+    sources = {
+        'name': menu_item.name,
+        'restaurant__name': restaurant_name,
+        'description': menu_item.description,
+    }
+    for field, weight in FIELD_WEIGHTS:
+        for token in set(tokenize(sources[field] or '')):
+            weights[token] = weights.get(token, 0) + weight
+    return [
+        MenuSearchTerm(
+            term=term,
+            menu_item_id=menu_item.pk,
+            weight=weight,
+            restaurant_id=menu_item.restaurant_id,
+            category=menu_item.category,
+            is_available=menu_item.is_available,
+        )
+        for term, weight in weights.items()
+    ]
+
+
+@transaction.atomic
+def index_menu_items(menu_items, batch_size=1000):
+    """
+    (Re)build the index rows for ``menu_items``, a queryset or list of menu
+    items with their restaurant loaded.
+    """
+    menu_items = list(menu_items)
+    MenuSearchTerm.objects.filter(menu_item__in=[item.pk for item in menu_items]).delete()
+    MenuSearchTerm.objects.bulk_create(
+        [term for item in menu_items for term in build_terms(item, item.restaurant.name)],
+        batch_size=batch_size,
+    )
+
+
+def rebuild_index(chunk_size=2000):
+    MenuSearchTerm.objects.all().delete()
+    queryset = MenuItem.objects.with_related().order_by('pk')
+    last_pk = 0
+    indexed = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return indexed
+        MenuSearchTerm.objects.bulk_create(
+            [term for item in chunk for term in build_terms(item, item.restaurant.name)],
+            batch_size=chunk_size,
+        )
+        indexed += len(chunk)
+        last_pk = chunk[-1].pk
+
+
+def search_menu_items(query, category=None, is_available=None, restaurant_id=None, limit=20):
+    """
+    Rank menu items matching every word of ``query``; the last word is
+    matched as a prefix so results follow the user as they type.
+
+    Candidates come from the best postings of one word, the one matching
+    the fewest items, capped at ``SEARCH_CANDIDATES`` so that very common
+    words cost no more than rare ones. The ranking is exact whenever that
+    word matches fewer items than the cap; past it, the items where the word
+    weighs most, such as name matches, are kept.
+
+    Returns ``(menu_item_id, score)`` pairs, best first.
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not tokens:
+        return []
+
+    # A range rather than LIKE 'x%' so the prefix match can use the term index
+    prefix = Q(term__gte=tokens[-1], term__lt=tokens[-1] + PREFIX_UPPER_BOUND)
+    lookups = [Q(term=token) for token in tokens[:-1]] + [prefix]
+
+    terms = MenuSearchTerm.objects.all()
+    if category:
+        terms = terms.filter(category=category)
+    if is_available is not None:
+        terms = terms.filter(is_available=is_available)
+    if restaurant_id is not None:
+        terms = terms.filter(restaurant_id=restaurant_id)
+
+    driver = lookups[0]
+    if len(lookups) > 1:
+        # Only items in the rarest word's postings can match every word;
+        # counting stops at the cap, so common words cost no more to count
+        driver = min(lookups, key=lambda lookup: terms.filter(lookup)[:SEARCH_CANDIDATES + 1].count())
+    driver = terms.filter(driver).order_by('-weight', '-menu_item_id')
+    # Left to the database as a subquery where it is allowed (not on MySQL):
+    # binding hundreds of ids costs more than running the lookup
+    candidates = driver.values('menu_item_id')[:SEARCH_CANDIDATES]
+    if not connections[terms.db].features.allow_sliced_subqueries_with_in:
+        candidates = [row['menu_item_id'] for row in candidates]
+    terms = terms.filter(menu_item_id__in=candidates)
+
+    matched_token = Case(
+        *[When(lookup, then=position) for position, lookup in enumerate(lookups)],
+        output_field=IntegerField(),
+    )
+    results = (
+        terms.filter(reduce(or_, lookups))
+        .values('menu_item_id')
+        .annotate(matched=Count(matched_token, distinct=True), score=Sum('weight'))
+        .filter(matched=len(lookups))
+        .order_by('-score', 'menu_item_id')
+        .values_list('menu_item_id', 'score')[:limit]
+    )
+    return list(results)
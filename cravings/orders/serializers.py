@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User, Group
-from .models import Restaurant, MenuItem, Cart, CartItem, Order, OrderItem
+from .models import (
+    Restaurant, MenuItem, Cart, CartItem, Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+)
+from .images import current_variants
+from .roles import DELIVERY_CREW
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,7 +20,9 @@ class RestaurantSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Restaurant
-        fields = ['id', 'name', 'description', 'opening_time', 'closing_time', 'owner', 'owner_name']
+        fields = [
+            'id', 'name', 'description', 'opening_time', 'closing_time', 'auto_dispatch', 'owner', 'owner_name',
+        ]
         read_only_fields = ['owner']
     
     def create(self, validated_data):
@@ -26,16 +32,42 @@ class RestaurantSerializer(serializers.ModelSerializer):
 class MenuItemSerializer(serializers.ModelSerializer):
     restaurant_name = serializers.ReadOnlyField(source='restaurant.name')
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = MenuItem
         fields = ['id', 'restaurant', 'restaurant_name', 'name', 'description', 
-                 'price', 'image', 'image_url', 'is_available', 'category']
+                 'price', 'image', 'image_url', 'image_variants', 'is_available', 'category']
         read_only_fields = ['restaurant']
     def get_image_url(self, obj):
         if obj.image:
             return self.context['request'].build_absolute_uri(obj.image.url)
         return None
+    
+    def get_image_variants(self, obj):
+        # Variants still being generated are left out; clients fall back to image_url
+        request = self.context['request']
+        storage = obj.image.storage
+        return {
+            name: request.build_absolute_uri(storage.url(entry['path']))
+            for name, entry in current_variants(obj.image.name, obj.image_variants).items()
+        }
+
+class MenuImportRowSerializer(serializers.Serializer):
+    # Fields left out of a row are not changed; new items need a name and price
+    id = serializers.IntegerField(required=False)
+    name = serializers.CharField(max_length=255, required=False)
+    description = serializers.CharField(allow_blank=True, required=False)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    is_available = serializers.BooleanField(required=False)
+    category = serializers.ChoiceField(choices=MenuItem.CATEGORY_CHOICES, required=False)
+    
+    def validate(self, data):
+        if 'id' not in data:
+            missing = {field: 'This field is required.' for field in ('name', 'price') if field not in data}
+            if missing:
+                raise serializers.ValidationError(missing)
+        return data
 
 class CartItemSerializer(serializers.ModelSerializer):
     menu_item_name = serializers.ReadOnlyField(source='menu_item.name')
@@ -56,7 +88,27 @@ class CartSerializer(serializers.ModelSerializer):
         read_only_fields = ['customer']
     
     def get_total(self, obj):
-        return sum(item.subtotal for item in obj.items.all())
+        total = getattr(obj, 'total_amount', None)
+        if total is None:
+            total = obj.items.total_amount()
+        return total
+
+class CartOperationSerializer(serializers.Serializer):
+    OPERATIONS = ['add', 'set', 'remove']
+    
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    menu_item = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, required=False)
+    
+    def validate(self, data):
+        if data['op'] == 'add':
+            data.setdefault('quantity', 1)
+        elif data['op'] == 'set' and 'quantity' not in data:
+            raise serializers.ValidationError({'quantity': 'This field is required.'})
+        return data
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=200)
 
 class OrderItemSerializer(serializers.ModelSerializer):
     menu_item_name = serializers.ReadOnlyField(source='menu_item.name')
@@ -80,4 +132,21 @@ class OrderSerializer(serializers.ModelSerializer):
             'delivery_crew_name', 'status', 'total',
             'delivery_address', 'items', 'order_date'
         ]
-        read_only_fields = ['customer', 'restaurant', 'total', 'status', 'order_date'] 
\ No newline at end of file
+        read_only_fields = ['customer', 'restaurant', 'total', 'status', 'order_date'] 
+
+class OrderTransitionSerializer(serializers.Serializer):
+    orders = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=200)
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+    delivery_crew = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.filter(groups__name=DELIVERY_CREW), required=False
+    )
+
+class ArchivedOrderItemSerializer(OrderItemSerializer):
+    class Meta(OrderItemSerializer.Meta):
+        model = ArchivedOrderItem
+
+class ArchivedOrderSerializer(OrderSerializer):
+    items = ArchivedOrderItemSerializer(many=True, read_only=True)
+    
+    class Meta(OrderSerializer.Meta):
+        model = ArchivedOrder
@@ -0,0 +1,96 @@
+from django.contrib.auth.models import User, Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, pre_delete, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .authentication import invalidate_users
+from .images import needs_variants, schedule_variants
+from .menu_cache import bump_menu_version
+from .models import Restaurant, MenuItem
+from .roles import invalidate_roles
+from .search import index_menu_items
+
+
+def _invalidate_roles(user_ids):
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    # Drop the cached roles right away for this connection and again once the
+    # change is visible to everyone else, so a concurrent read cannot re-cache
+    # the old membership.
+    invalidate_roles(*user_ids)
+    transaction.on_commit(lambda: invalidate_roles(*user_ids))
+    _invalidate_users(User(pk=user_id) for user_id in user_ids)
+
+
+def _invalidate_users(users):
+    # Same two-step invalidation for the users cached by CachedJWTAuthentication
+    users = list(users)
+    invalidate_users(*users)
+    transaction.on_commit(lambda: invalidate_users(*users))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    _invalidate_users([instance])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            instance.__dict__.pop('_cached_roles', None)
+            _invalidate_roles([instance.pk])
+    elif action == 'pre_clear':
+        instance._cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        _invalidate_roles(instance.__dict__.pop('_cleared_user_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        _invalidate_roles(pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    if instance.pk:
+        _invalidate_roles(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def menu_item_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_menu_version(instance.restaurant_id))
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def restaurant_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_menu_version(instance.pk))
+
+
+@receiver(post_save, sender=MenuItem)
+def index_menu_item(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_menu_items([instance])
+
+
+@receiver(pre_save, sender=Restaurant)
+def remember_restaurant_name(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_name = (
+            Restaurant.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Restaurant)
+def reindex_restaurant_menu(sender, instance, created, raw=False, **kwargs):
+    # The restaurant name is part of every menu item's index entry
+    if not created and not raw and instance.__dict__.pop('_previous_name', None) != instance.name:
+        index_menu_items(instance.menu_items.with_related())
+
+
+@receiver(post_save, sender=MenuItem)
+def refresh_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw and needs_variants(instance):
+        schedule_variants(instance.pk)
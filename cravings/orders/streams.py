@@ -0,0 +1,109 @@
+import json
+import secrets
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError, AuthenticationFailed
+
+from .authentication import CachedJWTAuthentication
+from .events import get_broker
+
+ORDER_STREAM_HEARTBEAT = getattr(settings, 'ORDER_STREAM_HEARTBEAT', 15)
+ORDER_STREAM_TICKET_TTL = getattr(settings, 'ORDER_STREAM_TICKET_TTL', 30)
+
+# Signs stream tickets only, so no other signed value passes for one
+STREAM_TICKET_SALT = 'orders.streams.order_stream'
+
+
+def stream_ticket_key(nonce):
+    return f'orders:stream-ticket:{nonce}'
+
+
+def issue_stream_ticket(user):
+    """
+    Signed ticket that opens one order stream of ``user`` within
+    ORDER_STREAM_TICKET_TTL seconds.
+    """
+    return signing.dumps({'user': user.pk, 'nonce': secrets.token_urlsafe(16)}, salt=STREAM_TICKET_SALT)
+
+
+async def aredeem_stream_ticket(ticket):
+    """
+    Return the active user ``ticket`` was issued to, or ``None`` when it is
+    forged, expired or was redeemed before.
+    """
+    try:
+        payload = signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=ORDER_STREAM_TICKET_TTL)
+    except signing.BadSignature:
+        return None
+    # Only the first redemption adds the key; it outlives the ticket
+    if not await cache.aadd(stream_ticket_key(payload['nonce']), True, ORDER_STREAM_TICKET_TTL):
+        return None
+    return await User.objects.filter(pk=payload['user'], is_active=True).afirst()
+
+
+async def authenticate_stream(request):
+    """
+    Resolve the user from a Bearer header or, because browsers' EventSource
+    cannot send headers, from a stream ticket in the ``ticket`` query
+    parameter. Access tokens are never accepted in the URL, where proxies
+    and browser history would keep them.
+    """
+    authentication = CachedJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        ticket = request.GET.get('ticket')
+        return await aredeem_stream_ticket(ticket) if ticket else None
+    try:
+        validated_token = authentication.get_validated_token(raw_token)
+        return await authentication.aget_user(validated_token)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def order_event_stream(user_id):
+    subscription = get_broker().subscribe(user_id)
+    try:
+        yield f"retry: {ORDER_STREAM_HEARTBEAT * 1000}\n\n"
+        while True:
+            event = await subscription.get(timeout=ORDER_STREAM_HEARTBEAT)
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield format_event(event)
+    finally:
+        subscription.close()
+
+
+async def order_stream(request):
+    """
+    Server-sent events stream of status changes for the orders the user is
+    involved in as customer, restaurant owner or delivery crew member. Serve
+    it through ``cravings.asgi``; each idle connection is a suspended
+    coroutine rather than a worker thread. Under WSGI the endless stream
+    would be buffered in a worker, so it is refused there.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'detail': 'The order stream is only served by the ASGI application.'}, status=501
+        )
+    user = await authenticate_stream(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'}, status=401
+        )
+    response = StreamingHttpResponse(
+        order_event_stream(user.pk), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,3 +1,2143 @@
-from django.test import TestCase
+import asyncio
+import csv
+import importlib
+import json
+import shutil
+import tempfile
+from datetime import time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User, Group
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import F
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import BaseSerializer
+from rest_framework.test import APIRequestFactory, APITestCase, APITransactionTestCase, force_authenticate
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from PIL import Image
+
+from . import images, rollups, streams, views
+from .authentication import user_cache_key
+from .archive import archive_batch, archivable_orders
+from .renderers import FastJSONRenderer
+from .serializers import (
+    RestaurantSerializer, MenuItemSerializer, OrderSerializer, ArchivedOrderSerializer
+)
+from .models import (
+    Restaurant, MenuItem, Cart, CartItem, Order, OrderItem, DeliveryLoad, DailySales, DailyItemSales,
+    MenuSearchTerm, ArchivedOrder, ArchivedOrderItem
+)
+from .events import BaseBroker, InProcessBroker, get_broker
+from .instrumentation import RouteStats, registry
+from .order_export import order_chunks
+from .projections import OrderProjection
+from .search import SEARCH_CANDIDATES, index_menu_items, rebuild_index, search_menu_items
+from .roles import get_roles, CUSTOMER, DELIVERY_CREW, RESTAURANT_OWNER
+from .routers import pin_key
+from .workload import crew_with_load, rebuild_load, reserve_load
+from .dispatch import dispatch_restaurant, dispatch_waiting
+from .transitions import TransitionConflict, _transition, transition
+
+
+class CravingsTestCase(APITestCase):
+    """
+    Shared fixture: one owner with a restaurant and a few menu items, a customer
+    with a filled cart and several multi-item orders, and a delivery crew member.
+    """
+    ORDER_COUNT = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        owners = Group.objects.create(name='Restaurant Owner')
+        customers = Group.objects.create(name='Customer')
+        crew = Group.objects.create(name='Delivery Crew')
+
+        cls.owner = User.objects.create_user('owner', password='pass')
+        cls.owner.groups.add(owners)
+        cls.customer = User.objects.create_user('customer', password='pass')
+        cls.customer.groups.add(customers)
+        cls.crew = User.objects.create_user('crew', password='pass')
+        cls.crew.groups.add(crew)
+        cls.staff = User.objects.create_user('staff', password='pass', is_staff=True)
+
+        cls.restaurant = Restaurant.objects.create(
+            name='Grill House',
+            opening_time=time(9),
+            closing_time=time(22),
+            owner=cls.owner,
+        )
+        cls.menu_items = [
+            MenuItem.objects.create(
+                restaurant=cls.restaurant,
+                name=f'Dish {i}',
+                price=Decimal('10.00') + i,
+                category=category,
+            )
+            for i, category in enumerate(['main', 'side', 'dessert', 'beverage'])
+        ]
+
+        cls.cart = Cart.objects.create(customer=cls.customer)
+        for menu_item in cls.menu_items[:3]:
+            CartItem.objects.create(cart=cls.cart, menu_item=menu_item, quantity=2)
+
+        cls.orders = []
+        for i in range(cls.ORDER_COUNT):
+            order = Order.objects.create(
+                customer=cls.customer,
+                restaurant=cls.restaurant,
+                delivery_crew=cls.crew,
+                status='out_for_delivery',
+                total=Decimal('0.00'),
+                delivery_address=f'{i} Main Street',
+            )
+            for menu_item in cls.menu_items:
+                OrderItem.objects.create(
+                    order=order, menu_item=menu_item, quantity=1, unit_price=menu_item.price
+                )
+            cls.orders.append(order)
+        rebuild_load()
+
+    def setUp(self):
+        cache.clear()
+
+
+class QueryBudgetTests(CravingsTestCase):
+    """
+    Every endpoint in ``orders/urls.py`` has a fixed SQL query budget that must
+    not grow with the number of rows returned.
+    """
+
+    def assertMaxQueries(self, budget, user, method, url, data=None):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+            # Streamed responses run their queries while the body is read
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+        self.assertLess(response.status_code, 400, content)
+        self.assertLessEqual(
+            len(queries), budget,
+            '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+        return response
+
+    def test_restaurant_list(self):
+        for i in range(5):
+            Restaurant.objects.create(
+                name=f'Extra {i}', opening_time=time(9), closing_time=time(22), owner=self.owner
+            )
+        self.assertMaxQueries(2, self.customer, 'get', reverse('restaurant-list'))
+        self.assertMaxQueries(2, self.owner, 'get', reverse('restaurant-list'))
+
+    def test_restaurant_detail(self):
+        url = reverse('restaurant-detail', args=[self.restaurant.pk])
+        self.assertMaxQueries(2, self.owner, 'get', url)
+
+    def test_menu_item_list(self):
+        url = reverse('menuitem-list', args=[self.restaurant.pk])
+        response = self.assertMaxQueries(2, self.customer, 'get', url)
+        self.assertEqual(len(response.data), len(self.menu_items))
+        self.assertMaxQueries(2, self.owner, 'get', url)
+
+    def test_menu_item_detail(self):
+        url = reverse('menuitem-detail', args=[self.restaurant.pk, self.menu_items[0].pk])
+        self.assertMaxQueries(2, self.owner, 'get', url)
+
+    def test_cart(self):
+        response = self.assertMaxQueries(3, self.customer, 'get', reverse('cart'))
+        self.assertEqual(len(response.data['items']), 3)
+
+    def test_cart_item_list(self):
+        response = self.assertMaxQueries(2, self.customer, 'get', reverse('cartitem-list'))
+        self.assertEqual(len(response.data), 3)
+
+    def test_add_to_cart(self):
+        data = {'menu_item': self.menu_items[0].pk, 'quantity': 1}
+        self.assertMaxQueries(4, self.customer, 'post', reverse('cartitem-list'), data)
+
+    def test_cart_batch(self):
+        operations = [{'op': 'add', 'menu_item': item.pk, 'quantity': 1} for item in self.menu_items]
+        self.assertMaxQueries(
+            10, self.customer, 'post', reverse('cart-batch'), {'operations': operations}
+        )
+
+    def test_cart_item_detail(self):
+        cart_item = self.cart.items.first()
+        url = reverse('cartitem-detail', args=[cart_item.pk])
+        self.assertMaxQueries(2, self.customer, 'get', url)
+
+    def test_change_cart_item(self):
+        cart_item = self.cart.items.first()
+        url = reverse('cartitem-detail', args=[cart_item.pk])
+        self.assertMaxQueries(3, self.customer, 'patch', url, {'quantity': 1})
+
+    def test_order_list(self):
+        for user, budget in [(self.customer, 3), (self.owner, 3), (self.crew, 3), (self.staff, 2)]:
+            with self.subTest(user=user.username):
+                response = self.assertMaxQueries(budget, user, 'get', reverse('order-list'))
+                self.assertEqual(len(response.data), self.ORDER_COUNT)
+                self.assertEqual(len(response.data[0]['items']), len(self.menu_items))
+
+    def test_order_detail(self):
+        url = reverse('order-detail', args=[self.orders[0].pk])
+        self.assertMaxQueries(3, self.customer, 'get', url)
+
+    def test_order_history(self):
+        Order.objects.update(status='delivered')
+        archive_batch(archivable_orders(timezone.now() + timedelta(seconds=1)), 100)
+        for user, budget in [(self.customer, 3), (self.owner, 3), (self.crew, 3), (self.staff, 2)]:
+            with self.subTest(user=user.username):
+                response = self.assertMaxQueries(budget, user, 'get', reverse('order-history'))
+                self.assertEqual(len(response.data), self.ORDER_COUNT)
+        url = reverse('order-history-detail', args=[self.orders[0].pk])
+        self.assertMaxQueries(3, self.customer, 'get', url)
+
+    def test_assign_delivery(self):
+        url = reverse('assign-delivery', args=[self.orders[0].pk])
+        self.assertMaxQueries(7, self.owner, 'patch', url, {'delivery_crew': self.crew.pk})
+
+    def test_mark_delivered(self):
+        url = reverse('mark-delivered', args=[self.orders[0].pk])
+        self.assertMaxQueries(7, self.crew, 'patch', url)
+
+    def test_user_role(self):
+        self.assertMaxQueries(1, self.customer, 'get', reverse('user-role'))
+
+    def test_profile(self):
+        # The cached user lacks the profile fields
+        self.assertMaxQueries(1, self.customer, 'get', reverse('user-profile'))
+
+    def test_delivery_crew_list(self):
+        self.assertMaxQueries(2, self.owner, 'get', reverse('delivery-crew-list'))
+
+    def test_restaurant_analytics(self):
+        rollups.rebuild()
+        url = reverse('restaurant-analytics', args=[self.restaurant.pk])
+        self.assertMaxQueries(3, self.owner, 'get', url)
+
+    def test_menu_import(self):
+        url = reverse('menuitem-import', args=[self.restaurant.pk])
+        rows = [{'id': item.pk, 'is_available': False} for item in self.menu_items]
+        self.assertMaxQueries(7, self.owner, 'post', url, rows)
+
+    def test_menu_export(self):
+        for file_format in ('csv', 'json'):
+            with self.subTest(file_format=file_format):
+                url = reverse('menuitem-export', args=[self.restaurant.pk, file_format])
+                self.assertMaxQueries(3, self.owner, 'get', url)
+
+    def test_order_export(self):
+        for file_format in ('csv', 'ndjson'):
+            with self.subTest(file_format=file_format):
+                url = reverse('order-export', args=[file_format]) + f'?restaurant={self.restaurant.pk}'
+                self.assertMaxQueries(4, self.owner, 'get', url)
+
+    def test_order_history_export(self):
+        Order.objects.update(status='delivered')
+        archive_batch(archivable_orders(timezone.now() + timedelta(seconds=1)), 100)
+        url = reverse('order-history-export', args=['csv']) + f'?restaurant={self.restaurant.pk}'
+        self.assertMaxQueries(4, self.owner, 'get', url)
+
+    def test_order_transition(self):
+        rollups.rebuild()
+        orders = [order.pk for order in self.orders]
+        self.assertMaxQueries(16, self.owner, 'post', reverse('order-transition'), {
+            'orders': orders, 'status': 'cancelled',
+        })
+
+    def test_request_metrics(self):
+        self.client.force_authenticate(self.customer)
+        self.client.get(reverse('order-list'))
+        self.assertMaxQueries(0, self.staff, 'get', reverse('request-metrics'))
+
+
+class KeysetPaginationTests(CravingsTestCase):
+
+    def get_links(self, response):
+        links = {}
+        for part in filter(None, response.headers.get('Link', '').split(', ')):
+            url, rel = part.split('; ')
+            links[rel[5:-1]] = url[1:-1]
+        return links
+
+    def walk(self, url, rel='next'):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data])
+            url = self.get_links(response).get(rel)
+        return pages
+
+    def test_order_pages_follow_date_then_id(self):
+        self.client.force_authenticate(self.staff)
+        pages = self.walk(reverse('order-list') + '?page_size=2')
+        expected = list(Order.objects.order_by('-order_date', '-id').values_list('id', flat=True))
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_previous_link_returns_to_earlier_page(self):
+        self.client.force_authenticate(self.staff)
+        first = self.client.get(reverse('order-list') + '?page_size=2')
+        second = self.client.get(self.get_links(first)['next'])
+        back = self.client.get(self.get_links(second)['prev'])
+        self.assertEqual(
+            [row['id'] for row in back.data], [row['id'] for row in first.data]
+        )
+        self.assertNotIn('prev', self.get_links(back))
+
+    def test_new_orders_do_not_shift_later_pages(self):
+        self.client.force_authenticate(self.staff)
+        first = self.client.get(reverse('order-list') + '?page_size=2')
+        Order.objects.create(
+            customer=self.customer, restaurant=self.restaurant,
+            total=Decimal('1.00'), delivery_address='New Street',
+        )
+        rest = self.walk(self.get_links(first)['next'])
+        seen = [row['id'] for row in first.data] + sum(rest, [])
+        self.assertEqual(sorted(seen), sorted(order.id for order in self.orders))
+
+    def test_menu_pages_follow_category_then_id(self):
+        self.client.force_authenticate(self.customer)
+        pages = self.walk(reverse('menuitem-list', args=[self.restaurant.pk]) + '?page_size=3')
+        expected = list(
+            MenuItem.objects.order_by('category', 'id').values_list('id', flat=True)
+        )
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_invalid_cursor(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(reverse('order-list') + '?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+
+class RoleResolverTests(CravingsTestCase):
+
+    def fresh(self, user):
+        return User.objects.get(pk=user.pk)
+
+    def test_roles_are_loaded_once_and_cached_across_requests(self):
+        user = self.fresh(self.customer)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_roles(user), {CUSTOMER})
+        user = self.fresh(self.customer)
+        with self.assertNumQueries(0):
+            get_roles(user)
+            get_roles(user)
+
+    def test_group_changes_invalidate_cached_roles(self):
+        get_roles(self.fresh(self.customer))
+        crew = Group.objects.get(name=DELIVERY_CREW)
+        self.customer.groups.add(crew)
+        self.assertEqual(get_roles(self.fresh(self.customer)), {CUSTOMER, DELIVERY_CREW})
+        crew.user_set.remove(self.customer)
+        self.assertEqual(get_roles(self.fresh(self.customer)), {CUSTOMER})
+        self.customer.groups.clear()
+        self.assertEqual(get_roles(self.fresh(self.customer)), frozenset())
+
+    def test_group_rename_invalidates_members(self):
+        get_roles(self.fresh(self.crew))
+        group = Group.objects.get(name=DELIVERY_CREW)
+        group.name = 'Couriers'
+        group.save()
+        self.assertEqual(get_roles(self.fresh(self.crew)), {'Couriers'})
+
+    def test_order_list_resolves_roles_without_group_queries_once_cached(self):
+        self.client.force_authenticate(self.fresh(self.owner))
+        self.client.get(reverse('order-list'))
+        self.client.force_authenticate(self.fresh(self.owner))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('order-list'))
+        self.assertFalse(any('auth_group' in query['sql'] for query in queries.captured_queries))
+
+
+class CheckoutTests(CravingsTestCase):
+
+    def checkout(self):
+        self.client.force_authenticate(self.customer)
+        return self.client.post(reverse('order-list'), {
+            'delivery_address': '1 Main Street',
+            'order_date': '2025-04-06T12:00:00Z',
+        }, format='json')
+
+    def test_checkout_moves_cart_into_order(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.checkout()
+        self.assertEqual(response.status_code, 201, response.content)
+        # Includes the savepoints around the first sales rollup rows of the day
+        self.assertLessEqual(len(queries), 17)
+
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.total, sum(item.price * 2 for item in self.menu_items[:3]))
+        self.assertEqual(order.restaurant, self.restaurant)
+        self.assertEqual(order.status, 'preparing')
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(len(response.data['items']), 3)
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+
+    def test_second_checkout_of_same_cart_is_rejected(self):
+        self.assertEqual(self.checkout().status_code, 201)
+        self.assertEqual(self.checkout().status_code, 400)
+        self.assertEqual(Order.objects.filter(customer=self.customer).count(), self.ORDER_COUNT + 1)
+
+    def test_checkout_without_cart(self):
+        self.cart.delete()
+        self.assertEqual(self.checkout().status_code, 400)
+
+    def test_cart_changes_made_during_checkout_are_kept(self):
+        line = self.cart.items.order_by('id').first()
+
+        def concurrent_add(order, items):
+            # A quantity change that commits after the lines were priced,
+            # as add_to_cart's fast path does without the cart lock
+            CartItem.objects.filter(pk=line.pk).update(quantity=F('quantity') + 1)
+
+        with patch('orders.checkout.rollups.apply_order', side_effect=concurrent_add):
+            response = self.checkout()
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Order.objects.get(pk=response.data['id']).items.get(menu_item=line.menu_item).quantity, 2)
+        self.assertEqual(list(self.cart.items.values_list('pk', 'quantity')), [(line.pk, 3)])
+
+    def test_checkout_locks_the_cart_lines(self):
+        lines = CartItem.objects
+        with patch.object(lines, 'select_for_update', wraps=lines.select_for_update) as lock:
+            self.assertEqual(self.checkout().status_code, 201)
+        lock.assert_called_once_with(of=('self',))
+
+
+class MenuCacheTests(CravingsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('menuitem-list', args=[self.restaurant.pk])
+        self.client.force_authenticate(self.customer)
+
+    def test_unchanged_menu_is_answered_with_304_without_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_cached_menu_is_served_without_queries(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.data, first.data)
+
+    def test_menu_item_save_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.filter(pk=self.menu_items[0].pk).get().save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_restaurant_rename_refreshes_cached_menu(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant.name = 'Renamed'
+            self.restaurant.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data[0]['restaurant_name'], 'Renamed')
+
+    def test_owners_and_customers_get_different_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.filter(pk=self.menu_items[0].pk).update(is_available=False)
+            self.menu_items[0].refresh_from_db()
+            self.menu_items[0].save()
+        customer = self.client.get(self.url)
+        self.client.force_authenticate(self.owner)
+        owner = self.client.get(self.url)
+        self.assertNotEqual(customer['ETag'], owner['ETag'])
+        self.assertEqual(len(owner.data), len(customer.data) + 1)
+
+
+class DeliveryWorkloadTests(CravingsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        crew_group = Group.objects.get(name=DELIVERY_CREW)
+        cls.idle_crew = []
+        for i in range(5):
+            crew = User.objects.create_user(f'idle-crew-{i}')
+            crew.groups.add(crew_group)
+            cls.idle_crew.append(crew)
+
+    def get_crew(self, query=''):
+        self.client.force_authenticate(self.owner)
+        return self.client.get(reverse('delivery-crew-list') + query)
+
+    def test_crew_list_is_one_query(self):
+        self.client.force_authenticate(self.owner)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('delivery-crew-list'))
+        loads = {row['username']: row['assigned_orders'] for row in response.data}
+        self.assertEqual(loads['crew'], self.ORDER_COUNT)
+        self.assertEqual(loads['idle-crew-0'], 0)
+
+    def test_filter_and_sort_by_load(self):
+        response = self.get_crew('?max_load=0&ordering=-username')
+        self.assertEqual(
+            [row['username'] for row in response.data],
+            sorted((crew.username for crew in self.idle_crew), reverse=True)
+        )
+        response = self.get_crew('?ordering=-assigned_orders')
+        self.assertEqual(response.data[0]['username'], 'crew')
+        self.assertEqual(self.get_crew('?ordering=password').status_code, 400)
+        self.assertEqual(self.get_crew('?min_load=many').status_code, 400)
+
+    def test_counters_follow_assign_and_deliver(self):
+        order = self.orders[0]
+        self.client.force_authenticate(self.owner)
+        self.client.patch(
+            reverse('assign-delivery', args=[order.pk]),
+            {'delivery_crew': self.idle_crew[0].pk}, format='json'
+        )
+        self.assertEqual(self.crew.delivery_load.active_orders, self.ORDER_COUNT - 1)
+        self.assertEqual(DeliveryLoad.objects.get(crew=self.idle_crew[0]).active_orders, 1)
+
+        self.client.force_authenticate(self.idle_crew[0])
+        self.client.patch(reverse('mark-delivered', args=[order.pk]))
+        self.assertEqual(DeliveryLoad.objects.get(crew=self.idle_crew[0]).active_orders, 0)
+
+    def test_deleting_an_active_order_releases_the_driver(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.delete(reverse('order-detail', args=[self.orders[0].pk]))
+        self.assertEqual(response.status_code, 204)
+        counter = DeliveryLoad.objects.get(crew=self.crew).active_orders
+        self.assertEqual(counter, self.ORDER_COUNT - 1)
+        self.assertEqual(rebuild_load()[self.crew.pk], counter)
+
+    def test_counter_source_matches_aggregate(self):
+        self.assertEqual(
+            list(crew_with_load(use_counters=True).order_by('id').values('id', 'assigned_orders')),
+            list(crew_with_load(use_counters=False).order_by('id').values('id', 'assigned_orders')),
+        )
+
+
+class DispatchTests(CravingsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        crew_group = Group.objects.get(name=DELIVERY_CREW)
+        cls.drivers = []
+        for i in range(2):
+            driver = User.objects.create_user(f'driver-{i}')
+            driver.groups.add(crew_group)
+            cls.drivers.append(driver)
+        cls.restaurant.auto_dispatch = True
+        cls.restaurant.save()
+
+    def place(self, count, order_status='ready'):
+        now = timezone.now()
+        return [
+            Order.objects.create(
+                customer=self.customer, restaurant=self.restaurant, total=Decimal('10.00'), status=order_status,
+                delivery_address='1 Main Street', order_date=now - timedelta(minutes=count - i),
+            ).pk
+            for i in range(count)
+        ]
+
+    def load(self, driver):
+        return DeliveryLoad.objects.get(crew=driver).active_orders
+
+    def test_batches_oldest_orders_onto_least_loaded_drivers(self):
+        order_ids = self.place(4)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            assignments = dispatch_restaurant(self.restaurant.pk)
+        # 'crew' already carries ORDER_COUNT orders, the most allowed
+        self.assertEqual(assignments, {self.drivers[0].pk: order_ids[:3], self.drivers[1].pk: order_ids[3:]})
+        self.assertEqual(len(callbacks), 4)
+        self.assertEqual((self.load(self.drivers[0]), self.load(self.drivers[1])), (3, 1))
+        self.assertEqual(
+            set(Order.objects.filter(pk__in=order_ids).values_list('status', flat=True)), {'out_for_delivery'}
+        )
+        self.assertEqual(
+            list(crew_with_load(use_counters=True).order_by('id').values('id', 'assigned_orders')),
+            list(crew_with_load(use_counters=False).order_by('id').values('id', 'assigned_orders')),
+        )
+
+    def test_drivers_stay_within_max_load(self):
+        self.assertTrue(reserve_load(self.drivers[0].pk, 4, 5))
+        self.assertFalse(reserve_load(self.drivers[0].pk, 2, 5))
+        self.assertFalse(reserve_load(self.drivers[1].pk, 6, 5))
+
+        order_ids = self.place(5)
+        assignments = dispatch_restaurant(self.restaurant.pk, max_load=5)
+        self.assertEqual(assignments, {self.drivers[1].pk: order_ids[:3], self.drivers[0].pk: order_ids[3:4]})
+        self.assertEqual((self.load(self.drivers[0]), self.load(self.drivers[1])), (5, 3))
+        # The last order waits for a driver to free up
+        self.assertEqual(dispatch_waiting(batch_size=3, max_load=5), {self.drivers[1].pk: order_ids[4:]})
+
+    def test_orders_assigned_meanwhile_are_left_alone(self):
+        order_ids = self.place(2)
+        Order.objects.filter(pk=order_ids[0]).update(delivery_crew=self.crew, status='out_for_delivery')
+        self.assertEqual(dispatch_restaurant(self.restaurant.pk), {self.drivers[0].pk: order_ids[1:]})
+        self.assertEqual(self.load(self.drivers[0]), 1)
+
+    def test_orders_wait_until_the_restaurant_marks_them_ready(self):
+        order_ids = self.place(2, 'preparing')
+        self.assertEqual(dispatch_restaurant(self.restaurant.pk), {})
+        self.client.force_authenticate(self.owner)
+        response = self.client.post(
+            reverse('order-transition'), {'orders': order_ids[:1], 'status': 'ready'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(dispatch_restaurant(self.restaurant.pk), {self.drivers[0].pk: order_ids[:1]})
+        self.assertEqual(Order.objects.get(pk=order_ids[1]).status, 'preparing')
+        self.assertEqual(self.load(self.drivers[0]), 1)
+
+    def test_only_auto_dispatch_restaurants(self):
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(auto_dispatch=False)
+        self.place(2)
+        self.assertEqual(dispatch_waiting(), {})
+        out = StringIO()
+        call_command('dispatch_orders', stdout=out)
+        self.assertIn('Assigned 0 orders to 0 drivers', out.getvalue())
+
+    def test_owner_turns_on_auto_dispatch(self):
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(auto_dispatch=False)
+        self.client.force_authenticate(self.owner)
+        response = self.client.patch(
+            reverse('restaurant-detail', args=[self.restaurant.pk]), {'auto_dispatch': True}, format='json'
+        )
+        self.assertTrue(response.data['auto_dispatch'])
+        self.place(1)
+        out = StringIO()
+        call_command('dispatch_orders', stdout=out)
+        self.assertIn('Assigned 1 orders to 1 drivers', out.getvalue())
+
+
+class OrderTransitionTests(CravingsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        rollups.rebuild()
+
+    def move(self, orders, new_status, user=None, **data):
+        self.client.force_authenticate(user or self.owner)
+        return self.client.post(reverse('order-transition'), {
+            'orders': [order.pk for order in orders], 'status': new_status, **data,
+        }, format='json')
+
+    def statuses(self):
+        return list(Order.objects.order_by('pk').values_list('status', 'delivery_crew_id'))
+
+    def sales(self):
+        return sorted(DailySales.objects.exclude(orders=0).values_list('restaurant_id', 'day', 'orders', 'revenue'))
+
+    def assert_counters_match(self):
+        self.assertEqual(
+            list(crew_with_load(use_counters=True).order_by('id').values('id', 'assigned_orders')),
+            list(crew_with_load(use_counters=False).order_by('id').values('id', 'assigned_orders')),
+        )
+
+    def test_bulk_cancel(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.move(self.orders[:3], 'cancelled')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            response.data,
+            [{'id': order.pk, 'status': 'cancelled', 'delivery_crew': self.crew.pk} for order in self.orders[:3]],
+        )
+        self.assertEqual(len(callbacks), 3)
+        self.assertEqual(self.crew.delivery_load.active_orders, self.ORDER_COUNT - 3)
+        self.assert_counters_match()
+        sales = self.sales()
+        rollups.rebuild()
+        self.assertEqual(sales, self.sales())
+
+    def test_bulk_cancel_query_budget(self):
+        # Caches the owner's roles
+        self.assertEqual(self.move([], 'cancelled').status_code, 400)
+        counts = []
+        for orders in (self.orders[:1], self.orders[1:]):
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.move(orders, 'cancelled').status_code, 200)
+            counts.append(len(captured))
+        # The same queries for one order as for several
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[1], 14)
+        sales = self.sales()
+        rollups.rebuild()
+        self.assertEqual(sales, self.sales())
+
+    def test_one_update_touching_only_the_status(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.move(self.orders, 'delivered').status_code, 200)
+        [update] = [
+            query['sql'] for query in captured.captured_queries if query['sql'].startswith('UPDATE "orders_order"')
+        ]
+        self.assertIn('SET "status" =', update)
+        self.assertNotIn('"delivery_address"', update)
+        self.assertIn('"orders_order"."status" =', update)
+
+    def test_all_or_none(self):
+        Order.objects.filter(pk=self.orders[0].pk).update(status='delivered')
+        before = self.statuses()
+        response = self.move(self.orders[:2], 'cancelled')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.orders[0].pk), str(response.data['status']))
+        self.assertEqual(self.statuses(), before)
+
+        other_owner = User.objects.create_user('other-owner')
+        other_owner.groups.add(Group.objects.get(name=RESTAURANT_OWNER))
+        self.assertEqual(self.move(self.orders[:1], 'cancelled', user=other_owner).status_code, 400)
+        self.assertEqual(self.move(self.orders[1:2], 'out_for_delivery').status_code, 400)
+        self.assertEqual(self.move(self.orders[1:2], 'cancelled', delivery_crew=self.crew.pk).status_code, 400)
+        self.assertEqual(self.move(self.orders[1:2], 'cancelled', user=self.crew).status_code, 403)
+        self.assertEqual(self.statuses(), before)
+
+    def test_reassign_moves_load(self):
+        driver = User.objects.create_user('driver')
+        driver.groups.add(Group.objects.get(name=DELIVERY_CREW))
+        self.assertEqual(self.move(self.orders[:2], 'out_for_delivery', delivery_crew=driver.pk).status_code, 200)
+        self.assertEqual(DeliveryLoad.objects.get(crew=driver).active_orders, 2)
+        self.assert_counters_match()
+
+    def test_concurrent_change_is_a_conflict(self):
+        stale = list(Order.objects.filter(pk=self.orders[0].pk))
+        Order.objects.filter(pk=self.orders[0].pk).update(status='delivered')
+        with self.assertRaises(TransitionConflict):
+            _transition(stale, 'cancelled', None)
+        self.assertEqual(Order.objects.get(pk=self.orders[0].pk).status, 'delivered')
+        # A fresh read sees the change
+        with self.assertRaises(ValidationError):
+            transition(Order.objects.filter(pk=self.orders[0].pk), 'cancelled')
+
+    def test_single_order_views(self):
+        self.client.force_authenticate(self.crew)
+        url = reverse('mark-delivered', args=[self.orders[0].pk])
+        self.assertEqual(self.client.patch(url).data['status'], 'delivered')
+        self.assertEqual(self.client.patch(url).status_code, 400)
+        self.assertEqual(self.client.patch(reverse('mark-delivered', args=[999999])).status_code, 404)
+
+        other_owner = User.objects.create_user('other-owner')
+        other_owner.groups.add(Group.objects.get(name=RESTAURANT_OWNER))
+        self.client.force_authenticate(other_owner)
+        response = self.client.patch(
+            reverse('assign-delivery', args=[self.orders[1].pk]), {'delivery_crew': self.crew.pk}, format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assert_counters_match()
+
+
+class AddToCartTests(CravingsTestCase):
+
+    def add(self, menu_item, quantity=1):
+        self.client.force_authenticate(self.customer)
+        return self.client.post(
+            reverse('cartitem-list'), {'menu_item': menu_item.pk, 'quantity': quantity}, format='json'
+        )
+
+    def test_adding_existing_item_increments_in_place(self):
+        response = self.add(self.menu_items[0], 3)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['quantity'], 5)
+        self.assertEqual(CartItem.objects.filter(cart=self.cart, menu_item=self.menu_items[0]).count(), 1)
+
+    def test_adding_new_item(self):
+        response = self.add(self.menu_items[3])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['menu_item_name'], self.menu_items[3].name)
+        self.assertEqual(self.cart.items.count(), 4)
+
+    def test_items_from_another_restaurant_are_rejected(self):
+        other = Restaurant.objects.create(
+            name='Other', opening_time=time(9), closing_time=time(22), owner=self.owner
+        )
+        dish = MenuItem.objects.create(restaurant=other, name='Other dish', price=Decimal('3.00'))
+        self.assertEqual(self.add(dish).status_code, 400)
+        self.assertFalse(self.cart.items.filter(menu_item=dish).exists())
+
+    def test_quantity_must_be_positive(self):
+        self.assertEqual(self.add(self.menu_items[0], 0).status_code, 400)
+
+    def test_cart_total_is_computed_in_the_database(self):
+        self.client.force_authenticate(self.customer)
+        expected = sum(item.price * 2 for item in self.menu_items[:3])
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.data['total'], expected)
+        self.cart.items.all().delete()
+        self.assertEqual(self.client.get(reverse('cart')).data['total'], 0)
+
+
+class ChangeCartItemTests(CravingsTestCase):
+
+    def change(self, item, quantity):
+        self.client.force_authenticate(self.customer)
+        return self.client.patch(reverse('cartitem-detail', args=[item.pk]), {'quantity': quantity}, format='json')
+
+    def test_quantity_changes_in_place(self):
+        item = self.cart.items.first()
+        response = self.change(item, 3)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['quantity'], 5)
+        self.assertEqual(self.change(item, -4).data['quantity'], 1)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 1)
+
+    def test_quantity_cannot_drop_below_one(self):
+        item = self.cart.items.first()
+        self.assertEqual(self.change(item, -2).status_code, 400)
+        self.assertEqual(self.change(item, 'many').status_code, 400)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 2)
+
+    def test_other_customers_lines_are_not_found(self):
+        other = User.objects.create_user('other-customer')
+        line = CartItem.objects.create(
+            cart=Cart.objects.create(customer=other), menu_item=self.menu_items[0], quantity=1
+        )
+        self.assertEqual(self.change(line, 1).status_code, 404)
+        self.assertEqual(self.change(line, -5).status_code, 404)
+        line.refresh_from_db()
+        self.assertEqual(line.quantity, 1)
+
+
+class CartBatchTests(CravingsTestCase):
+
+    def batch(self, *operations):
+        self.client.force_authenticate(self.customer)
+        return self.client.post(reverse('cart-batch'), {'operations': list(operations)}, format='json')
+
+    def test_operations_are_applied_in_order(self):
+        first, second, third, fourth = self.menu_items
+        response = self.batch(
+            {'op': 'add', 'menu_item': first.pk, 'quantity': 3},
+            {'op': 'set', 'menu_item': second.pk, 'quantity': 7},
+            {'op': 'remove', 'menu_item': third.pk},
+            {'op': 'add', 'menu_item': fourth.pk},
+            {'op': 'set', 'menu_item': fourth.pk, 'quantity': 4},
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        quantities = {item['menu_item']: item['quantity'] for item in response.data['items']}
+        self.assertEqual(quantities, {first.pk: 5, second.pk: 7, fourth.pk: 4})
+        self.assertEqual(
+            response.data['total'],
+            first.price * 5 + second.price * 7 + fourth.price * 4
+        )
+
+    def test_basket_can_switch_restaurant_in_one_batch(self):
+        other = Restaurant.objects.create(
+            name='Other', opening_time=time(9), closing_time=time(22), owner=self.owner
+        )
+        dish = MenuItem.objects.create(restaurant=other, name='Other dish', price=Decimal('3.00'))
+        removals = [{'op': 'remove', 'menu_item': item.pk} for item in self.menu_items[:3]]
+        response = self.batch(*removals, {'op': 'add', 'menu_item': dish.pk})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([item['menu_item'] for item in response.data['items']], [dish.pk])
+
+    def test_failed_batch_changes_nothing(self):
+        other = Restaurant.objects.create(
+            name='Other', opening_time=time(9), closing_time=time(22), owner=self.owner
+        )
+        dish = MenuItem.objects.create(restaurant=other, name='Other dish', price=Decimal('3.00'))
+        response = self.batch(
+            {'op': 'set', 'menu_item': self.menu_items[0].pk, 'quantity': 9},
+            {'op': 'add', 'menu_item': dish.pk},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.cart.items.get(menu_item=self.menu_items[0]).quantity, 2)
+
+    def test_invalid_operations(self):
+        self.assertEqual(self.batch().status_code, 400)
+        self.assertEqual(self.batch({'op': 'set', 'menu_item': self.menu_items[0].pk}).status_code, 400)
+        self.assertEqual(self.batch({'op': 'add', 'menu_item': 999999}).status_code, 400)
+        self.assertEqual(self.batch({'op': 'explode', 'menu_item': self.menu_items[0].pk}).status_code, 400)
+
+
+class RecordingBroker(BaseBroker):
+    def __init__(self):
+        self.published = []
+
+    def publish(self, user_ids, event):
+        self.published.append((set(user_ids), event))
+
+
+@override_settings(ORDER_EVENTS_BACKEND='orders.tests.RecordingBroker')
+class OrderEventTests(CravingsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        get_broker.cache_clear()
+        self.addCleanup(get_broker.cache_clear)
+
+    def test_status_changes_are_published_to_everyone_involved(self):
+        order = self.orders[0]
+        self.client.force_authenticate(self.crew)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('mark-delivered', args=[order.pk]))
+        [(recipients, event)] = get_broker().published
+        self.assertEqual(recipients, {self.customer.pk, self.owner.pk, self.crew.pk})
+        self.assertEqual((event['order'], event['status']), (order.pk, 'delivered'))
+
+    def test_nothing_is_published_when_the_transaction_rolls_back(self):
+        self.client.force_authenticate(self.crew)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.client.patch(reverse('mark-delivered', args=[self.orders[0].pk]))
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(get_broker().published, [])
+
+
+class OrderStreamTests(CravingsTestCase):
+
+    async def test_stream_pushes_events_for_the_user(self):
+        broker = InProcessBroker()
+        with patch('orders.streams.get_broker', return_value=broker):
+            token = str(AccessToken.for_user(self.customer))
+            response = await self.async_client.get(
+                reverse('order-stream'), headers={'Authorization': f'Bearer {token}'}
+            )
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            stream = aiter(response.streaming_content)
+            self.assertTrue((await anext(stream)).startswith(b'retry:'))
+
+            pending = asyncio.ensure_future(anext(stream))
+            while not broker.subscriber_count():
+                await asyncio.sleep(0)
+            broker.publish([self.owner.pk], {'id': 1, 'type': 'order_status', 'order': 1})
+            broker.publish([self.customer.pk], {'id': 2, 'type': 'order_status', 'order': 2})
+            chunk = await asyncio.wait_for(pending, 1)
+            self.assertIn(b'id: 2\nevent: order_status\n', chunk)
+
+            # A client disconnect cancels the pending read and ends the subscription
+            pending = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0)
+            pending.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await pending
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    async def test_stream_requires_a_valid_token(self):
+        response = await self.async_client.get(reverse('order-stream'), headers={'Authorization': 'Bearer nope'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_stream_is_refused_outside_asgi(self):
+        token = str(AccessToken.for_user(self.customer))
+        response = self.client.get(reverse('order-stream'), headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 501)
+        self.assertFalse(response.streaming)
+
+    async def test_access_tokens_are_not_accepted_in_the_url(self):
+        token = str(AccessToken.for_user(self.customer))
+        response = await self.async_client.get(reverse('order-stream'), {'token': token})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(reverse('order-stream'), {'ticket': token})
+        self.assertEqual(response.status_code, 401)
+
+    def test_tickets_open_one_stream(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post(reverse('order-stream-ticket'))
+        self.assertEqual(response.status_code, 201)
+        ticket = response.data['ticket']
+
+        self.assertEqual(async_to_sync(streams.aredeem_stream_ticket)(ticket), self.customer)
+        self.assertIsNone(async_to_sync(streams.aredeem_stream_ticket)(ticket))
+
+    def test_tickets_expire(self):
+        ticket = streams.issue_stream_ticket(self.customer)
+        with patch('orders.streams.ORDER_STREAM_TICKET_TTL', -1):
+            self.assertIsNone(async_to_sync(streams.aredeem_stream_ticket)(ticket))
+
+    def test_tickets_are_scoped_to_the_stream(self):
+        forged = signing.dumps({'user': self.customer.pk, 'nonce': 'x'})
+        self.assertIsNone(async_to_sync(streams.aredeem_stream_ticket)(forged))
+        User.objects.filter(pk=self.customer.pk).update(is_active=False)
+        self.assertIsNone(async_to_sync(streams.aredeem_stream_ticket)(streams.issue_stream_ticket(self.customer)))
+
+    def test_tickets_need_a_user(self):
+        response = self.client.post(reverse('order-stream-ticket'))
+        self.assertEqual(response.status_code, 401)
+
+
+class SalesRollupTests(CravingsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        rollups.rebuild()
+
+    def checkout(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post(reverse('order-list'), {
+            'delivery_address': '1 Main Street',
+            'order_date': timezone.now().isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return Order.objects.get(pk=response.data['id'])
+
+    def analytics(self, user=None, query=''):
+        self.client.force_authenticate(user or self.owner)
+        return self.client.get(reverse('restaurant-analytics', args=[self.restaurant.pk]) + query)
+
+    def snapshot(self):
+        # Rows decremented to zero are equivalent to missing rows
+        return (
+            sorted(DailySales.objects.exclude(orders=0).values_list(
+                'restaurant_id', 'day', 'orders', 'revenue'
+            )),
+            sorted(DailyItemSales.objects.exclude(quantity=0).values_list(
+                'restaurant_id', 'day', 'menu_item_id', 'quantity', 'revenue'
+            )),
+        )
+
+    def test_checkout_updates_rollups_incrementally(self):
+        before = self.analytics().data
+        order = self.checkout()
+        after = self.analytics().data
+        self.assertEqual(after['orders'], before['orders'] + 1)
+        self.assertEqual(after['revenue'], before['revenue'] + order.total)
+
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_cancel_and_delete_remove_the_order(self):
+        order = self.checkout()
+        rollups.status_changed(order, order.status, 'cancelled')
+        Order.objects.filter(pk=order.pk).update(status='cancelled')
+        cancelled = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(self.snapshot(), cancelled)
+
+        self.client.force_authenticate(self.staff)
+        self.client.delete(reverse('order-detail', args=[self.orders[0].pk]))
+        deleted = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(self.snapshot(), deleted)
+
+    def test_analytics_reads_only_rollups(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.analytics()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(
+            'orders_order' in query['sql'] for query in queries.captured_queries
+        ))
+        self.assertEqual(response.data['orders'], self.ORDER_COUNT)
+        self.assertEqual(
+            [item['menu_item'] for item in response.data['top_items']],
+            sorted(item.pk for item in self.menu_items)
+        )
+
+    def test_analytics_is_limited_to_the_owner(self):
+        self.assertEqual(self.analytics(self.customer).status_code, 404)
+        self.assertEqual(self.analytics(self.staff).status_code, 200)
+        self.assertEqual(self.analytics(query='?start=yesterday').status_code, 400)
+
+
+class MenuSearchTests(CravingsTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.pizzeria = Restaurant.objects.create(
+            name='Pizza Palace', opening_time=time(11), closing_time=time(23), owner=cls.owner
+        )
+        cls.margherita = MenuItem.objects.create(
+            restaurant=cls.pizzeria, name='Margherita Pizza', price=Decimal('9.00'),
+            description='Tomato, mozzarella and basil',
+        )
+        cls.calzone = MenuItem.objects.create(
+            restaurant=cls.pizzeria, name='Calzone', price=Decimal('11.00'),
+            description='Folded pizza with ham and mozzarella',
+        )
+        cls.cheesecake = MenuItem.objects.create(
+            restaurant=cls.restaurant, name='Cheesecake', price=Decimal('6.00'),
+            category='dessert', description='Baked with mozzarella? No, with cream cheese',
+        )
+
+    def search(self, query, user=None):
+        self.client.force_authenticate(user or self.customer)
+        return self.client.get(reverse('menuitem-search') + query)
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data]
+
+    def test_matches_are_ranked_by_field(self):
+        # Name matches outrank description matches
+        self.assertEqual(self.ids(self.search('?q=pizza')), [self.margherita.pk, self.calzone.pk])
+        # Every word has to match
+        self.assertEqual(self.ids(self.search('?q=pizza+basil')), [self.margherita.pk])
+        # The restaurant name counts too
+        self.assertEqual(self.ids(self.search('?q=palace+calzone')), [self.calzone.pk])
+
+    def test_last_word_matches_as_prefix(self):
+        self.assertEqual(self.ids(self.search('?q=marg')), [self.margherita.pk])
+        self.assertEqual(self.ids(self.search('?q=pizza+mozz')), [self.margherita.pk, self.calzone.pk])
+        # Only the word being typed is a prefix
+        self.assertEqual(self.ids(self.search('?q=mozz+pizza')), [])
+
+    def test_candidates_come_from_best_postings(self):
+        with patch('orders.search.SEARCH_CANDIDATES', 1):
+            self.assertEqual(search_menu_items('pizza mozz'), [(self.margherita.pk, 6)])
+
+    def add_items(self, count, name, description=''):
+        items = MenuItem.objects.bulk_create([
+            MenuItem(restaurant=self.restaurant, name=name, price=Decimal('5.00'), description=description)
+            for _ in range(count)
+        ])
+        index_menu_items(MenuItem.objects.with_related().filter(pk__in=[item.pk for item in items]))
+
+    def test_common_words_keep_their_best_postings(self):
+        chicken_pizza = MenuItem.objects.create(restaurant=self.restaurant, name='Chicken pizza', price=Decimal('12.00'))
+        self.add_items(SEARCH_CANDIDATES + 200, 'Wings', 'Chicken wings')
+        self.assertGreater(MenuSearchTerm.objects.filter(term='chicken').count(), SEARCH_CANDIDATES)
+        # The name match outranks hundreds of description matches
+        self.assertEqual(search_menu_items('chicken')[0], (chicken_pizza.pk, 3))
+
+    def test_the_rarest_word_drives(self):
+        chicken_pizza = MenuItem.objects.create(restaurant=self.restaurant, name='Chicken pizza', price=Decimal('12.00'))
+        # As many equally good postings of the common word, all newer
+        self.add_items(SEARCH_CANDIDATES + 100, 'Chicken wings')
+        self.assertEqual(search_menu_items('chicken pizza'), [(chicken_pizza.pk, 6)])
+        self.assertEqual(search_menu_items('pizza chick'), [(chicken_pizza.pk, 6)])
+
+    def test_candidates_without_sliced_subqueries(self):
+        with patch.object(connection.features, 'allow_sliced_subqueries_with_in', False):
+            self.assertEqual(
+                search_menu_items('pizza mozz'), [(self.margherita.pk, 6), (self.calzone.pk, 4)]
+            )
+
+    def test_filters(self):
+        self.assertEqual(self.ids(self.search('?q=mozzarella&category=dessert')), [self.cheesecake.pk])
+        self.assertEqual(self.ids(self.search(f'?q=mozzarella&restaurant={self.restaurant.pk}')), [self.cheesecake.pk])
+        self.assertEqual(self.search('?q=mozzarella&category=soup').status_code, 400)
+        self.assertEqual(self.search('?q=').status_code, 400)
+
+    def test_unavailable_items_are_hidden_from_customers(self):
+        self.calzone.is_available = False
+        self.calzone.save()
+        self.assertEqual(self.ids(self.search('?q=calzone')), [])
+        self.assertEqual(self.ids(self.search('?q=calzone&available=true')), [])
+        self.assertEqual(self.ids(self.search('?q=calzone', self.staff)), [self.calzone.pk])
+        self.assertEqual(self.ids(self.search('?q=calzone&available=false', self.staff)), [self.calzone.pk])
+
+    def test_index_follows_edits(self):
+        self.margherita.name = 'Marinara Pizza'
+        self.margherita.save()
+        self.assertEqual(search_menu_items('margherita'), [])
+        self.assertEqual(search_menu_items('marinara'), [(self.margherita.pk, 3)])
+
+        self.pizzeria.name = 'Napoli'
+        self.pizzeria.save()
+        self.assertEqual(search_menu_items('palace'), [])
+        self.assertEqual(len(search_menu_items('napoli')), 2)
+
+        self.calzone.delete()
+        self.assertFalse(MenuSearchTerm.objects.filter(menu_item_id=self.calzone.pk).exists())
+
+    def test_rebuild_matches_incremental_index(self):
+        def snapshot():
+            return sorted(MenuSearchTerm.objects.values_list('term', 'menu_item_id', 'weight'))
+
+        incremental = snapshot()
+        MenuSearchTerm.objects.all().delete()
+        self.assertEqual(rebuild_index(chunk_size=2), MenuItem.objects.count())
+        self.assertEqual(snapshot(), incremental)
+
+    def test_search_query_budget(self):
+        # The ranked ids, then the menu items
+        with self.assertNumQueries(2):
+            self.search('?q=pizza')
+        # and a bounded count of each word's postings
+        with self.assertNumQueries(4):
+            self.search('?q=pizza+mozz')
+
+
+class OpenHoursTests(CravingsTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.bar = Restaurant.objects.create(
+            name='Night Bar', opening_time=time(18), closing_time=time(2), owner=cls.owner
+        )
+        cls.diner = Restaurant.objects.create(
+            name='All Day Diner', opening_time=time(0), closing_time=time(0), owner=cls.owner
+        )
+
+    def open_at(self, query):
+        self.client.force_authenticate(self.customer)
+        return self.client.get(reverse('restaurant-list') + query)
+
+    def test_open_at_handles_overnight_hours(self):
+        expected = {
+            '09:00': [self.restaurant, self.diner],
+            '12:30': [self.restaurant, self.diner],
+            '20:00': [self.restaurant, self.bar, self.diner],
+            '22:00': [self.bar, self.diner],
+            '01:59': [self.bar, self.diner],
+            '02:00': [self.diner],
+        }
+        for at, restaurants in expected.items():
+            with self.subTest(at=at):
+                response = self.open_at(f'?open_at={at}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [restaurant['id'] for restaurant in response.data],
+                    [restaurant.pk for restaurant in restaurants]
+                )
+
+    def test_open_now_uses_local_time(self):
+        late = timezone.now().replace(hour=23, minute=15)
+        with patch('django.utils.timezone.now', return_value=late):
+            response = self.open_at('?open_now=true')
+        self.assertEqual([restaurant['id'] for restaurant in response.data], [self.bar.pk, self.diner.pk])
+
+    def test_open_at_combines_with_pagination(self):
+        response = self.open_at('?open_at=20:00&page_size=2')
+        self.assertEqual(len(response.data), 2)
+        self.assertIn('rel="next"', response['Link'])
+        next_url = response['Link'].split('<')[1].split('>')[0]
+        response = self.client.get(next_url)
+        self.assertEqual([restaurant['id'] for restaurant in response.data], [self.diner.pk])
+
+    def test_invalid_time_is_rejected(self):
+        self.assertEqual(self.open_at('?open_at=25:00').status_code, 400)
+        self.assertEqual(self.open_at('?open_at=soon').status_code, 400)
+
+    def test_open_at_uses_hours_indexes(self):
+        queryset = Restaurant.objects.open_at(time(20)).order_by()
+        plan = queryset.explain()
+        self.assertIn('restaurant_opening_idx', plan)
+        self.assertIn('restaurant_closing_idx', plan)
+
+
+def jpeg_upload(name='photo.jpg', size=(3000, 2000), color='tomato'):
+    output = BytesIO()
+    Image.new('RGB', size, color).save(output, 'JPEG')
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/jpeg')
+
+
+class ImageVariantTests(CravingsTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.menu_item = self.menu_items[0]
+
+    def upload(self, **kwargs):
+        self.client.force_authenticate(self.owner)
+        with patch.object(images, 'get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(
+                    reverse('menuitem-detail', args=[self.restaurant.pk, self.menu_item.pk]),
+                    {'image': jpeg_upload(**kwargs)}, format='multipart'
+                )
+        self.assertEqual(response.status_code, 200)
+        return get_executor.return_value.submit
+
+    def test_upload_queues_variants_after_commit(self):
+        submit = self.upload()
+        submit.assert_called_once_with(images._run, self.menu_item.pk)
+        # Until the worker has run only the original is linked
+        self.assertEqual(self.client.get(
+            reverse('menuitem-detail', args=[self.restaurant.pk, self.menu_item.pk])
+        ).data['image_variants'], {})
+
+    def test_variants_are_resized_and_exposed(self):
+        self.upload()
+        self.assertEqual(images.generate_variants(self.menu_item.pk), len(images.VARIANTS))
+        self.menu_item.refresh_from_db()
+        storage = self.menu_item.image.storage
+        for name, (width, height, crop) in images.VARIANTS.items():
+            entry = self.menu_item.image_variants[name]
+            with storage.open(entry['path']) as variant, Image.open(variant) as image:
+                self.assertEqual(image.format, images.MENU_IMAGE_FORMAT)
+                if crop:
+                    self.assertEqual(image.size, (width, height))
+                else:
+                    self.assertEqual(image.size, (1280, 853))
+            self.assertLess(entry['bytes'], self.menu_item.image.size)
+
+        response = self.client.get(reverse('menuitem-detail', args=[self.restaurant.pk, self.menu_item.pk]))
+        self.assertEqual(set(response.data['image_variants']), set(images.VARIANTS))
+        self.assertTrue(response.data['image_variants']['card'].startswith('http://testserver/media/'))
+
+    def test_up_to_date_variants_are_skipped(self):
+        self.upload()
+        images.generate_variants(self.menu_item.pk)
+        self.assertEqual(images.generate_variants(self.menu_item.pk), 0)
+        self.menu_item.refresh_from_db()
+        thumbnail = self.menu_item.image_variants['thumbnail']['path']
+        self.menu_item.image.storage.delete(thumbnail)
+        self.assertEqual(images.generate_variants(self.menu_item.pk), 1)
+
+    def test_new_upload_replaces_old_variants(self):
+        self.upload()
+        images.generate_variants(self.menu_item.pk)
+        self.menu_item.refresh_from_db()
+        old_paths = [entry['path'] for entry in self.menu_item.image_variants.values()]
+
+        self.upload(name='other.png', color='navy')
+        self.menu_item.refresh_from_db()
+        self.assertFalse(any(images.is_current(self.menu_item, name) for name in images.VARIANTS))
+        images.generate_variants(self.menu_item.pk)
+        storage = self.menu_item.image.storage
+        self.assertFalse(any(storage.exists(path) for path in old_paths))
+
+    def test_backfill_command(self):
+        self.upload()
+        call_command('backfill_menu_images', workers=1, stdout=StringIO())
+        self.menu_item.refresh_from_db()
+        self.assertTrue(all(images.is_current(self.menu_item, name) for name in images.VARIANTS))
+        output = StringIO()
+        call_command('backfill_menu_images', workers=1, stdout=output)
+        self.assertIn('rendered 0 variants', output.getvalue())
+
+
+class ProjectionTests(CravingsTestCase):
+    """
+    The list endpoints build their rows from values(); they must render
+    exactly what the serializers would.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.unassigned = Order.objects.create(
+            customer=cls.customer, restaurant=cls.restaurant, status='preparing',
+            total=Decimal('12.50'), delivery_address='1 Side Street',
+        )
+        OrderItem.objects.create(
+            order=cls.unassigned, menu_item=cls.menu_items[0], quantity=3, unit_price=Decimal('4.10')
+        )
+        MenuItem.objects.filter(pk=cls.menu_items[1].pk).update(
+            image='menu_items/soup.jpg',
+            image_variants={
+                'thumbnail': {'source': 'menu_items/soup.jpg', 'path': 'menu_items/variants/soup.jpg.thumbnail.webp'},
+                'card': {'source': 'menu_items/old.jpg', 'path': 'menu_items/variants/old.jpg.card.webp'},
+            },
+        )
+
+    def assertMatchesSerializer(self, url, serializer_class, queryset):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        ids = [row['id'] for row in response.data]
+        instances = queryset.in_bulk(ids)
+        expected = serializer_class(
+            [instances[pk] for pk in ids], many=True, context={'request': response.wsgi_request}
+        ).data
+        self.assertEqual(response.data, expected)
+        self.assertEqual(
+            JSONRenderer().render(response.data), FastJSONRenderer().render(expected)
+        )
+
+    def test_restaurant_list(self):
+        self.assertMatchesSerializer(
+            reverse('restaurant-list'), RestaurantSerializer, Restaurant.objects.with_related()
+        )
+
+    def test_menu_item_list(self):
+        self.assertMatchesSerializer(
+            reverse('menuitem-list', args=[self.restaurant.pk]), MenuItemSerializer,
+            MenuItem.objects.with_related()
+        )
+
+    def test_order_list(self):
+        self.assertMatchesSerializer(reverse('order-list'), OrderSerializer, Order.objects.with_related())
+
+    def test_order_history(self):
+        Order.objects.update(status='delivered')
+        archive_batch(archivable_orders(timezone.now() + timedelta(seconds=1)), 100)
+        self.assertMatchesSerializer(
+            reverse('order-history'), ArchivedOrderSerializer, ArchivedOrder.objects.with_related()
+        )
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            'price': Decimal('1.50'), 'when': timezone.now(), 'day': timezone.now().date(),
+            'text': 'caf\u00e9 \u2028', 'nested': [(1, None), {'a': True}], 3: 'key',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+
+class RequestMetricsTests(CravingsTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def routes(self):
+        return {(row['route'], row['method']): row for row in registry.snapshot()['routes']}
+
+    def test_server_timing_header(self):
+        self.client.force_authenticate(self.customer)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('order-list'))
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        for metric in ('db;dur=', 'serialize;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+
+    def test_records_route_totals(self):
+        self.client.force_authenticate(self.customer)
+        for i in range(3):
+            self.client.get(reverse('order-detail', args=[self.orders[0].pk]))
+        self.client.get('/api/no-such-route/')
+        routes = self.routes()
+        stats = routes[('order-detail', 'GET')]
+        self.assertEqual(stats['count'], 3)
+        self.assertEqual(sum(stats['histogram']), 3)
+        self.assertGreater(stats['queries_per_request'], 0)
+        self.assertGreater(stats['serializer_ms_per_request'], 0)
+        self.assertGreater(stats['render_ms_per_request'], 0)
+        self.assertEqual(routes[('<unmatched>', 'GET')]['count'], 1)
+
+    def test_projected_lists_count_as_serializer_time(self):
+        self.client.force_authenticate(self.customer)
+        self.client.get(reverse('menuitem-list', args=[self.restaurant.pk]))
+        self.assertGreater(self.routes()[('menuitem-list', 'GET')]['serializer_ms_per_request'], 0)
+
+    def test_views_measure_their_own_serializers(self):
+        # Timing is opted into per view; DRF's serializers are left unpatched
+        self.assertEqual(BaseSerializer.data.fget.__module__, 'rest_framework.serializers')
+        self.client.force_authenticate(self.customer)
+        self.client.post(reverse('cart-batch'), {'operations': [
+            {'op': 'add', 'menu_item': self.menu_items[0].pk, 'quantity': 1},
+        ]}, format='json')
+        self.assertGreater(self.routes()[('cart-batch', 'POST')]['serializer_ms_per_request'], 0)
+
+    @override_settings(REQUEST_METRICS_SLOW_MS=0, REQUEST_METRICS_WORST_QUERIES=2)
+    def test_slow_requests_are_logged_with_worst_queries(self):
+        self.client.force_authenticate(self.customer)
+        with self.assertLogs('orders.instrumentation', 'WARNING') as logs:
+            self.client.get(reverse('order-list'))
+        message = logs.output[0]
+        self.assertIn('GET /api/orders/ (order-list) -> 200', message)
+        self.assertEqual(message.count('ms SELECT'), 2)
+
+    def test_metrics_endpoint_is_staff_only(self):
+        url = reverse('request-metrics')
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(('request-metrics', 'GET'), {
+            (row['route'], row['method']) for row in response.data['routes']
+        })
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        # Only the DELETE itself is left
+        self.assertEqual(list(self.routes()), [('request-metrics', 'DELETE')])
+
+    async def test_async_stack(self):
+        token = str(AccessToken.for_user(self.customer))
+        response = await self.async_client.get(
+            reverse('order-list'), headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+        self.assertNotIn('render;dur=0.00,', response['Server-Timing'])
+        self.assertEqual(self.routes()[('order-list', 'GET')]['count'], 1)
+
+    def test_percentiles_come_from_buckets(self):
+        stats = RouteStats()
+        stats.count, stats.longest = 100, 700.0
+        # 90 requests under 10ms, 9 under 250ms and one slow outlier
+        stats.buckets[1], stats.buckets[5], stats.buckets[7] = 90, 9, 1
+        self.assertEqual(stats.percentile(50), 10)
+        self.assertEqual(stats.percentile(95), 250)
+        self.assertEqual(stats.percentile(100), 700.0)
+
+
+class OrderArchiveTests(CravingsTestCase):
+    def setUp(self):
+        super().setUp()
+        long_ago = timezone.now() - timedelta(days=400)
+        # Three finished old orders to archive, a recent one and an old one in flight
+        for order, order_status in zip(self.orders[:3], ['delivered', 'cancelled', 'delivered']):
+            Order.objects.filter(pk=order.pk).update(status=order_status, order_date=long_ago)
+        Order.objects.filter(pk=self.orders[3].pk).update(status='delivered')
+        Order.objects.filter(pk=self.orders[4].pk).update(order_date=long_ago)
+        self.archived_ids = [order.pk for order in self.orders[:3]]
+
+    def archive(self, **options):
+        out = StringIO()
+        call_command('archive_orders', stdout=out, **options)
+        return out.getvalue()
+
+    def test_moves_finished_old_orders_with_their_items(self):
+        output = self.archive(batch_size=2)
+        self.assertIn('Archived 3 orders', output)
+        self.assertIn('in 2 batches', output)
+        self.assertEqual(
+            sorted(ArchivedOrder.objects.values_list('id', flat=True)), self.archived_ids
+        )
+        self.assertEqual(
+            ArchivedOrderItem.objects.count(), len(self.archived_ids) * len(self.menu_items)
+        )
+        self.assertFalse(Order.objects.filter(pk__in=self.archived_ids).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id__in=self.archived_ids).exists())
+        archived = ArchivedOrder.objects.get(pk=self.orders[1].pk)
+        self.assertEqual(archived.status, 'cancelled')
+        self.assertEqual(archived.customer, self.customer)
+
+    def test_resumes_where_a_bounded_run_stopped(self):
+        self.archive(batch_size=1, max_batches=2)
+        self.assertEqual(ArchivedOrder.objects.count(), 2)
+        self.archive(batch_size=1)
+        self.assertEqual(ArchivedOrder.objects.count(), 3)
+        self.assertIn('Archived 0 orders', self.archive())
+
+    def rollup_rows(self):
+        return (
+            list(DailySales.objects.order_by('day').values_list('day', 'orders', 'revenue')),
+            list(DailyItemSales.objects.order_by('day', 'menu_item').values_list(
+                'day', 'menu_item', 'quantity', 'revenue'
+            )),
+        )
+
+    def test_rollup_rebuild_includes_archived_orders(self):
+        rollups.rebuild()
+        before = self.rollup_rows()
+        self.archive()
+        rollups.rebuild()
+        self.assertEqual(self.rollup_rows(), before)
+
+    def test_history_is_separate_from_live_orders(self):
+        self.archive()
+        self.client.force_authenticate(self.customer)
+        live = [order['id'] for order in self.client.get(reverse('order-list')).data]
+        history = [order['id'] for order in self.client.get(reverse('order-history')).data]
+        self.assertEqual(sorted(history), self.archived_ids)
+        self.assertFalse(set(live) & set(history))
+        url = reverse('order-history-detail', args=[self.archived_ids[0]])
+        self.assertEqual(self.client.get(url).data['id'], self.archived_ids[0])
+        self.assertEqual(
+            self.client.get(reverse('order-detail', args=[self.archived_ids[0]])).status_code, 404
+        )
+
+    def test_history_is_visible_to_the_same_users(self):
+        self.archive()
+        other = User.objects.create_user('other', password='pass')
+        other.groups.add(Group.objects.get(name=CUSTOMER))
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(reverse('order-history')).data, [])
+        url = reverse('order-history-detail', args=[self.archived_ids[0]])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(len(self.client.get(reverse('order-history')).data), 3)
+
+
+class OrderStatusFilterTests(CravingsTestCase):
+    def test_filters_by_status(self):
+        Order.objects.filter(pk=self.orders[0].pk).update(status='delivered')
+        self.client.force_authenticate(self.owner)
+        response = self.client.get(reverse('order-list') + '?status=delivered')
+        self.assertEqual([order['id'] for order in response.data], [self.orders[0].pk])
+
+    def test_rejects_unknown_status(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.get(reverse('order-list') + '?status=lost')
+        self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Reads SQLite query plans')
+class QueryPlanTests(CravingsTestCase):
+    """
+    The main query of each list view is answered from an index. The test
+    database has no planner statistics, so SQLite plans as if the tables were
+    large and a missing index shows up as a SCAN.
+    """
+
+    def assertUsesIndex(self, user, url, table, index):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        sql = next(
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql']
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertEqual([step for step in plan if step.startswith('SCAN ')], [], plan)
+        self.assertTrue(any(index in step for step in plan), plan)
+
+    def test_customer_orders(self):
+        self.assertUsesIndex(self.customer, reverse('order-list'), 'orders_order', 'order_customer_date_idx')
+
+    def test_crew_orders(self):
+        self.assertUsesIndex(self.crew, reverse('order-list'), 'orders_order', 'order_crew_status_idx')
+
+    def test_owner_orders(self):
+        url = reverse('order-list')
+        # Either index leading with the restaurant; the rows are sorted either way
+        self.assertUsesIndex(self.owner, url, 'orders_order', '(restaurant_id=?)')
+        self.assertUsesIndex(
+            self.owner, url + '?status=preparing', 'orders_order',
+            'order_restaurant_status_idx (restaurant_id=? AND status=?)'
+        )
+
+    def test_customer_menu(self):
+        self.assertUsesIndex(
+            self.customer, reverse('menuitem-list', args=[self.restaurant.pk]), 'orders_menuitem',
+            'menuitem_available_idx (restaurant_id=? AND is_available=?)'
+        )
+
+    def test_owner_menu(self):
+        self.assertUsesIndex(
+            self.owner, reverse('menuitem-list', args=[self.restaurant.pk]), 'orders_menuitem',
+            'menuitem_menu_page_idx'
+        )
+
+    def test_delivery_crew_load(self):
+        self.assertUsesIndex(
+            self.owner, reverse('delivery-crew-list'), 'auth_user', 'COVERING INDEX order_crew_status_idx'
+        )
+
+    def test_owner_export(self):
+        self.assertUsesIndex(
+            self.owner, reverse('order-export', args=['csv']), 'orders_order',
+            'order_export_idx (restaurant_id=? AND id>?)'
+        )
+        self.assertUsesIndex(
+            self.owner, reverse('order-history-export', args=['csv']), 'orders_archivedorder',
+            'archivedorder_export_idx (restaurant_id=? AND id>?)'
+        )
+
+
+class CachedJWTAuthenticationTests(CravingsTestCase):
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    def get(self, route):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(route))
+        user_queries = [query for query in queries.captured_queries if 'FROM "auth_user"' in query['sql']]
+        return response, user_queries
+
+    def get_profile(self):
+        return self.get('user-profile')
+
+    def test_user_is_loaded_once(self):
+        self.authenticate(self.customer)
+        response, user_queries = self.get('user-role')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(user_queries), 1)
+        response, user_queries = self.get('user-role')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(user_queries, [])
+
+    def test_cache_holds_no_password_hash(self):
+        self.authenticate(self.customer)
+        self.get('user-role')
+        entry = cache.get(user_cache_key(self.customer.pk))
+        self.assertEqual(set(entry), {'id', 'is_active', 'is_staff', 'username', 'email', 'password_digest'})
+        self.assertNotIn(self.customer.password, entry.values())
+
+    def test_cached_users_load_other_fields_on_access(self):
+        self.authenticate(self.customer)
+        self.get('user-role')
+        response, user_queries = self.get_profile()
+        self.assertEqual(response.data['username'], 'customer')
+        self.assertEqual(len(user_queries), 1)
+
+    def test_current_user_is_served_from_the_cache(self):
+        self.authenticate(self.customer)
+        self.get('user-role')
+        response, user_queries = self.get('user-me')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'id': self.customer.pk, 'username': 'customer', 'email': self.customer.email})
+        self.assertEqual(user_queries, [])
+
+    def test_saving_the_user_drops_the_cached_copy(self):
+        self.authenticate(self.customer)
+        self.get_profile()
+        self.customer.first_name = 'Renamed'
+        self.customer.save()
+        self.assertIsNone(cache.get(user_cache_key(self.customer.pk)))
+        response, user_queries = self.get_profile()
+        self.assertEqual(response.data['first_name'], 'Renamed')
+        self.assertEqual(len(user_queries), 1)
+
+    def test_deactivated_users_are_rejected(self):
+        self.authenticate(self.customer)
+        self.get_profile()
+        self.customer.is_active = False
+        self.customer.save()
+        self.assertEqual(self.get_profile()[0].status_code, 401)
+        self.assertIsNone(cache.get(user_cache_key(self.customer.pk)))
+
+    def test_cached_copies_are_checked_again(self):
+        self.authenticate(self.customer)
+        self.get('user-role')
+        # update() sends no signals, so the cached entry stays; it must still be checked
+        User.objects.filter(pk=self.customer.pk).update(is_active=False)
+        entry = cache.get(user_cache_key(self.customer.pk))
+        self.assertTrue(entry['is_active'])
+        entry['is_active'] = False
+        cache.set(user_cache_key(self.customer.pk), entry)
+        self.assertEqual(self.get('user-role')[0].status_code, 401)
+
+    def test_changed_passwords_revoke_tokens(self):
+        with patch.object(jwt_settings, 'CHECK_REVOKE_TOKEN', True):
+            self.authenticate(self.customer)
+            self.assertEqual(self.get('user-role')[0].status_code, 200)
+            # A new hash that reaches the cached entry without going through save()
+            User.objects.filter(pk=self.customer.pk).update(password='changed')
+            entry = cache.get(user_cache_key(self.customer.pk))
+            self.assertEqual(self.get('user-role')[0].status_code, 200)
+            entry['password_digest'] = get_md5_hash_password('changed')
+            cache.set(user_cache_key(self.customer.pk), entry)
+            self.assertEqual(self.get('user-role')[0].status_code, 401)
+
+            self.customer.refresh_from_db()
+            self.customer.set_password('another')
+            self.customer.save()
+            self.assertEqual(self.get('user-role')[0].status_code, 401)
+            self.authenticate(self.customer)
+            self.assertEqual(self.get('user-role')[0].status_code, 200)
+
+    def test_group_changes_drop_the_cached_copy(self):
+        self.authenticate(self.customer)
+        self.get_profile()
+        self.customer.groups.add(Group.objects.get(name=DELIVERY_CREW))
+        self.assertIsNone(cache.get(user_cache_key(self.customer.pk)))
+        response = self.client.get(reverse('user-role'))
+        self.assertEqual(response.data['role'], DELIVERY_CREW)
+
+    def test_deleted_users_are_rejected(self):
+        self.authenticate(self.customer)
+        self.get_profile()
+        self.customer.delete()
+        self.assertEqual(self.get_profile()[0].status_code, 401)
+
+
+
+class MenuImportTests(CravingsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.import_url = reverse('menuitem-import', args=[self.restaurant.pk])
+        self.client.force_authenticate(self.owner)
+
+    def export(self, file_format):
+        response = self.client.get(reverse('menuitem-export', args=[self.restaurant.pk, file_format]))
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_upload_adds_and_updates_items(self):
+        dish = self.menu_items[0]
+        upload = SimpleUploadedFile('menu.csv', (
+            'id,name,price,category\n'
+            f'{dish.pk},Smoked brisket,14.50,main\n'
+            ',Pistachio kunafa,6.00,dessert\n'
+        ).encode())
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(self.import_url, {'file': upload})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data, {'created': 1, 'updated': 1, 'unchanged': 0})
+        self.assertEqual(len(callbacks), 1)
+        dish.refresh_from_db()
+        self.assertEqual((dish.name, dish.price, dish.category), ('Smoked brisket', Decimal('14.50'), 'main'))
+        added = MenuItem.objects.get(name='Pistachio kunafa')
+        self.assertEqual((added.restaurant, added.is_available), (self.restaurant, True))
+        # bulk writes send no signals; the import indexes the items itself
+        self.assertEqual([pk for pk, score in search_menu_items('brisket')], [dish.pk])
+        self.assertEqual([pk for pk, score in search_menu_items('kunafa')], [added.pk])
+        self.assertEqual(search_menu_items('dish 0'), [])
+
+    def test_availability_and_price_toggles(self):
+        first, second = self.menu_items[:2]
+        response = self.client.post(self.import_url, [
+            {'id': first.pk, 'is_available': False},
+            {'id': second.pk, 'price': '1.99'},
+            {'id': self.menu_items[2].pk, 'price': str(self.menu_items[2].price)},
+        ], format='json')
+        self.assertEqual(response.data, {'created': 0, 'updated': 2, 'unchanged': 1})
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertFalse(first.is_available)
+        self.assertEqual((first.price, second.price), (Decimal('10.00'), Decimal('1.99')))
+        self.assertFalse(first.search_terms.filter(is_available=True).exists())
+        self.assertNotIn(first.pk, [pk for pk, score in search_menu_items('dish', is_available=True)])
+
+    def test_invalid_rows_are_reported_and_nothing_is_written(self):
+        response = self.client.post(self.import_url, [
+            {'name': 'Valid', 'price': '5.00'},
+            {'name': 'No price'},
+            {'id': self.menu_items[0].pk, 'price': '2.00'},
+            {'id': self.menu_items[1].pk, 'category': 'brunch'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['rows']), [2, 4])
+        self.assertIn('price', response.data['rows'][2])
+        self.assertFalse(MenuItem.objects.filter(name='Valid').exists())
+        self.assertEqual(MenuItem.objects.get(pk=self.menu_items[0].pk).price, Decimal('10.00'))
+
+    def test_unknown_and_duplicate_ids_are_rejected(self):
+        other = Restaurant.objects.create(
+            name='Other', opening_time=time(9), closing_time=time(22), owner=self.owner
+        )
+        foreign = MenuItem.objects.create(restaurant=other, name='Foreign', price=Decimal('3.00'))
+        response = self.client.post(self.import_url, [
+            {'id': foreign.pk, 'price': '1.00'},
+            {'id': self.menu_items[0].pk, 'price': '2.00'},
+            {'id': self.menu_items[0].pk, 'price': '3.00'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['rows']), [1, 3])
+        self.assertEqual(MenuItem.objects.get(pk=self.menu_items[0].pk).price, Decimal('10.00'))
+
+    def test_other_owners_cannot_import_or_export(self):
+        owner = User.objects.create_user('other-owner')
+        owner.groups.add(Group.objects.get(name='Restaurant Owner'))
+        self.client.force_authenticate(owner)
+        response = self.client.post(self.import_url, [{'name': 'Intruder', 'price': '1.00'}], format='json')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('menuitem-export', args=[self.restaurant.pk, 'csv']))
+        self.assertEqual(response.status_code, 404)
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.post(self.import_url, [], format='json').status_code, 403)
+
+    def test_export_round_trips_through_import(self):
+        exported = self.export('csv')
+        self.assertEqual(exported.splitlines()[0], 'id,name,description,price,is_available,category')
+        self.assertEqual(len(exported.splitlines()), len(self.menu_items) + 1)
+        upload = SimpleUploadedFile('menu.csv', exported.encode())
+        response = self.client.post(self.import_url, {'file': upload})
+        self.assertEqual(response.data, {'created': 0, 'updated': 0, 'unchanged': len(self.menu_items)})
+
+        upload = SimpleUploadedFile('menu.json', self.export('json').encode())
+        response = self.client.post(self.import_url, {'file': upload})
+        self.assertEqual(response.data, {'created': 0, 'updated': 0, 'unchanged': len(self.menu_items)})
+
+    @patch('orders.menu_import.MENU_EXPORT_CHUNK_SIZE', 3)
+    def test_export_reads_the_menu_in_chunks(self):
+        MenuItem.objects.create(restaurant=self.restaurant, name='Extra', price=Decimal('1.00'))
+        with CaptureQueriesContext(connection) as queries:
+            rows = self.export('json')
+        self.assertEqual(
+            [row['name'] for row in json.loads(rows)],
+            [item.name for item in self.menu_items] + ['Extra'],
+        )
+        self.assertEqual(sum('orders_menuitem' in query['sql'] for query in queries.captured_queries), 2)
+
+    @patch('orders.menu_import.MENU_IMPORT_MAX_ROWS', 3)
+    def test_row_limit(self):
+        rows = [{'name': f'New {i}', 'price': '1.00'} for i in range(4)]
+        response = self.client.post(self.import_url, rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(MenuItem.objects.filter(name__startswith='New').exists())
+
+    def test_queries_do_not_grow_with_rows(self):
+        rows = [{'name': f'New {i}', 'description': 'Fresh', 'price': '1.00'} for i in range(50)]
+        rows += [{'id': item.pk, 'is_available': False} for item in self.menu_items]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.import_url, rows, format='json')
+        self.assertEqual(response.data, {'created': 50, 'updated': len(self.menu_items), 'unchanged': 0})
+        self.assertLessEqual(len(queries), 13)
+
+
+class OrderExportTests(CravingsTestCase):
+
+    def export(self, user, file_format='csv', route='order-export', **params):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse(route, args=[file_format]), params)
+        self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_has_a_row_per_item(self):
+        Order.objects.create(
+            customer=self.customer, restaurant=self.restaurant, total=Decimal('0.00'),
+            delivery_address='Nowhere',
+        )
+        rows = list(csv.DictReader(StringIO(self.export(self.staff))))
+        self.assertEqual(len(rows), self.ORDER_COUNT * len(self.menu_items) + 1)
+        first = rows[0]
+        self.assertEqual(first['order_id'], str(self.orders[0].pk))
+        self.assertEqual(first['menu_item_name'], self.menu_items[0].name)
+        self.assertEqual(first['subtotal'], '10.00')
+        self.assertEqual(rows[-1]['item_id'], '')
+
+    def test_ndjson_matches_the_serializer(self):
+        lines = self.export(self.staff, 'ndjson').splitlines()
+        self.assertEqual(len(lines), self.ORDER_COUNT)
+        expected = OrderSerializer(Order.objects.with_related().get(pk=self.orders[0].pk)).data
+        self.assertEqual(json.loads(lines[0]), json.loads(JSONRenderer().render(expected)))
+
+    def test_owners_only_export_their_restaurants(self):
+        other_owner = User.objects.create_user('other-owner')
+        other_owner.groups.add(Group.objects.get(name='Restaurant Owner'))
+        other = Restaurant.objects.create(
+            name='Other', opening_time=time(9), closing_time=time(22), owner=other_owner
+        )
+        Order.objects.create(
+            customer=self.customer, restaurant=other, total=Decimal('0.00'), delivery_address='Elsewhere',
+        )
+        self.assertEqual(len(self.export(self.owner, 'ndjson').splitlines()), self.ORDER_COUNT)
+        self.assertEqual(len(self.export(other_owner, 'ndjson').splitlines()), 1)
+        self.assertEqual(len(self.export(self.staff, 'ndjson').splitlines()), self.ORDER_COUNT + 1)
+        lines = self.export(self.staff, 'ndjson', restaurant=other.pk).splitlines()
+        self.assertEqual([json.loads(line)['restaurant_name'] for line in lines], ['Other'])
+
+    def test_customers_and_crew_cannot_export(self):
+        for user in (self.customer, self.crew):
+            self.client.force_authenticate(user)
+            self.assertEqual(self.client.get(reverse('order-export', args=['csv'])).status_code, 403)
+
+    def test_filters(self):
+        Order.objects.filter(pk=self.orders[0].pk).update(order_date=timezone.now() - timedelta(days=10))
+        Order.objects.filter(pk=self.orders[1].pk).update(status='delivered')
+        today = timezone.localdate()
+
+        def exported(**params):
+            lines = self.export(self.staff, 'ndjson', **params).splitlines()
+            return sorted(json.loads(line)['id'] for line in lines)
+
+        recent = sorted(order.pk for order in self.orders[1:])
+        self.assertEqual(exported(start=(today - timedelta(days=1)).isoformat()), recent)
+        self.assertEqual(exported(end=(today - timedelta(days=5)).isoformat()), [self.orders[0].pk])
+        self.assertEqual(exported(status='delivered'), [self.orders[1].pk])
+        self.client.force_authenticate(self.staff)
+        for params in ({'start': 'yesterday'}, {'status': 'lost'}, {'restaurant': 'x'}):
+            response = self.client.get(reverse('order-export', args=['csv']), params)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(reverse('order-export', args=['xml'])).status_code, 400)
+
+    def test_orders_are_read_in_chunks(self):
+        with CaptureQueriesContext(connection) as queries:
+            chunks = list(order_chunks(Order.objects.all(), OrderProjection(None), chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual([order['id'] for chunk in chunks for order in chunk], [order.pk for order in self.orders])
+        # The orders and the items of each chunk
+        self.assertEqual(len(queries), 6)
+
+    def test_history_export(self):
+        Order.objects.update(status='delivered')
+        archive_batch(archivable_orders(timezone.now() + timedelta(seconds=1)), 100)
+        lines = self.export(self.owner, 'ndjson', route='order-history-export').splitlines()
+        self.assertEqual(len(lines), self.ORDER_COUNT)
+        self.assertEqual(len(json.loads(lines[0])['items']), len(self.menu_items))
+        self.assertEqual(self.export(self.owner, 'ndjson'), '')
+
+
+def reload_urlconf():
+    """
+    Import the URLconf again, so that it routes by the current ASYNC_READ_VIEWS.
+    """
+    importlib.reload(importlib.import_module('orders.urls'))
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+class AsyncReadViewTests(CravingsTestCase):
+    def setUp(self):
+        super().setUp()
+        with override_settings(ASYNC_READ_VIEWS=True):
+            reload_urlconf()
+        self.addCleanup(reload_urlconf)
+
+    def read_urls(self):
+        return {
+            'menuitem-list': (
+                reverse('menuitem-list', args=[self.restaurant.pk]), views.MenuItemList,
+                {'restaurant_id': self.restaurant.pk},
+            ),
+            'order-detail': (
+                reverse('order-detail', args=[self.orders[0].pk]), views.OrderDetail, {'pk': self.orders[0].pk},
+            ),
+            'cart': (reverse('cart'), views.CartView, {}),
+            'user-role': (reverse('user-role'), views.UserRoleView, {}),
+            'user-profile': (reverse('user-profile'), views.UserProfileView, {}),
+        }
+
+    def test_responses_match_the_drf_views(self):
+        factory = APIRequestFactory()
+        for route, (url, drf_view, kwargs) in self.read_urls().items():
+            with self.subTest(route=route):
+                self.assertTrue(iscoroutinefunction(resolve(url).func))
+                cache.clear()
+                self.client.force_authenticate(self.customer)
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], 'application/json')
+
+                cache.clear()
+                request = factory.get(url)
+                force_authenticate(request, self.customer)
+                expected = drf_view.as_view()(request, **kwargs).render()
+                self.assertEqual(json.loads(response.content), json.loads(expected.content))
+                self.assertEqual(response['Allow'], expected['Allow'])
+
+    async def test_bearer_tokens_over_asgi(self):
+        token = str(AccessToken.for_user(self.customer))
+        for route, (url, drf_view, kwargs) in self.read_urls().items():
+            with self.subTest(route=route):
+                response = await self.async_client.get(url, headers={'Authorization': f'Bearer {token}'})
+                self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(
+            reverse('order-detail', args=[self.orders[0].pk]), headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(response.data['id'], self.orders[0].pk)
+        # Queries run in sync_to_async's threads still count towards the request
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+    async def test_credentials_are_required(self):
+        url = reverse('order-detail', args=[self.orders[0].pk])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        response = await self.async_client.get(url, headers={'Authorization': 'Bearer nope'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['code'], 'token_not_valid')
+
+    def test_permissions_and_visibility(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get(reverse('user-role')).data, {'role': RESTAURANT_OWNER})
+
+        other = User.objects.create_user('other', password='pass')
+        other.groups.add(Group.objects.get(name=CUSTOMER))
+        self.client.force_authenticate(other)
+        response = self.client.get(reverse('order-detail', args=[self.orders[0].pk]))
+        self.assertEqual(response.status_code, 404)
+        # A first visit creates the cart
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.data['items'], [])
+        self.assertEqual(response.data['total'], Decimal('0.00'))
+
+    def test_menu_etags_and_the_menu_cache(self):
+        self.client.force_authenticate(self.customer)
+        url = reverse('menuitem-list', args=[self.restaurant.pk])
+        first = self.client.get(url, {'page_size': 2})
+        self.assertIn('rel="next"', first['Link'])
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {'page_size': 2})
+            revalidated = self.client.get(url, {'page_size': 2}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Link'], first['Link'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertFalse(revalidated.has_header('Content-Type'))
+
+    def test_writes_and_the_browsable_api_go_to_the_drf_views(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.patch(reverse('user-profile'), {'first_name': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.first_name, 'Renamed')
+
+        response = self.client.get(reverse('user-profile'), HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+
+        self.client.force_authenticate(self.owner)
+        response = self.client.post(
+            reverse('menuitem-list', args=[self.restaurant.pk]), {'name': 'New', 'price': '4.00'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+
+class ReplicaRoutingTests(APITransactionTestCase):
+    # Rows must be committed for the replica's connection to see them
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('owner', password='pass')
+        self.customer = User.objects.create_user('customer', password='pass')
+        self.customer.groups.add(Group.objects.create(name=CUSTOMER))
+        self.other = User.objects.create_user('other', password='pass')
+        self.other.groups.add(Group.objects.get(name=CUSTOMER))
+        self.restaurant = Restaurant.objects.create(
+            name='Grill House', opening_time=time(9), closing_time=time(22), owner=owner,
+        )
+        self.menu_item = MenuItem.objects.create(
+            restaurant=self.restaurant, name='Dish', price=Decimal('10.00'), category='main',
+        )
+
+    def login(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    def tables_read(self, method, url, data=None):
+        """
+        Send a request and return the tables each database selected from,
+        leaving out joined ones.
+        """
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.content[:200])
+        return {
+            alias: {
+                table for query in captured.captured_queries if query['sql'].startswith('SELECT')
+                for table in ('auth_user', 'orders_restaurant', 'orders_menuitem', 'orders_cartitem')
+                if f'FROM "{table}"' in query['sql']
+            }
+            for alias, captured in (('default', primary), ('replica', replica))
+        }
+
+    def test_reads_of_read_only_requests_use_the_replica(self):
+        self.login(self.customer)
+        tables = self.tables_read('get', reverse('restaurant-list'))
+        self.assertIn('orders_restaurant', tables['replica'])
+        self.assertNotIn('orders_restaurant', tables['default'])
+        # The user is about to be cached, so is read from the primary
+        self.assertIn('auth_user', tables['default'])
+        self.assertNotIn('auth_user', tables['replica'])
+
+    def test_cache_fills_read_from_the_primary(self):
+        self.login(self.customer)
+        tables = self.tables_read('get', reverse('menuitem-list', args=[self.restaurant.pk]))
+        self.assertIn('orders_menuitem', tables['default'])
+        self.assertEqual(tables['replica'], set())
+
+    def test_writes_pin_the_writer_to_the_primary(self):
+        self.login(self.customer)
+        tables = self.tables_read('post', reverse('cartitem-list'), {'menu_item': self.menu_item.pk, 'quantity': 1})
+        self.assertEqual(tables['replica'], set())
+        self.assertTrue(cache.get(pin_key(self.customer.pk)))
+
+        tables = self.tables_read('get', reverse('cartitem-list'))
+        self.assertIn('orders_cartitem', tables['default'])
+        self.assertEqual(tables['replica'], set())
+
+        # Other users keep reading from the replica
+        self.login(self.other)
+        self.assertIn('orders_cartitem', self.tables_read('get', reverse('cartitem-list'))['replica'])
+
+        # Until the pin expires
+        cache.delete(pin_key(self.customer.pk))
+        self.login(self.customer)
+        self.assertIn('orders_cartitem', self.tables_read('get', reverse('cartitem-list'))['replica'])
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(MenuItem.objects.all().db, 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        self.login(self.customer)
+        self.assertEqual(self.tables_read('get', reverse('restaurant-list'))['replica'], set())
@@ -0,0 +1,104 @@
+from collections import Counter
+
+from django.db import transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from . import rollups
+from .events import publish_order_event
+from .models import Order
+from .workload import adjust_load
+
+PREPARING = 'preparing'
+READY = 'ready'
+OUT_FOR_DELIVERY = 'out_for_delivery'
+DELIVERED = 'delivered'
+CANCELLED = 'cancelled'
+
+# The statuses an order may move to from each status. Moving from out for
+# delivery to out for delivery hands the order to another driver. Ready
+# orders wait for a driver to pick them up, see orders.dispatch.
+TRANSITIONS = {
+    PREPARING: (READY, OUT_FOR_DELIVERY, CANCELLED),
+    READY: (OUT_FOR_DELIVERY, CANCELLED),
+    OUT_FOR_DELIVERY: (OUT_FOR_DELIVERY, DELIVERED, CANCELLED),
+    DELIVERED: (),
+    CANCELLED: (),
+}
+
+
+class TransitionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The orders changed while they were being updated. Reload them and try again.'
+    default_code = 'conflict'
+
+
+def transition(orders, new_status, delivery_crew=None, attempts=3):
+    """
+    Move every order of the queryset ``orders`` to ``new_status``, handing
+    them to ``delivery_crew`` when going out for delivery, and return them
+    updated. All of them move or none do: a move TRANSITIONS does not allow
+    raises ValidationError.
+
+    Orders are read without locks and written with conditional UPDATEs that
+    only match rows still in the status and with the driver they were read
+    with, and only set the columns that change; one UPDATE per (status,
+    driver) pair. When another request changed an order in between, the
+    whole move is retried and, after ``attempts``, TransitionConflict is
+    raised. Load counters, sales rollups and order events follow the
+    orders that moved.
+    """
+    if new_status == OUT_FOR_DELIVERY and delivery_crew is None:
+        raise ValidationError({'delivery_crew': 'Orders going out for delivery need a delivery crew member.'})
+    if new_status != OUT_FOR_DELIVERY and delivery_crew is not None:
+        raise ValidationError({'delivery_crew': 'Only orders going out for delivery get a delivery crew member.'})
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return _transition(list(orders.all()), new_status, delivery_crew)
+        except TransitionConflict:
+            if attempt == attempts - 1:
+                raise
+
+
+def _transition(orders, new_status, delivery_crew):
+    invalid = [
+        f'Order {order.pk} cannot go from {order.status} to {new_status}.'
+        for order in orders if new_status not in TRANSITIONS.get(order.status, ())
+    ]
+    if invalid:
+        raise ValidationError({'status': invalid})
+
+    changes = {}
+    for order in orders:
+        values = {}
+        if order.status != new_status:
+            values['status'] = new_status
+        if delivery_crew is not None and order.delivery_crew_id != delivery_crew.pk:
+            values['delivery_crew_id'] = delivery_crew.pk
+        if values:
+            changes.setdefault((order.status, order.delivery_crew_id, tuple(values.items())), []).append(order)
+
+    load = Counter()
+    moved = []
+    for (old_status, old_crew_id, values), changed in changes.items():
+        updated = Order.objects.filter(
+            pk__in=[order.pk for order in changed], status=old_status, delivery_crew_id=old_crew_id
+        ).update(**dict(values))
+        if updated != len(changed):
+            raise TransitionConflict()
+        for order in changed:
+            if old_status == OUT_FOR_DELIVERY:
+                load[old_crew_id] -= 1
+            if new_status == OUT_FOR_DELIVERY:
+                load[delivery_crew.pk] += 1
+            moved.append((order, old_status, new_status))
+            order.status = new_status
+            if delivery_crew is not None:
+                order.delivery_crew = delivery_crew
+            publish_order_event(order, also_notify=[old_crew_id])
+    rollups.statuses_changed(moved)
+    for crew_id, delta in load.items():
+        adjust_load(crew_id, delta)
+    return orders
+
@@ -1,30 +1,48 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from . import views
-from .views import UserProfileView
+from . import async_views, views, streams
+
+# The hot read endpoints answer GETs on the event loop, see orders.async_views
+read_views = async_views if getattr(settings, 'ASYNC_READ_VIEWS', False) else views
 
 urlpatterns = [
     # Restaurant URLs
     path('restaurants/', views.RestaurantList.as_view(), name='restaurant-list'),
     path('restaurants/<int:pk>/', views.RestaurantDetail.as_view(), name='restaurant-detail'),
+    path('restaurants/<int:pk>/analytics/', views.RestaurantAnalyticsView.as_view(), name='restaurant-analytics'),
     
     # Menu Item URLs
-    path('restaurants/<int:restaurant_id>/menu-items/', views.MenuItemList.as_view(), name='menuitem-list'),
+    path('restaurants/<int:restaurant_id>/menu-items/', read_views.MenuItemList.as_view(), name='menuitem-list'),
     path('restaurants/<int:restaurant_id>/menu-items/<int:pk>/', views.MenuItemDetail.as_view(), name='menuitem-detail'),
+    path('restaurants/<int:restaurant_id>/menu-items/import/', views.MenuImportView.as_view(), name='menuitem-import'),
+    path('restaurants/<int:restaurant_id>/menu-items/export.<str:file_format>', views.MenuExportView.as_view(), name='menuitem-export'),
+    
+    path('menu-items/search/', views.MenuSearchView.as_view(), name='menuitem-search'),
     
     # Cart URLs
-    path('cart/', views.CartView.as_view(), name='cart'),
+    path('cart/', read_views.CartView.as_view(), name='cart'),
     path('cart/items/', views.CartItemList.as_view(), name='cartitem-list'),
+    path('cart/batch/', views.CartBatchView.as_view(), name='cart-batch'),
     path('cart/items/<int:pk>/', views.CartItemDetail.as_view(), name='cartitem-detail'),
     
     # Order URLs
     path('orders/', views.OrderList.as_view(), name='order-list'),
-    path('orders/<int:pk>/', views.OrderDetail.as_view(), name='order-detail'),
+    path('orders/stream/', streams.order_stream, name='order-stream'),
+    path('orders/stream/ticket/', views.OrderStreamTicketView.as_view(), name='order-stream-ticket'),
+    path('orders/export.<str:file_format>', views.OrderExportView.as_view(), name='order-export'),
+    path('orders/history/', views.OrderHistoryList.as_view(), name='order-history'),
+    path('orders/history/export.<str:file_format>', views.OrderHistoryExportView.as_view(), name='order-history-export'),
+    path('orders/history/<int:pk>/', views.OrderHistoryDetail.as_view(), name='order-history-detail'),
+    path('orders/<int:pk>/', read_views.OrderDetail.as_view(), name='order-detail'),
     path('orders/<int:pk>/assign-delivery/', views.AssignDeliveryView.as_view(), name='assign-delivery'),
     path('orders/<int:pk>/mark-delivered/', views.MarkDeliveredView.as_view(), name='mark-delivered'),
+    path('orders/transition/', views.OrderTransitionView.as_view(), name='order-transition'),
     
     
-    path('user-role/', views.UserRoleView.as_view(), name='user-role'),
-    path('profile/', UserProfileView.as_view(), name='user-profile'),
+    path('user-role/', read_views.UserRoleView.as_view(), name='user-role'),
+    path('profile/', read_views.UserProfileView.as_view(), name='user-profile'),
     path('users/delivery-crew/', views.DeliveryCrewList.as_view(), name='delivery-crew-list'),
+    
+    path('metrics/requests/', views.RequestMetricsView.as_view(), name='request-metrics'),
 ] 
\ No newline at end of file
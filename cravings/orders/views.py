@@ -1,3 +1,6 @@
+from datetime import timedelta
+from decimal import Decimal
+
 from django.shortcuts import render
 from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action
@@ -5,59 +8,167 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.contrib.auth.models import User, Group
 from django.shortcuts import get_object_or_404
-from .models import Restaurant, MenuItem, Cart, CartItem, Order, OrderItem
+from django.http import StreamingHttpResponse
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_time
+from .models import (
+    Restaurant, MenuItem, Cart, CartItem, Order, DailySales, DailyItemSales, ArchivedOrder
+)
 from .serializers import (
     UserSerializer, RestaurantSerializer, MenuItemSerializer,
-    CartSerializer, CartItemSerializer, OrderSerializer, OrderItemSerializer
+    CartSerializer, CartItemSerializer, OrderSerializer, OrderItemSerializer,
+    CartBatchSerializer, ArchivedOrderSerializer, OrderTransitionSerializer
 )
 from .permissions import IsRestaurantOwner, IsDeliveryCrew, IsCustomer
+from .roles import get_roles, RESTAURANT_OWNER, DELIVERY_CREW, CUSTOMER
+from .cart import add_to_cart, apply_cart_operations
+from .checkout import place_order
+from . import rollups
+from .events import publish_order_event
+from .search import search_menu_items
+from .menu_cache import menu_etag, get_cached_menu, set_cached_menu
+from .routers import primary_reads
+from .menu_import import import_menu, read_csv, read_json, export_csv, export_json
+from . import order_export
+from .workload import crew_with_load, adjust_load
+from .transitions import transition, DELIVERED, OUT_FOR_DELIVERY
+from .instrumentation import registry, measure_serialization, MeasuredSerializerMixin
+from .streams import issue_stream_ticket, ORDER_STREAM_TICKET_TTL
+from .pagination import OrderPagination, MenuItemPagination, RestaurantPagination
+from .projections import (
+    ProjectedListMixin, RestaurantProjection, MenuItemProjection, OrderProjection,
+    ArchivedOrderProjection
+)
 from rest_framework.views import APIView
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
+
+
+def date_param(request, param, default=None):
+    value = request.query_params.get(param)
+    if value is None:
+        return default
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({param: 'Use the YYYY-MM-DD format.'})
+    return parsed
 
 
 # Restaurant Views
-class RestaurantList(generics.ListCreateAPIView):
+class RestaurantList(ProjectedListMixin, MeasuredSerializerMixin, generics.ListCreateAPIView):
     serializer_class = RestaurantSerializer
+    projection_class = RestaurantProjection
+    pagination_class = RestaurantPagination
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
-        if user.is_staff:
-            return Restaurant.objects.all()
-        elif user.groups.filter(name='Restaurant Owner').exists():
-            return Restaurant.objects.filter(owner=user)
-        return Restaurant.objects.all()
+        queryset = Restaurant.objects.visible_to(self.request.user).with_related()
+        params = self.request.query_params
+        if 'open_at' in params:
+            queryset = queryset.open_at(self.get_time(params['open_at']))
+        elif params.get('open_now', '').lower() in ('1', 'true', 'yes'):
+            queryset = queryset.open_at(timezone.localtime().time())
+        return queryset
+
+    def get_time(self, value):
+        try:
+            at = parse_time(value)
+        except ValueError:
+            at = None
+        if at is None:
+            raise ValidationError({'open_at': 'Use the HH:MM format.'})
+        return at
     
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
-class RestaurantDetail(generics.RetrieveUpdateDestroyAPIView):
+class RestaurantDetail(MeasuredSerializerMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = RestaurantSerializer
     permission_classes = [IsAuthenticated, IsRestaurantOwner]
     
     def get_queryset(self):
+        queryset = Restaurant.objects.with_related()
         if self.request.user.is_staff:
-            return Restaurant.objects.all()
-        return Restaurant.objects.filter(owner=self.request.user)
+            return queryset
+        return queryset.filter(owner=self.request.user)
+
+class RestaurantAnalyticsView(APIView):
+    """
+    Daily order counts, revenue and top-selling items for a restaurant, read
+    from the sales rollups only.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        restaurants = Restaurant.objects.all()
+        if not request.user.is_staff:
+            restaurants = restaurants.filter(owner=request.user)
+        restaurant = get_object_or_404(restaurants, pk=pk)
+
+        end = date_param(request, 'end', timezone.localdate())
+        start = date_param(request, 'start', end - timedelta(days=29))
+        try:
+            top = min(max(int(request.query_params.get('top', 10)), 1), 100)
+        except ValueError:
+            raise ValidationError({'top': 'Must be an integer.'})
+
+        days = list(
+            DailySales.objects.filter(restaurant=restaurant, day__range=(start, end))
+            .order_by('day').values('day', 'orders', 'revenue')
+        )
+        top_items = list(
+            DailyItemSales.objects.filter(restaurant=restaurant, day__range=(start, end))
+            .values('menu_item', name=F('menu_item__name'))
+            .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+            .order_by('-quantity', 'menu_item')[:top]
+        )
+        return Response({
+            'restaurant': restaurant.pk,
+            'start': start,
+            'end': end,
+            'orders': sum(day['orders'] for day in days),
+            'revenue': sum((day['revenue'] for day in days), Decimal('0.00')),
+            'days': days,
+            'top_items': top_items,
+        })
 
 # Menu Item Views
-class MenuItemList(generics.ListCreateAPIView):
+class MenuItemList(ProjectedListMixin, MeasuredSerializerMixin, generics.ListCreateAPIView):
     serializer_class = MenuItemSerializer
+    projection_class = MenuItemProjection
+    pagination_class = MenuItemPagination
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        restaurant_id = self.kwargs['restaurant_id']
-        if self.request.user.is_staff:
-            return MenuItem.objects.filter(restaurant_id=restaurant_id)
-        elif self.request.user.groups.filter(name='Restaurant Owner').exists():
-            return MenuItem.objects.filter(
-                restaurant_id=restaurant_id,
-                restaurant__owner=self.request.user
-            )
         return MenuItem.objects.filter(
-            restaurant_id=restaurant_id,
-            is_available=True
-        )
+            restaurant_id=self.kwargs['restaurant_id']
+        ).visible_to(self.request.user).with_related()
+
+    def list(self, request, *args, **kwargs):
+        # Menus are cached per restaurant version; clients revalidate with ETags
+        etag = menu_etag(request, self.kwargs['restaurant_id'])
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        cached = get_cached_menu(etag)
+        if cached is not None:
+            data, cached_headers = cached
+            return Response(data, headers={**cached_headers, **headers})
+
+        # Cached under the current version, so it must not come from a
+        # replica that has not seen the latest change yet
+        with primary_reads():
+            response = super().list(request, *args, **kwargs)
+        link = {'Link': response['Link']} if response.has_header('Link') else {}
+        set_cached_menu(etag, [dict(row) for row in response.data], link)
+        for name, value in headers.items():
+            response[name] = value
+        return response
     
     def perform_create(self, serializer):
         restaurant = get_object_or_404(
@@ -69,147 +180,279 @@ class MenuItemList(generics.ListCreateAPIView):
             raise PermissionError("You don't have permission to add items to this restaurant")
         serializer.save(restaurant=restaurant)
 
-class MenuItemDetail(generics.RetrieveUpdateDestroyAPIView):
+class MenuImportView(APIView):
+    """
+    Add and update many of a restaurant's menu items in one transaction, from
+    a JSON list in the body or an uploaded ``file`` in CSV or JSON, the format
+    of the export.
+    """
+    permission_classes = [IsAuthenticated, IsRestaurantOwner]
+
+    def post(self, request, restaurant_id):
+        restaurant = get_object_or_404(Restaurant, id=restaurant_id, owner=request.user)
+        upload = request.FILES.get('file')
+        if upload is not None:
+            rows = read_json(upload) if upload.name.lower().endswith('.json') else read_csv(upload)
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            raise ValidationError({'file': 'Upload a CSV or JSON file or send a JSON list.'})
+        return Response(import_menu(restaurant, rows))
+
+class MenuExportView(APIView):
+    """
+    Stream a restaurant's whole menu as CSV or JSON, in the columns the
+    import reads.
+    """
+    permission_classes = [IsAuthenticated, IsRestaurantOwner]
+    exporters = {
+        'csv': (export_csv, 'text/csv'),
+        'json': (export_json, 'application/json'),
+    }
+
+    def get(self, request, restaurant_id, file_format):
+        restaurant = get_object_or_404(Restaurant, id=restaurant_id, owner=request.user)
+        if file_format not in self.exporters:
+            raise ValidationError({'format': 'Use csv or json.'})
+        export, content_type = self.exporters[file_format]
+        response = StreamingHttpResponse(export(restaurant), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="menu-{restaurant.pk}.{file_format}"'
+        return response
+
+class MenuSearchView(APIView):
+    """
+    Ranked search over menu item names and descriptions and restaurant names.
+    """
+    permission_classes = [IsAuthenticated]
+    max_limit = 100
+
+    def get(self, request):
+        params = request.query_params
+        query = params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This parameter is required.'})
+        category = params.get('category')
+        if category and category not in dict(MenuItem.CATEGORY_CHOICES):
+            raise ValidationError({'category': 'Unknown category.'})
+        try:
+            limit = min(max(int(params.get('limit', 20)), 1), self.max_limit)
+            restaurant_id = int(params['restaurant']) if params.get('restaurant') else None
+        except ValueError:
+            raise ValidationError('limit and restaurant must be integers.')
+
+        # Only staff can search unavailable items
+        is_available = True
+        if request.user.is_staff:
+            available = params.get('available')
+            is_available = None if available is None else available.lower() in ('1', 'true', 'yes')
+
+        ranked = search_menu_items(
+            query, category=category, is_available=is_available,
+            restaurant_id=restaurant_id, limit=limit,
+        )
+        menu_items = MenuItem.objects.with_related().in_bulk([pk for pk, score in ranked])
+        results = []
+        with measure_serialization():
+            for pk, score in ranked:
+                if pk in menu_items:
+                    data = MenuItemSerializer(menu_items[pk], context={'request': request}).data
+                    data['score'] = score
+                    results.append(data)
+        return Response(results)
+
+class MenuItemDetail(MeasuredSerializerMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = MenuItemSerializer
     permission_classes = [IsAuthenticated, IsRestaurantOwner]
     
     def get_queryset(self):
         restaurant_id = self.kwargs['restaurant_id']
-        return MenuItem.objects.filter(restaurant_id=restaurant_id)
+        return MenuItem.objects.filter(restaurant_id=restaurant_id).with_related()
 
 # Cart Views
-class CartView(generics.RetrieveUpdateAPIView):
+class CartView(MeasuredSerializerMixin, generics.RetrieveUpdateAPIView):
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated, IsCustomer]
     
     def get_object(self):
-        cart, created = Cart.objects.get_or_create(customer=self.request.user)
+        cart, created = Cart.objects.with_related().with_total().get_or_create(
+            customer=self.request.user
+        )
         return cart
 
-class CartItemList(generics.ListCreateAPIView):
+class CartBatchView(APIView):
+    """
+    Apply several add / set / remove operations to the cart in one request.
+    """
+    permission_classes = [IsAuthenticated, IsCustomer]
+
+    def post(self, request):
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cart = apply_cart_operations(request.user, serializer.validated_data['operations'])
+        with measure_serialization():
+            data = CartSerializer(cart).data
+        return Response(data)
+
+class CartItemList(MeasuredSerializerMixin, generics.ListCreateAPIView):
     serializer_class = CartItemSerializer
     permission_classes = [IsAuthenticated, IsCustomer]
     
     def get_queryset(self):
-        cart, created = Cart.objects.get_or_create(customer=self.request.user)
-        return CartItem.objects.filter(cart=cart)
+        return CartItem.objects.filter(cart__customer=self.request.user).with_related()
     
     def perform_create(self, serializer):
-        cart, created = Cart.objects.get_or_create(customer=self.request.user)
-        menu_item_id = self.request.data.get('menu_item')
-        quantity = self.request.data.get('quantity', 1)
-        
-        # Check if the item already exists in the cart
-        existing_item = CartItem.objects.filter(cart=cart, menu_item_id=menu_item_id).first()
-        
-        if existing_item:
-            # If the item exists, update its quantity
-            existing_item.quantity += quantity
-            existing_item.save()
-        else:
-            # If the item doesn't exist, create a new cart item
-            menu_item = MenuItem.objects.get(id=menu_item_id)
-            
-            # Check if cart has items from a different restaurant
-            existing_items = CartItem.objects.filter(cart=cart)
-            if existing_items.exists():
-                existing_restaurant = existing_items.first().menu_item.restaurant
-                if menu_item.restaurant != existing_restaurant:
-                    raise ValidationError(
-                        "You can only add items from one restaurant at a time. "
-                        "Please empty your cart first to order from a different restaurant."
-                    )
-            
-            serializer.save(cart=cart)
+        quantity = serializer.validated_data.get('quantity', 1)
+        if quantity < 1:
+            raise ValidationError({'quantity': 'Quantity must be at least 1.'})
+        serializer.instance = add_to_cart(
+            self.request.user, serializer.validated_data['menu_item'], quantity
+        )
 
-class CartItemDetail(generics.RetrieveUpdateDestroyAPIView):
+class CartItemDetail(MeasuredSerializerMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CartItemSerializer
     permission_classes = [IsAuthenticated, IsCustomer]
     
     def get_queryset(self):
-        cart, created = Cart.objects.get_or_create(customer=self.request.user)
-        return CartItem.objects.filter(cart=cart)
+        return CartItem.objects.filter(cart__customer=self.request.user).with_related()
 
     def patch(self, request, *args, **kwargs):
-        item = self.get_object()
         quantity_change = request.data.get('quantity', 0)
-        new_quantity = item.quantity + quantity_change
+        if not isinstance(quantity_change, int) or isinstance(quantity_change, bool):
+            return Response({'error': 'Quantity must be a whole number'}, status=400)
 
-        if new_quantity < 1:
+        # One conditional UPDATE, so concurrent changes add up and cannot
+        # take the quantity below 1
+        lines = self.get_queryset().filter(pk=kwargs['pk'])
+        if not lines.filter(quantity__gte=1 - quantity_change).update(quantity=F('quantity') + quantity_change):
+            if not lines.exists():
+                raise NotFound()
             return Response({'error': 'Quantity cannot be less than 1'}, status=400)
-
-        item.quantity = new_quantity
-        item.save()
-        return Response(CartItemSerializer(item).data)
+        return Response(self.serialized(CartItemSerializer(lines.get())))
 
 # Order Views
-class OrderList(generics.ListCreateAPIView):
+class OrderList(ProjectedListMixin, MeasuredSerializerMixin, generics.ListCreateAPIView):
     serializer_class = OrderSerializer
+    projection_class = OrderProjection
+    pagination_class = OrderPagination
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
-        if user.is_staff:
-            return Order.objects.all()
-        elif user.groups.filter(name='Restaurant Owner').exists():
-            return Order.objects.filter(restaurant__owner=user)
-        elif user.groups.filter(name='Delivery Crew').exists():
-            return Order.objects.filter(delivery_crew=user, status='out_for_delivery')
-        return Order.objects.filter(customer=user)
+        # Delivery crew only see the orders they are currently delivering
+        queryset = Order.objects.visible_to(
+            self.request.user, crew_status='out_for_delivery'
+        ).with_related()
+        order_status = self.request.query_params.get('status')
+        if order_status:
+            if order_status not in dict(Order.STATUS_CHOICES):
+                raise ValidationError({'status': 'Unknown status.'})
+            queryset = queryset.filter(status=order_status)
+        return queryset
     
     def perform_create(self, serializer):
-        # Get the user's cart
-        cart = Cart.objects.get(customer=self.request.user)
-        cart_items = CartItem.objects.filter(cart=cart)
-        
-        if not cart_items.exists():
-            raise ValidationError("Your cart is empty. Add items before placing an order.")
-        
-        # Get the restaurant from the first cart item
-        restaurant = cart_items.first().menu_item.restaurant
-        
-        # Calculate total
-        total = sum(item.quantity * item.menu_item.price for item in cart_items)
-        
-        # Create the order
-        order = serializer.save(
-            customer=self.request.user,
-            restaurant=restaurant,
-            total=total,
-            status='pending'
-        )
-        
-        # Create order items
-        for cart_item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                menu_item=cart_item.menu_item,
-                quantity=cart_item.quantity,
-                unit_price=cart_item.menu_item.price
-            )
-        
-        # Clear the cart
-        cart_items.delete()
+        order = place_order(self.request.user, **serializer.validated_data)
+        serializer.instance = Order.objects.with_related().get(pk=order.pk)
+        publish_order_event(serializer.instance)
 
-class OrderDetail(generics.RetrieveUpdateDestroyAPIView):
+class OrderDetail(MeasuredSerializerMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
-        if user.is_staff:
-            return Order.objects.all()
-        elif user.groups.filter(name='Restaurant Owner').exists():
-            return Order.objects.filter(restaurant__owner=user)
-        elif user.groups.filter(name='Delivery Crew').exists():
-            return Order.objects.filter(delivery_crew=user)
-        return Order.objects.filter(customer=user)
+        return Order.objects.visible_to(self.request.user).with_related()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            rollups.order_deleted(instance)
+            if instance.status == OUT_FOR_DELIVERY:
+                adjust_load(instance.delivery_crew_id, -1)
+            instance.delete()
+
+class OrderHistoryList(ProjectedListMixin, generics.ListAPIView):
+    """
+    Archived orders (see orders.archive), visible to the same users as the
+    live ones. The live order views never read the archive.
+    """
+    serializer_class = ArchivedOrderSerializer
+    projection_class = ArchivedOrderProjection
+    pagination_class = OrderPagination
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return ArchivedOrder.objects.visible_to(self.request.user).with_related()
+
+class OrderHistoryDetail(MeasuredSerializerMixin, generics.RetrieveAPIView):
+    serializer_class = ArchivedOrderSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return ArchivedOrder.objects.visible_to(self.request.user).with_related()
+
+class OrderExportView(APIView):
+    """
+    Stream orders with their items as CSV (one row per item) or NDJSON (one
+    order per line): every order for staff, their restaurants' orders for
+    owners. Filter with ``start`` and ``end`` dates (YYYY-MM-DD, both
+    included), ``restaurant`` and ``status``.
+    """
+    permission_classes = [IsAuthenticated, IsRestaurantOwner | IsAdminUser]
+    model = Order
+    projection_class = OrderProjection
+    exporters = {
+        'csv': (order_export.export_csv, 'text/csv'),
+        'ndjson': (order_export.export_ndjson, 'application/x-ndjson'),
+    }
+
+    def get(self, request, file_format):
+        if file_format not in self.exporters:
+            raise ValidationError({'format': 'Use csv or ndjson.'})
+        export, content_type = self.exporters[file_format]
+        chunks = order_export.order_chunks(
+            self.get_queryset(), self.projection_class(request), self.get_restaurants()
+        )
+        response = StreamingHttpResponse(export(chunks), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="orders.{file_format}"'
+        return response
+
+    def get_queryset(self):
+        queryset = order_export.date_range(
+            self.model.objects.all(),
+            date_param(self.request, 'start'),
+            date_param(self.request, 'end'),
+        )
+        order_status = self.request.query_params.get('status')
+        if order_status:
+            if order_status not in dict(Order.STATUS_CHOICES):
+                raise ValidationError({'status': 'Unknown status.'})
+            queryset = queryset.filter(status=order_status)
+        return queryset
+
+    def get_restaurants(self):
+        """
+        Ids of the restaurants whose orders are exported, or None for every
+        order; owners are always limited to their own restaurants.
+        """
+        restaurant = self.request.query_params.get('restaurant')
+        if self.request.user.is_staff and not restaurant:
+            return None
+        restaurants = Restaurant.objects.visible_to(self.request.user)
+        if restaurant:
+            try:
+                restaurants = restaurants.filter(pk=int(restaurant))
+            except ValueError:
+                raise ValidationError({'restaurant': 'Must be an integer.'})
+        return list(restaurants.order_by('id').values_list('id', flat=True))
+
+class OrderHistoryExportView(OrderExportView):
+    """
+    The same export for archived orders.
+    """
+    model = ArchivedOrder
+    projection_class = ArchivedOrderProjection
 
 class AssignDeliveryView(APIView):
     permission_classes = [IsAuthenticated, IsRestaurantOwner]
     
     def patch(self, request, pk):
-        order = get_object_or_404(Order, pk=pk)
         delivery_crew_id = request.data.get('delivery_crew')
         
         if not delivery_crew_id:
@@ -221,7 +464,7 @@ class AssignDeliveryView(APIView):
         try:
             delivery_crew = User.objects.get(
                 id=delivery_crew_id,
-                groups__name='Delivery Crew'
+                groups__name=DELIVERY_CREW
             )
         except User.DoesNotExist:
             return Response(
@@ -229,62 +472,126 @@ class AssignDeliveryView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        order.delivery_crew = delivery_crew
-        order.status = 'out_for_delivery'
-        order.save()
-        
-        serializer = OrderSerializer(order)
-        return Response(serializer.data)
+        orders = Order.objects.visible_to(request.user).filter(pk=pk).with_related()
+        moved = transition(orders, OUT_FOR_DELIVERY, delivery_crew)
+        if not moved:
+            raise NotFound()
+        with measure_serialization():
+            data = OrderSerializer(moved[0]).data
+        return Response(data)
 
 class MarkDeliveredView(APIView):
     permission_classes = [IsAuthenticated, IsDeliveryCrew]
     
     def patch(self, request, pk):
-        order = get_object_or_404(Order, pk=pk)
-        
-        if order.delivery_crew != request.user:
-            return Response(
-                {"detail": "You can only update orders assigned to you"},
-                status=status.HTTP_403_FORBIDDEN
-            )
-            
-        order.status = 'delivered'
-        order.save()
-        
-        serializer = OrderSerializer(order)
-        return Response(serializer.data)
+        moved = transition(Order.objects.filter(pk=pk, delivery_crew=request.user).with_related(), DELIVERED)
+        if not moved:
+            if Order.objects.filter(pk=pk).exists():
+                return Response(
+                    {"detail": "You can only update orders assigned to you"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            raise NotFound()
+        with measure_serialization():
+            data = OrderSerializer(moved[0]).data
+        return Response(data)
+
+class OrderTransitionView(APIView):
+    """
+    Move up to 200 orders of the owner's restaurants to one status in one
+    request, all of them or none. The response lists each order's new
+    status and delivery crew member.
+    """
+    permission_classes = [IsAuthenticated, IsRestaurantOwner]
+
+    def post(self, request):
+        serializer = OrderTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_ids = set(serializer.validated_data['orders'])
+        orders = Order.objects.visible_to(request.user).filter(pk__in=order_ids)
+        unknown = order_ids - set(orders.values_list('pk', flat=True))
+        if unknown:
+            raise ValidationError({'orders': f"Unknown orders: {', '.join(map(str, sorted(unknown)))}."})
+        moved = transition(
+            orders.select_related('restaurant'), serializer.validated_data['status'],
+            serializer.validated_data.get('delivery_crew'),
+        )
+        return Response([
+            {'id': order.pk, 'status': order.status, 'delivery_crew': order.delivery_crew_id}
+            for order in sorted(moved, key=lambda order: order.pk)
+        ])
+
+class OrderStreamTicketView(APIView):
+    """
+    Issue a single-use ticket for opening the order stream from a browser,
+    whose EventSource cannot send an Authorization header.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response(
+            {'ticket': issue_stream_ticket(request.user), 'expires_in': ORDER_STREAM_TICKET_TTL},
+            status=status.HTTP_201_CREATED,
+        )
 
 class UserRoleView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        if user.groups.filter(name='Restaurant Owner').exists():
-            return Response({'role': 'Restaurant Owner'})
-        elif user.groups.filter(name='Delivery Crew').exists():
-            return Response({'role': 'Delivery Crew'})
-        return Response({'role': 'Customer'})
-
-class UserProfileView(generics.RetrieveUpdateAPIView):
+        roles = get_roles(request.user)
+        if RESTAURANT_OWNER in roles:
+            return Response({'role': RESTAURANT_OWNER})
+        elif DELIVERY_CREW in roles:
+            return Response({'role': DELIVERY_CREW})
+        return Response({'role': CUSTOMER})
+
+class UserProfileView(MeasuredSerializerMixin, generics.RetrieveUpdateAPIView):
+    queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        user = self.request.user
+        # Users authenticated from the cache only carry the fields it keeps
+        if user.get_deferred_fields():
+            user = self.get_queryset().get(pk=user.pk)
+        return user
 
 class DeliveryCrewList(APIView):
     permission_classes = [IsAuthenticated]
+    ordering_fields = ('assigned_orders', 'username', 'id')
 
     def get(self, request):
-        delivery_crew = User.objects.filter(groups__name='Delivery Crew')
-        crew_data = []
-        for crew in delivery_crew:
-            assigned_orders = Order.objects.filter(delivery_crew=crew, status='out_for_delivery').count()
-            crew_data.append({
-                'id': crew.id,
-                'username': crew.username,
-                'first_name': crew.first_name,
-                'last_name': crew.last_name,
-                'assigned_orders': assigned_orders
-            })
+        delivery_crew = crew_with_load()
+
+        for param, lookup in [('min_load', 'gte'), ('max_load', 'lte')]:
+            value = request.query_params.get(param)
+            if value is not None:
+                try:
+                    delivery_crew = delivery_crew.filter(**{f'assigned_orders__{lookup}': int(value)})
+                except ValueError:
+                    raise ValidationError({param: 'Must be an integer.'})
+
+        ordering = request.query_params.get('ordering', 'id')
+        if ordering.lstrip('-') not in self.ordering_fields:
+            raise ValidationError({'ordering': f'Must be one of {", ".join(self.ordering_fields)}.'})
+        delivery_crew = delivery_crew.order_by(ordering, 'id')
+
+        crew_data = list(delivery_crew.values(
+            'id', 'username', 'first_name', 'last_name', 'assigned_orders'
+        ))
         return Response(crew_data)
+
+class RequestMetricsView(APIView):
+    """
+    Per-route latency histograms, query counts and SQL and serializer time
+    recorded by RequestMetricsMiddleware in this process. DELETE starts over.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(registry.snapshot())
+
+    def delete(self, request):
+        registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
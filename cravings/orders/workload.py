@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Count, F, Q
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import DeliveryLoad
+from .roles import DELIVERY_CREW
+
+# Read crew load from the maintained DeliveryLoad counters instead of
+# aggregating orders on every request.
+USE_DELIVERY_LOAD_COUNTERS = getattr(settings, 'USE_DELIVERY_LOAD_COUNTERS', False)
+
+
+def crew_with_load(use_counters=None):
+    """
+    Delivery crew members annotated with ``assigned_orders``, the number of
+    orders they are currently out delivering, in a single query.
+    """
+    if use_counters is None:
+        use_counters = USE_DELIVERY_LOAD_COUNTERS
+    crew = User.objects.filter(groups__name=DELIVERY_CREW)
+    if use_counters:
+        return crew.annotate(assigned_orders=Coalesce(F('delivery_load__active_orders'), 0))
+    return crew.annotate(
+        assigned_orders=Count('delivery_orders', filter=Q(delivery_orders__status='out_for_delivery'))
+    )
+
+
+def adjust_load(crew_id, delta):
+    """
+    Atomically add ``delta`` to a crew member's active order counter.
+    """
+    if not crew_id or not delta:
+        return
+    updated = DeliveryLoad.objects.filter(crew_id=crew_id).update(
+        active_orders=Greatest(F('active_orders') + delta, 0)
+    )
+    if not updated:
+        load, created = DeliveryLoad.objects.get_or_create(
+            crew_id=crew_id, defaults={'active_orders': max(delta, 0)}
+        )
+        if not created:
+            adjust_load(crew_id, delta)
+
+
+def reserve_load(crew_id, count, limit):
+    """
+    Add ``count`` to a crew member's active order counter unless that would
+    take it above ``limit``, and return whether it did. The check and the
+    increment are one UPDATE, so concurrent reservations cannot overshoot.
+    """
+    reserved = DeliveryLoad.objects.filter(crew_id=crew_id, active_orders__lte=limit - count).update(
+        active_orders=F('active_orders') + count
+    )
+    if reserved or count > limit:
+        return bool(reserved)
+    # No counter yet, or a full one
+    load, created = DeliveryLoad.objects.get_or_create(crew_id=crew_id, defaults={'active_orders': count})
+    return created
+
+
+def rebuild_load():
+    """
+    Recompute every counter from the orders table.
+    """
+    counts = dict(
+        crew_with_load(use_counters=False).filter(assigned_orders__gt=0).values_list('id', 'assigned_orders')
+    )
+    DeliveryLoad.objects.exclude(crew_id__in=counts).update(active_orders=0)
+    for crew_id, count in counts.items():
+        DeliveryLoad.objects.update_or_create(crew_id=crew_id, defaults={'active_orders': count})
+    return counts